@@ -0,0 +1,51 @@
+"""Rendering by enviroplus.display, as used by examples/all-in-one.py and examples/combined.py, on the 160x80 ST7735 canvas"""
+import numpy
+
+from enviroplus import display
+from enviroplus.ringbuffer import RingBuffer
+
+WIDTH = 160
+HEIGHT = 80
+
+# As examples/combined.py
+VARIABLES = ["temperature", "pressure", "humidity", "light", "oxidised", "reduced", "nh3", "pm1", "pm25", "pm10"]
+UNITS = ["C", "hPa", "%", "Lux", "kO", "kO", "kO", "ug/m3", "ug/m3", "ug/m3"]
+LIMITS = [
+    [4, 18, 28, 35],
+    [250, 650, 1013.25, 1015],
+    [20, 30, 60, 70],
+    [-1, -1, 30000, 100000],
+    [-1, -1, 40, 50],
+    [-1, -1, 450, 550],
+    [-1, -1, 200, 300],
+    [-1, -1, 50, 100],
+    [-1, -1, 50, 100],
+    [-1, -1, 50, 100]
+]
+PALETTE = [(0, 0, 255), (0, 255, 255), (0, 255, 0), (255, 255, 0), (255, 0, 0)]
+READINGS = [22.4, 1013.2, 45.1, 120.0, 21.3, 480.2, 150.7, 4.0, 7.0, 9.0]
+
+
+def bench_image_to_data(benchmark, canvas, st7735):
+    assert len(benchmark(st7735.image_to_data, canvas["img"], 270)) == WIDTH * HEIGHT * 2
+
+
+def bench_display_text(benchmark, canvas, st7735):
+    values = RingBuffer(WIDTH, fill=1)
+    readings = iter(numpy.random.default_rng(0).normal(22.0, 0.5, 1000000))
+
+    def render():
+        display.draw_history(canvas["draw"], canvas["font"], values, "temperature", next(readings), "C", WIDTH, HEIGHT)
+        return st7735.image_to_data(canvas["img"], 270)
+
+    assert len(benchmark(render)) == WIDTH * HEIGHT * 2
+
+
+def bench_display_everything(benchmark, canvas, st7735):
+    values = {variable: RingBuffer(WIDTH, fill=reading) for variable, reading in zip(VARIABLES, READINGS)}
+
+    def render():
+        display.draw_everything(canvas["draw"], canvas["smallfont"], values, VARIABLES, UNITS, LIMITS, PALETTE, WIDTH, HEIGHT)
+        return st7735.image_to_data(canvas["img"], 270)
+
+    assert len(benchmark(render)) == WIDTH * HEIGHT * 2
@@ -0,0 +1,19 @@
+import time
+
+from enviroplus.exporter import DESCRIPTIONS, PrometheusExporter
+from enviroplus.latest import LatestValues
+from enviroplus.rollup import Rollup
+
+
+def bench_render(benchmark):
+    latest = LatestValues()
+    rollup = Rollup()
+    start = time.time() - 600
+    for offset in range(0, 600, 5):
+        for index, metric in enumerate(DESCRIPTIONS):
+            latest.update(metric, index + offset / 100.0, start + offset)
+            rollup.add(metric, index + offset / 100.0, start + offset)
+
+    exporter = PrometheusExporter(latest, rollup, windows=(60, 300))
+    body = benchmark(exporter.render)
+    assert body.count(b"# TYPE") == len(DESCRIPTIONS) * 4 + 1
@@ -0,0 +1,23 @@
+import pytest
+
+
+def bench_read_all(benchmark, gas):
+    gas.enable_adc(False)
+    reading = benchmark(gas.read_all)
+    assert reading.adc is None
+    assert reading.oxidising == pytest.approx(20300, rel=0.05)
+
+
+@pytest.mark.parametrize("gain", (None, 6.144, 4.096), ids=("default-gain", "gas-gain", "other-gain"))
+def bench_read_all_adc(benchmark, gas, gain):
+    # A gain other than the gas channels' gain is switched to and back on every read
+    default_gain = gas._adc_gain
+    gas.enable_adc(True)
+    if gain is not None:
+        gas.set_adc_gain(gain)
+    try:
+        reading = benchmark(gas.read_all)
+    finally:
+        gas.enable_adc(False)
+        gas.set_adc_gain(default_gain)
+    assert reading.adc == pytest.approx(1.241, rel=0.01)
@@ -0,0 +1,41 @@
+import pytest
+
+BANDS = [(100, 400, 10.0, 3.0), (400, 2000, 10.0, 3.0), (2000, 8000, 10.0, 3.0)]
+
+
+def bench_get_amplitudes_at_frequency_ranges(benchmark, noise_module):
+    noise = noise_module.Noise()
+    amplitudes = benchmark(noise.get_amplitudes_at_frequency_ranges, [(100, 200), (200, 1500), (1500, 8000)])
+    assert len(amplitudes) == 3
+
+
+def bench_get_amplitude_at_frequency_range(benchmark, noise_module):
+    noise = noise_module.Noise()
+    assert benchmark(noise.get_amplitude_at_frequency_range, 900, 1100) > 0
+
+
+def bench_get_noise_profile(benchmark, noise_module):
+    noise = noise_module.Noise()
+    low, mid, high, total = benchmark(noise.get_noise_profile)
+    assert low > high
+
+
+def bench_get_noise_profile_calibrated(benchmark, noise_module):
+    noise = noise_module.Noise(calibration=noise_module.Calibration())
+    low, mid, high, total = benchmark(noise.get_noise_profile)
+    assert total > low
+
+
+def bench_get_noise_profile_quantiles(benchmark, noise_module):
+    noise = noise_module.Noise(quantiles=(0.5, 0.9, 0.99))
+    benchmark(noise.get_noise_profile)
+    assert noise.get_noise_quantiles("total")[0.5] is not None
+
+
+@pytest.mark.parametrize("calibrated", (False, True), ids=("uncalibrated", "calibrated"))
+def bench_event_detector_process(benchmark, noise_module, calibrated):
+    calibration = noise_module.Calibration() if calibrated else None
+    detector = noise_module.EventDetector(BANDS, blocksize=1024, calibration=calibration)
+    block = noise_module.sounddevice.generate(1024)
+    levels = benchmark(detector.process, block, 0.0)
+    assert len(levels) == len(BANDS)
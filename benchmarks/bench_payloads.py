@@ -0,0 +1,63 @@
+"""Payloads built by enviroplus.payload for examples/mqtt-all.py and examples/sensorcommunity.py"""
+import json
+
+import pytest
+
+from enviroplus.payload import PayloadEncoder, average_values, sensorcommunity_payloads
+
+# As published by examples/mqtt-all.py
+FIELDS = ("temperature", "pressure", "humidity", "oxidised", "reduced", "nh3", "lux", "pm1", "pm25", "pm10")
+READINGS = {
+    "temperature": 22.41,
+    "pressure": 101325.0,
+    "humidity": 45.13,
+    "oxidised": 20.3125,
+    "reduced": 480.2127,
+    "nh3": 150.7331,
+    "lux": 120.4,
+    "pm1": 4,
+    "pm25": 7,
+    "pm10": 9
+}
+
+
+def bench_mqtt_interval(benchmark):
+    # One mqtt-all.py --oversample 10 interval: the readings averaged, then encoded as the default JSON payload
+    samples = {metric: [value] * 10 for metric, value in READINGS.items()}
+    encoder = PayloadEncoder(FIELDS, tags={"serial": "00000000deadbeef"})
+
+    def publish():
+        return encoder.encode([(1700000000.0, average_values(samples))])
+
+    payload = benchmark(publish)
+    assert json.loads(payload)["pressure"] == 101320
+
+
+@pytest.mark.parametrize("encoding", ("json", "cbor", "msgpack", "struct"))
+def bench_encoded_batch(benchmark, encoding):
+    # Twelve readings per message, as mqtt-all.py --batch 12, with the message size in extra_info
+    pytest.importorskip({"cbor": "cbor2", "msgpack": "msgpack"}.get(encoding, "json"))
+
+    samples = [(1700000000.0 + index * 5, dict(READINGS)) for index in range(12)]
+    encoder = PayloadEncoder(FIELDS, encoding=encoding, tags={"serial": "00000000deadbeef"})
+    message = benchmark(encoder.encode, samples)
+    benchmark.extra_info["bytes"] = len(message)
+    assert len(encoder.decode(message)) == 12
+
+
+def bench_sensorcommunity_payload(benchmark):
+    # Up to the JSON bodies requests.post() would send
+    values = {
+        "temperature": "21.84",
+        "pressure": "101325.00",
+        "humidity": "45.13",
+        "P2": "7.00",
+        "P1": "9.00"
+    }
+
+    def build():
+        return [(pin, json.dumps(body)) for pin, body in sensorcommunity_payloads(values)]
+
+    (pm_pin, pm), (climate_pin, _) = benchmark(build)
+    assert json.loads(pm)["sensordatavalues"][0] == {"value_type": "P2", "value": "7.00"}
+    assert (pm_pin, climate_pin) == ("1", "11")
@@ -0,0 +1,59 @@
+"""Benchmark configuration.
+Benchmarks run against enviroplus.simulator, so they need no hardware
+and give comparable numbers on a Pi and a development machine.
+"""
+import sys
+
+import mock
+import pytest
+
+
+@pytest.fixture(scope="session")
+def gas():
+    """enviroplus.gas set up on the ADS1015 of a enviroplus.simulator.Simulator."""
+    from enviroplus.simulator import Simulator
+    gpiodevice = mock.Mock()
+    gpiodevice.get_pin.return_value = (mock.Mock(), 0)
+    modules = {"gpiod": mock.Mock(), "gpiod.line": mock.Mock(), "gpiodevice": gpiodevice}
+    with Simulator(pms5003_interval=0.01) as simulator:
+        with mock.patch.dict(sys.modules, modules):
+            from enviroplus import gas
+            gas.setup(i2c_dev=simulator.bus)
+        yield gas
+        gas.enable_adc(False)
+
+
+@pytest.fixture(scope="session")
+def noise_module():
+    """enviroplus.noise capturing from a simulated microphone."""
+    from enviroplus.simulator import AudioSource
+    with mock.patch.dict(sys.modules, {"sounddevice": mock.Mock()}):
+        from enviroplus import noise
+    noise.sounddevice = AudioSource(tones=((150.0, 0.2), (1000.0, 0.1), (4000.0, 0.05)), noise=0.01, speed=None, seed=0)
+    return noise
+
+
+@pytest.fixture(scope="session")
+def canvas():
+    """The 160x80 ST7735 canvas, draw and fonts used by the examples."""
+    pytest.importorskip("PIL")
+    pytest.importorskip("fonts.ttf")
+    from fonts.ttf import RobotoMedium as UserFont
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.new("RGB", (160, 80), color=(0, 0, 0))
+    return {
+        "img": img,
+        "draw": ImageDraw.Draw(img),
+        "font": ImageFont.truetype(UserFont, 20),
+        "smallfont": ImageFont.truetype(UserFont, 10)
+    }
+
+
+@pytest.fixture(scope="session")
+def st7735():
+    """The st7735 module, for the RGB565 conversion done by ST7735.display()."""
+    pytest.importorskip("numpy")
+    modules = {"gpiod": mock.Mock(), "gpiod.line": mock.Mock(), "gpiodevice": mock.Mock(), "spidev": mock.Mock()}
+    with mock.patch.dict(sys.modules, modules):
+        st7735 = pytest.importorskip("st7735")
+    return st7735
@@ -0,0 +1,212 @@
+"""Read Enviro+ sensors from asyncio"""
+
+import asyncio
+import select
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from enviroplus import metrics
+from enviroplus.hub import Sample
+
+
+class AsyncHub:
+    def __init__(self, i2c_workers=1, on_error=None):
+        """asyncio sensor runtime.
+
+        I2C sources are read in a small dedicated executor, the PMS5003 is read directly
+        from its serial port by the event loop and noise is captured with a stream callback.
+
+        Iterate over stream() to receive a Sample for every value read:
+
+            async for sample in hub.stream():
+                ...
+
+        :param i2c_workers: Number of threads for blocking I2C reads
+        :param on_error: Optional function accepting (source, exception) for failed reads
+
+        """
+        self.i2c_workers = i2c_workers
+        self.on_error = on_error
+        self._tasks = []
+        self._executor = None
+
+    def add(self, source):
+        """Add an enviroplus.hub.Source, read in the I2C executor at its period.
+
+        :param source: Source to add
+
+        """
+        self._tasks.append((self._poll, source))
+        return source
+
+    def add_pms5003(self, pms5003, port, timeout=5.0, backoff=1.0, max_backoff=30.0):
+        """Read PM1.0, PM2.5 and PM10 from a PMS5003 as each frame arrives.
+
+        Returns a Source, named "pms5003", counting the frames read and errors.
+
+        Like enviroplus.particulates.PMS5003Reader, if no valid frame arrives within
+        timeout, or reading the port fails, the error is passed to on_error and the
+        sensor is reset, waiting longer after each consecutive failure.
+
+        :param pms5003: PMS5003 instance, used to reset the sensor
+        :param port: Serial port the PMS5003 sends frames on, eg: serial.Serial("/dev/ttyAMA0", 9600)
+        :param timeout: Time, in seconds, to wait for a frame before resetting the sensor
+        :param backoff: Time, in seconds, to wait before the first reset
+        :param max_backoff: Maximum time, in seconds, to wait between resets
+
+        """
+        from enviroplus.hub import Source
+        from enviroplus.particulates import _Recovery
+
+        source = Source("pms5003", None, timeout)
+        self._tasks.append((self._read_pms5003, (source, port, _Recovery(pms5003, backoff, max_backoff))))
+        return source
+
+    def add_noise(self, noise, blocksize=1024):
+        """Publish a noise profile every noise.duration seconds of streamed audio.
+
+        :param noise: enviroplus.noise.Noise instance
+        :param blocksize: Number of samples per audio block
+
+        """
+        self._tasks.append((self._read_noise, (noise, blocksize)))
+
+    async def stream(self):
+        """Start reading all sources and yield a Sample for every value read.
+
+        Sources are stopped when the iteration ends.
+
+        """
+        queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.i2c_workers, thread_name_prefix="enviroplus-i2c")
+        tasks = [asyncio.ensure_future(task(arg, queue)) for task, arg in self._tasks]
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _error(self, source, error):
+        source.errors += 1
+        source.last_error = error
+        metrics.increment(f"{source.name}.read.errors")
+        if self.on_error is not None:
+            self.on_error(source, error)
+
+    async def _poll(self, source, queue):
+        loop = asyncio.get_running_loop()
+        source.next_due = loop.time()
+        while True:
+            start = loop.time()
+            try:
+                values = await loop.run_in_executor(self._executor, source.read)
+            except Exception as e:
+                self._error(source, e)
+                values = {}
+            source.reads += 1
+            source.last_duration = loop.time() - start
+            metrics.observe(f"{source.name}.read", source.last_duration)
+            _publish(queue, values)
+
+            source.next_due += source.period
+            now = loop.time()
+            if source.next_due <= now:
+                missed = int((now - source.next_due) // source.period) + 1
+                source.overruns += missed
+                source.next_due += missed * source.period
+            await asyncio.sleep(source.next_due - now)
+
+    async def _read_pms5003(self, args, queue):
+        from enviroplus.particulates import PM1, PM10, PM25, FrameParser
+
+        source, port, recovery = args
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        while True:
+            parser = FrameParser()
+            loop.add_reader(port.fileno(), ready.set)
+            # Wake to check for a timeout even if nothing arrives
+            deadline = loop.time() + source.period
+            timer = loop.call_at(deadline, ready.set)
+            try:
+                while True:
+                    await ready.wait()
+                    ready.clear()
+                    # Only take what has arrived, pyserial would otherwise block the loop to fill the buffer.
+                    # Wakes can be stale, but a port that is readable with nothing waiting has hung up,
+                    # so read it to raise the error rather than spinning
+                    waiting = port.in_waiting
+                    if waiting or select.select([port], [], [], 0)[0]:
+                        parser.readinto(port, size=max(waiting, 1))
+                    for data in parser.frames_available():
+                        recovery.succeeded()
+                        source.reads += 1
+                        _publish(queue, {
+                            "pm1": data[PM1],
+                            "pm25": data[PM25],
+                            "pm10": data[PM10]
+                        })
+                        deadline = loop.time() + source.period
+                    if loop.time() >= deadline:
+                        raise TimeoutError(f"No PMS5003 frame for {source.period}s")
+                    if timer.when() != deadline:
+                        timer.cancel()
+                        timer = loop.call_at(deadline, ready.set)
+            except Exception as e:
+                # Timeouts, and serial errors such as EIO from an unplugged adapter
+                self._error(source, e)
+            finally:
+                timer.cancel()
+                loop.remove_reader(port.fileno())
+
+            await asyncio.sleep(recovery.delay())
+            error = await loop.run_in_executor(self._executor, recovery.reset)
+            if error is not None:
+                self._error(source, error)
+                continue
+            try:
+                port.reset_input_buffer()
+            except Exception as e:
+                self._error(source, e)
+
+    async def _read_noise(self, args, queue):
+        noise, blocksize = args
+        loop = asyncio.get_running_loop()
+        blocks = asyncio.Queue()
+        count = int(noise.duration * noise.sample_rate)
+
+        def callback(block, timestamp):
+            loop.call_soon_threadsafe(blocks.put_nowait, block.copy())
+
+        stream = noise.open_stream(callback, blocksize=blocksize)
+        try:
+            pending = []
+            total = 0
+            while True:
+                block = await blocks.get()
+                pending.append(block)
+                total += len(block)
+                if total < count:
+                    continue
+                recording = numpy.concatenate(pending)[:count].reshape(-1, 1)
+                pending = []
+                total = 0
+                profile = await loop.run_in_executor(None, lambda: noise.get_noise_profile(recording=recording))
+                _publish(queue, dict(zip(("noise_low", "noise_mid", "noise_high", "noise_total"), profile)))
+        finally:
+            stream.stop()
+            stream.close()
+
+
+def _publish(queue, values):
+    timestamp = time.time()
+    for metric, value in values.items():
+        queue.put_nowait(Sample(metric, value, timestamp))
+
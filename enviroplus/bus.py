@@ -0,0 +1,148 @@
+"""Share the I2C bus between Enviro+ sensors"""
+
+import contextlib
+import functools
+import threading
+import time
+
+from enviroplus import metrics
+
+SMBUS_METHODS = (
+    "write_quick",
+    "read_byte",
+    "write_byte",
+    "read_byte_data",
+    "write_byte_data",
+    "read_word_data",
+    "write_word_data",
+    "process_call",
+    "read_block_data",
+    "write_block_data",
+    "read_i2c_block_data",
+    "write_i2c_block_data",
+    "i2c_rdwr"
+)
+
+
+class DeviceStats:
+    __slots__ = "transactions", "errors", "bus_time", "wait_time", "max_bus_time"
+
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0
+        self.bus_time = 0.0
+        self.wait_time = 0.0
+        self.max_bus_time = 0.0
+
+    def __repr__(self):
+        return f"""Transactions: {self.transactions}
+Errors: {self.errors}
+Bus time: {self.bus_time:.6f} s
+Max bus time: {self.max_bus_time:.6f} s
+Wait time: {self.wait_time:.6f} s"""
+
+    __str__ = __repr__
+
+
+class DeviceHandle:
+    def __init__(self, manager, name):
+        """SMBus compatible handle for one device on a shared bus.
+
+        Pass as the i2c_dev argument of the BME280, LTR559 or ADS1015 libraries.
+
+        :param manager: BusManager that owns the bus
+        :param name: Device name, used to record bus time
+
+        """
+        self.name = name
+        self.stats = DeviceStats()
+        self._manager = manager
+        self._metric = f"i2c.{name}"
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Hold the bus for several back-to-back transactions.
+
+        Other devices wait until the block exits, eg: to write a config register
+        and read back the result without another device interleaving.
+
+        """
+        stats = self.stats
+        start = time.perf_counter()
+        with self._manager._lock:
+            acquired = time.perf_counter()
+            stats.wait_time += acquired - start
+            yield self
+
+    def _call(self, method, *args):
+        stats = self.stats
+        start = time.perf_counter()
+        with self._manager._lock:
+            acquired = time.perf_counter()
+            try:
+                return getattr(self._manager.bus, method)(*args)
+            except Exception:
+                stats.errors += 1
+                metrics.increment(f"{self._metric}.errors")
+                raise
+            finally:
+                elapsed = time.perf_counter() - acquired
+                metrics.observe(self._metric, elapsed)
+                stats.transactions += 1
+                stats.bus_time += elapsed
+                stats.wait_time += acquired - start
+                if elapsed > stats.max_bus_time:
+                    stats.max_bus_time = elapsed
+
+    def __getattr__(self, name):
+        if name not in SMBUS_METHODS:
+            raise AttributeError(name)
+        method = functools.partial(self._call, name)
+        setattr(self, name, method)
+        return method
+
+
+class BusManager:
+    def __init__(self, bus=1):
+        """Owner of the I2C bus shared by the BME280, LTR559 and gas sensor ADC.
+
+        Every transaction on a handle from device() holds a lock for just that transaction,
+        so several threads can safely use different sensors at the same time.
+
+        :param bus: I2C bus number, or an existing SMBus instance
+
+        """
+        if isinstance(bus, int):
+            try:
+                from smbus2 import SMBus
+            except ImportError:
+                from smbus import SMBus
+            bus = SMBus(bus)
+
+        self.bus = bus
+        self._lock = threading.RLock()
+        self._devices = {}
+
+    def device(self, name):
+        """Return the handle for a named device, creating it if needed.
+
+        :param name: Device name, eg: "bme280"
+
+        """
+        try:
+            return self._devices[name]
+        except KeyError:
+            handle = DeviceHandle(self, name)
+            self._devices[name] = handle
+            return handle
+
+    def stats(self):
+        """Return a dict of device name: DeviceStats."""
+        return {name: device.stats for name, device in self._devices.items()}
+
+    def close(self):
+        """Close the underlying bus."""
+        with self._lock:
+            close = getattr(self.bus, "close", None)
+            if close is not None:
+                close()
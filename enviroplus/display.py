@@ -0,0 +1,82 @@
+"""Draw sensor readings on the 0.96" LCD"""
+
+import colorsys
+
+
+def draw_history(draw, font, history, variable, data, unit, width=160, height=80, top=25):
+    """Draw a reading above a colour-coded graph of its recent history.
+
+    Adds data to history, then draws the history as a bar from blue (lowest)
+    to red (highest) with a black line graph on a white background, and the
+    reading as text across the top.
+
+    Returns the text drawn, eg: "temp: 21.5 C"
+
+    :param draw: PIL.ImageDraw.Draw for the display image
+    :param font: PIL.ImageFont for the text
+    :param history: enviroplus.ringbuffer.RingBuffer of recent readings, one per pixel column
+    :param variable: Name of the reading, eg: "temperature"
+    :param data: Reading to add
+    :param unit: Unit to display, eg: "C"
+    :param width: Display width in pixels
+    :param height: Display height in pixels
+    :param top: Height, in pixels, kept clear above the graph for the text
+
+    """
+    # Add to the history, discarding the oldest value
+    history.append(data)
+    # Scale the values for the variable between 0 and 1
+    colours = history.scaled()
+    # Format the variable name and value
+    message = f"{variable[:4]}: {data:.1f} {unit}"
+    draw.rectangle((0, 0, width, height), (255, 255, 255))
+    for i in range(len(colours)):
+        # Convert the values to colours from red to blue
+        colour = (1.0 - colours[i]) * 0.6
+        r, g, b = [int(x * 255.0) for x in colorsys.hsv_to_rgb(colour, 1.0, 1.0)]
+        # Draw a 1-pixel wide rectangle of colour
+        draw.rectangle((i, top, i + 1, height), (r, g, b))
+        # Draw a line graph in black
+        line_y = height - (top + (colours[i] * (height - top))) + top
+        draw.rectangle((i, line_y, i + 1, line_y + 1), (0, 0, 0))
+    # Write the text at the top in black
+    draw.text((0, 0), message, font=font, fill=(0, 0, 0))
+    return message
+
+
+def draw_everything(draw, font, values, variables, units, limits, palette, width=160, height=80, x_offset=2, y_offset=2):
+    """Draw the latest of every reading in two columns, coloured by their limits.
+
+    Each reading is drawn in the first palette colour, or palette[n + 1] once it
+    is above the nth of its limits.
+
+    :param draw: PIL.ImageDraw.Draw for the display image
+    :param font: PIL.ImageFont for the text
+    :param values: Dict of variable: enviroplus.ringbuffer.RingBuffer of recent readings
+    :param variables: Names of the readings to draw, in order
+    :param units: Unit of each variable
+    :param limits: List of increasing limits for each variable
+    :param palette: List of (r, g, b) colours, one more than the number of limits
+    :param width: Display width in pixels
+    :param height: Display height in pixels
+    :param x_offset: Left margin of each column in pixels
+    :param y_offset: Top margin of each row in pixels
+
+    """
+    draw.rectangle((0, 0, width, height), (0, 0, 0))
+    column_count = 2
+    row_count = len(variables) / column_count
+    for i, variable in enumerate(variables):
+        data_value = values[variable][-1]
+        # Calculate the row & column
+        col_index = i // int(row_count)
+        row_index = i % int(row_count)
+        x = x_offset + ((width // column_count) * col_index)
+        y = y_offset + int((height / row_count) * row_index)
+        message = f"{variable[:4]}: {data_value:.1f} {units[i]}"
+        # Determine the colour of the text using the limits
+        rgb = palette[0]
+        for j, limit in enumerate(limits[i]):
+            if data_value > limit:
+                rgb = palette[j + 1]
+        draw.text((x, y), message, font=font, fill=rgb)
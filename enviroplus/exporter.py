@@ -0,0 +1,239 @@
+"""Serve cached sensor readings to Prometheus"""
+
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from enviroplus import metrics
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DESCRIPTIONS = {
+    "temperature": "Temperature in degrees Celsius",
+    "pressure": "Pressure in hectopascals",
+    "humidity": "Relative humidity in percent",
+    "lux": "Light level in lux",
+    "proximity": "Proximity, higher is closer",
+    "oxidising": "Oxidising gas sensor resistance in ohms",
+    "reducing": "Reducing gas sensor resistance in ohms",
+    "nh3": "NH3 gas sensor resistance in ohms",
+    "adc": "Spare ADC channel in volts",
+    "pm1": "PM1.0 particulates in ug/m3",
+    "pm25": "PM2.5 particulates in ug/m3",
+    "pm10": "PM10 particulates in ug/m3",
+    "noise_low": "Low frequency noise level",
+    "noise_mid": "Mid frequency noise level",
+    "noise_high": "High frequency noise level",
+    "noise_total": "Total noise level"
+}
+
+_INVALID = re.compile(r"[^a-zA-Z0-9_:]")
+_STATS = (
+    ("min", "Minimum"),
+    ("max", "Maximum"),
+    ("mean", "Mean")
+)
+
+
+def _name(name):
+    name = _INVALID.sub("_", name)
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def _help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _header(name, help, kind):
+    return f"# HELP {name} {_help(help)}\n# TYPE {name} {kind}\n".encode("utf-8")
+
+
+def _format(value):
+    if math.isnan(value):
+        return b"NaN"
+    if math.isinf(value):
+        return b"+Inf" if value > 0 else b"-Inf"
+    return repr(float(value)).encode("ascii")
+
+
+class _Family:
+    __slots__ = "gauge", "stats", "age"
+
+    def __init__(self, prefix, metric, windows):
+        name = f"{prefix}{_name(metric)}"
+        description = DESCRIPTIONS.get(metric, f"Latest {metric} reading")
+        self.gauge = _header(name, description, "gauge") + f"{name} ".encode("utf-8")
+        self.stats = [
+            (
+                _header(f"{name}_{stat}", f"{label} {metric} over each window", "gauge"),
+                [(resolution, f"{name}_{stat}{{window=\"{resolution}s\"}} ".encode("utf-8")) for resolution in windows]
+            )
+            for stat, label in _STATS
+        ]
+        self.age = f"{prefix}age_seconds{{metric=\"{_label(metric)}\"}} ".encode("utf-8")
+
+
+class PrometheusExporter:
+    def __init__(self, latest, rollup=None, windows=(60,), prefix="enviroplus_", instrumentation=True):
+        """Prometheus exporter for cached sensor readings.
+
+        Every scrape is answered from a enviroplus.latest.LatestValues cache and,
+        optionally, the completed buckets of an enviroplus.rollup.Rollup, so scrapes
+        never read a sensor. The HELP, TYPE and name of every line are encoded once,
+        only the values are formatted per scrape.
+
+        Each metric is exported as a gauge of its latest value, with the age of that
+        value in {prefix}age_seconds. With a rollup, the min, max and mean of the last
+        completed bucket of each window are exported as {metric}_min, _max and _mean.
+
+        :param latest: enviroplus.latest.LatestValues to export, eg: an enviroplus.hub subscriber
+        :param rollup: Optional enviroplus.rollup.Rollup to export summaries from
+        :param windows: Rollup resolutions, in seconds, to export
+        :param prefix: Prefix added to every metric name
+        :param instrumentation: True to also export enviroplus.metrics latencies and counters, when enabled
+
+        """
+        self.latest = latest
+        self.rollup = rollup
+        self.windows = tuple(windows)
+        self.prefix = prefix
+        self.instrumentation = instrumentation
+
+        self._families = {}
+        self._age_header = _header(f"{prefix}age_seconds", "Time since each metric was last read", "gauge")
+        self._latency_header = _header(f"{prefix}latency_seconds", "Time taken by sensor reads and processing", "histogram")
+        self._events_header = _header(f"{prefix}events_total", "Count of sensor errors, retries and resets", "counter")
+        self._latency_names = {}
+        self._event_names = {}
+        self._server = None
+        self._thread = None
+
+    def _family(self, metric):
+        family = self._families.get(metric)
+        if family is None:
+            family = self._families[metric] = _Family(self.prefix, metric, self.windows)
+        return family
+
+    def render(self):
+        """Return the current metrics as Prometheus text format bytes."""
+        readings = sorted(self.latest.snapshot().items())
+        monotonic = time.monotonic()
+        parts = []
+        ages = []
+
+        for metric, reading in readings:
+            try:
+                value = float(reading.value)
+            except (TypeError, ValueError):
+                continue
+            family = self._family(metric)
+            parts += (family.gauge, _format(value), b"\n")
+
+            if self.rollup is not None:
+                buckets = [(resolution, self.rollup.latest(metric, resolution)) for resolution in self.windows]
+                if any(bucket is not None for _, bucket in buckets):
+                    for index, (header, samples) in enumerate(family.stats):
+                        parts.append(header)
+                        for (resolution, bucket), (_, prefix) in zip(buckets, samples):
+                            if bucket is not None:
+                                # Bucket fields after start and count are min, max, mean
+                                parts += (prefix, _format(bucket[2 + index]), b"\n")
+
+            ages += (family.age, _format(max(0.0, monotonic - reading.monotonic)), b"\n")
+
+        if ages:
+            parts.append(self._age_header)
+            parts += ages
+
+        if self.instrumentation and metrics.enabled():
+            self._render_instrumentation(parts)
+
+        return b"".join(parts)
+
+    def _render_instrumentation(self, parts):
+        snapshot = metrics.snapshot()
+
+        if snapshot["histograms"]:
+            parts.append(self._latency_header)
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines = self._latency_names.get(name)
+            if lines is None:
+                base = f"{self.prefix}latency_seconds"
+                label = _label(name)
+                lines = self._latency_names[name] = (
+                    [f"{base}_bucket{{name=\"{label}\",le=\"{bound!r}\"}} ".encode("utf-8") for bound in metrics.BUCKETS]
+                    + [f"{base}_bucket{{name=\"{label}\",le=\"+Inf\"}} ".encode("utf-8")],
+                    f"{base}_sum{{name=\"{label}\"}} ".encode("utf-8"),
+                    f"{base}_count{{name=\"{label}\"}} ".encode("utf-8")
+                )
+            buckets, total, count = lines
+            cumulative = 0
+            for prefix, bucket_count in zip(buckets, histogram.counts):
+                cumulative += bucket_count
+                parts += (prefix, str(cumulative).encode("ascii"), b"\n")
+            parts += (total, _format(histogram.sum), b"\n", count, str(histogram.count).encode("ascii"), b"\n")
+
+        if snapshot["counters"]:
+            parts.append(self._events_header)
+        for name, count in sorted(snapshot["counters"].items()):
+            prefix = self._event_names.get(name)
+            if prefix is None:
+                prefix = self._event_names[name] = f"{self.prefix}events_total{{name=\"{_label(name)}\"}} ".encode("utf-8")
+            parts += (prefix, str(count).encode("ascii"), b"\n")
+
+    def start(self, port=8000, address=""):
+        """Serve /metrics over HTTP from a background thread.
+
+        :param port: TCP port to listen on
+        :param address: Address to listen on, defaults to all interfaces
+
+        """
+        if self._server is not None:
+            return
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="enviroplus-exporter", daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self):
+        return None if self._server is None else self._server.server_address[1]
+
+    def stop(self):
+        """Stop serving, waiting for the server thread to finish."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -8,6 +8,8 @@ import gpiod
 import gpiodevice
 from gpiod.line import Direction, Value
 
+from enviroplus import metrics
+
 MICS6814_GAIN = 6.144
 
 OUTH = gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.ACTIVE)
@@ -19,6 +21,7 @@ _is_available = False
 _adc_enabled = False
 _adc_gain = 6.148
 _heater = None
+_i2c_dev = None
 
 
 class Mics6814Reading(object):
@@ -43,19 +46,42 @@ ADC: {self.adc:05.02f} Volts
     __str__ = __repr__
 
 
-def setup():
-    global adc, adc_type, _is_setup, _is_available, _heater
+def setup(i2c_dev=None):
+    """Set up the gas sensor ADC and heater.
+
+    Called automatically on first read, call it first to use a shared bus.
+    Calling it again with a different i2c_dev sets the ADC up again on that bus.
+
+    :param i2c_dev: Optional SMBus compatible device, eg: from enviroplus.bus.BusManager
+
+    """
+    global _is_setup, _heater
     if _is_setup:
-        return
-    _is_setup = True
+        if i2c_dev is None or i2c_dev is _i2c_dev:
+            return
+        # Already set up on another bus, eg: automatically by a read
+        if not _setup_adc(i2c_dev) or _heater is not None:
+            return
+    else:
+        _is_setup = True
+        if not _setup_adc(i2c_dev):
+            return
+
+    _heater = gpiodevice.get_pin("GPIO24", "EnviroPlus", OUTH)
+
+    atexit.register(cleanup)
 
+
+def _setup_adc(i2c_dev):
+    global adc, adc_type, _is_available, _i2c_dev
+    _i2c_dev = i2c_dev
     try:
-        adc = ads1015.ADS1015(i2c_addr=0x49)
+        adc = ads1015.ADS1015(i2c_addr=0x49, i2c_dev=i2c_dev)
         adc_type = adc.detect_chip_type()
         _is_available = True
     except IOError:
         _is_available = False
-        return
+        return False
 
     adc.set_mode("single")
     adc.set_programmable_gain(MICS6814_GAIN)
@@ -63,10 +89,7 @@ def setup():
         adc.set_sample_rate(128)
     else:
         adc.set_sample_rate(1600)
-
-    _heater = gpiodevice.get_pin("GPIO24", "EnviroPlus", OUTH)
-
-    atexit.register(cleanup)
+    return True
 
 
 def available():
@@ -93,44 +116,63 @@ def cleanup():
     lines.set_value(offset, Value.INACTIVE)
 
 
+def _get_voltage(channel):
+    with metrics.timer("gas.conversion"):
+        return adc.get_voltage(channel)
+
+
+def _resistance(voltage):
+    try:
+        return (voltage * 56000) / (3.3 - voltage)
+    except ZeroDivisionError:
+        return 0
+
+
+def from_voltages(ox, red, nh3, adc=None):
+    """Return gas resistances from the voltages returned by read_voltages().
+
+    :param ox: Oxidising channel voltage
+    :param red: Reducing channel voltage
+    :param nh3: NH3 channel voltage
+    :param adc: Optional spare ADC channel voltage, returned unchanged
+
+    """
+    return Mics6814Reading(_resistance(ox), _resistance(red), _resistance(nh3), adc)
+
+
+@metrics.timed("gas.read_all")
 def read_all():
     """Return gas resistance for oxidising, reducing and NH3"""
-    setup()
+    return from_voltages(*read_voltages())
 
-    if not _is_available:
-        raise RuntimeError("Gas sensor not connected.")
 
-    ox = adc.get_voltage("in0/gnd")
-    red = adc.get_voltage("in1/gnd")
-    nh3 = adc.get_voltage("in2/gnd")
+def read_voltages():
+    """Return the raw ADC voltages for oxidising, reducing, NH3 and the spare ADC channel.
 
-    try:
-        ox = (ox * 56000) / (3.3 - ox)
-    except ZeroDivisionError:
-        ox = 0
+    The spare ADC channel is None unless enabled with enable_adc().
 
-    try:
-        red = (red * 56000) / (3.3 - red)
-    except ZeroDivisionError:
-        red = 0
+    """
+    setup()
 
-    try:
-        nh3 = (nh3 * 56000) / (3.3 - nh3)
-    except ZeroDivisionError:
-        nh3 = 0
+    if not _is_available:
+        raise RuntimeError("Gas sensor not connected.")
+
+    ox = _get_voltage("in0/gnd")
+    red = _get_voltage("in1/gnd")
+    nh3 = _get_voltage("in2/gnd")
 
     analog = None
 
     if _adc_enabled:
         if _adc_gain == MICS6814_GAIN:
-            analog = adc.get_voltage("ref/gnd")
+            analog = _get_voltage("ref/gnd")
         else:
             adc.set_programmable_gain(_adc_gain)
             time.sleep(0.05)
-            analog = adc.get_voltage("ref/gnd")
+            analog = _get_voltage("ref/gnd")
             adc.set_programmable_gain(MICS6814_GAIN)
 
-    return Mics6814Reading(ox, red, nh3, analog)
+    return ox, red, nh3, analog
 
 
 def read_oxidising():
@@ -0,0 +1,185 @@
+"""Compress sensor time series with delta-of-delta timestamps and XOR encoded values"""
+
+import numpy
+
+# (prefix, prefix bits, value bits) for increasingly large timestamp delta-of-deltas
+_DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12)
+)
+_MASK64 = (1 << 64) - 1
+
+
+class BitWriter:
+    def __init__(self):
+        """Write values of any number of bits, most significant bit first."""
+        self._buffer = bytearray()
+        self._value = 0
+        self._bits = 0
+
+    def write(self, value, bits):
+        """Write the lowest bits of a value.
+
+        :param value: Integer to write
+        :param bits: Number of bits to write
+
+        """
+        self._value = (self._value << bits) | (value & ((1 << bits) - 1))
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._buffer.append((self._value >> self._bits) & 0xff)
+        self._value &= (1 << self._bits) - 1
+
+    def getvalue(self):
+        """Return the bits written as bytes, padded with zeros to a whole byte."""
+        if self._bits == 0:
+            return bytes(self._buffer)
+        return bytes(self._buffer) + bytes(((self._value << (8 - self._bits)) & 0xff,))
+
+
+class BitReader:
+    def __init__(self, data):
+        """Read values written by a BitWriter.
+
+        :param data: bytes written by BitWriter
+
+        """
+        self._value = int.from_bytes(data, "big")
+        self._remaining = len(data) * 8
+
+    def read(self, bits):
+        """Read an unsigned value.
+
+        :param bits: Number of bits to read
+
+        """
+        if bits > self._remaining:
+            raise ValueError("Read past the end of the data")
+        self._remaining -= bits
+        return (self._value >> self._remaining) & ((1 << bits) - 1)
+
+
+def _signed(value):
+    return value - (1 << 64) if value >> 63 else value
+
+
+def encode(timestamps, values):
+    """Compress a series of samples.
+
+    Timestamps are stored as the difference between successive deltas, which is
+    usually zero for a sensor read at a fixed rate. Values are XOR'd with the
+    previous value and only the changed bits are stored.
+
+    Returns the compressed bytes, pass the number of samples to decode().
+
+    :param timestamps: Sequence of integer timestamps, eg: milliseconds, in order
+    :param values: Sequence of float values
+
+    """
+    if len(timestamps) != len(values):
+        raise ValueError("Timestamps and values must be the same length")
+    if len(timestamps) == 0:
+        return b""
+
+    bits = numpy.asarray(values, dtype="<f8").view("<u8").tolist()
+    timestamps = [int(t) for t in timestamps]
+
+    writer = BitWriter()
+    write = writer.write
+    write(timestamps[0], 64)
+    write(bits[0], 64)
+
+    previous_time = timestamps[0]
+    previous_delta = 0
+    previous_bits = bits[0]
+    leading = -1
+    trailing = 0
+
+    for timestamp, value in zip(timestamps[1:], bits[1:]):
+        delta = timestamp - previous_time
+        dod = delta - previous_delta
+        previous_time = timestamp
+        previous_delta = delta
+        if dod == 0:
+            write(0, 1)
+        else:
+            for prefix, prefix_bits, dod_bits in _DOD_BUCKETS:
+                offset = 1 << (dod_bits - 1)
+                if -offset < dod <= offset:
+                    write(prefix, prefix_bits)
+                    write(dod + offset - 1, dod_bits)
+                    break
+            else:
+                write(0b1111, 4)
+                write(dod & _MASK64, 64)
+
+        xor = value ^ previous_bits
+        previous_bits = value
+        if xor == 0:
+            write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if leading >= 0 and lead >= leading and trail >= trailing:
+            # Changed bits fit within the previous window
+            write(0b10, 2)
+            write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = lead, trail
+            length = 64 - lead - trail
+            write(0b11, 2)
+            write(lead, 5)
+            write(length, 6)  # 64 wraps to 0
+            write(xor >> trail, length)
+
+    return writer.getvalue()
+
+
+def decode(data, count):
+    """Decompress a series of samples.
+
+    Returns (timestamps, values) as int64 and float64 NumPy arrays.
+
+    :param data: bytes returned by encode()
+    :param count: Number of samples encoded
+
+    """
+    if count == 0:
+        return numpy.zeros(0, dtype="<i8"), numpy.zeros(0, dtype="<f8")
+
+    read = BitReader(data).read
+    timestamp = _signed(read(64))
+    value = read(64)
+    timestamps = [timestamp]
+    bits = [value]
+
+    delta = 0
+    leading = 0
+    trailing = 0
+
+    for _ in range(count - 1):
+        if read(1) == 0:
+            dod = 0
+        else:
+            for bucket in _DOD_BUCKETS:
+                if read(1) == 0:
+                    dod_bits = bucket[2]
+                    dod = read(dod_bits) - (1 << (dod_bits - 1)) + 1
+                    break
+            else:
+                dod = _signed(read(64))
+        delta += dod
+        timestamp += delta
+        timestamps.append(timestamp)
+
+        if read(1) == 1:
+            if read(1) == 1:
+                leading = read(5)
+                length = read(6) or 64
+                trailing = 64 - leading - length
+            value ^= read(64 - leading - trailing) << trailing
+        bits.append(value)
+
+    return numpy.array(timestamps, dtype="<i8"), numpy.array(bits, dtype="<u8").view("<f8")
@@ -0,0 +1,137 @@
+"""Query stored sensor history at a chosen resolution"""
+
+import bisect
+import time
+
+import numpy
+
+AGGREGATES = ("mean", "min", "max", "count", "last")
+
+
+class History:
+    def __init__(self, rollup=None, store=None):
+        """Query sensor history from rollups and stored samples.
+
+        Queries are answered from the coarsest enviroplus.rollup.Rollup resolution
+        that fits the requested step and still holds the whole time range. Older
+        ranges fall back to the raw samples in store.
+
+        :param rollup: Optional enviroplus.rollup.Rollup
+        :param store: Optional store with a query(metric, start, end) method returning
+            (timestamps, values) arrays, eg: enviroplus.storage.SeriesStore
+
+        """
+        self.rollup = rollup
+        self.store = store
+
+    def query(self, metric, start, end, step, agg="mean"):
+        """Return (timestamps, values) arrays with one value every step seconds.
+
+        Each timestamp is the start of its step, steps are aligned to multiples
+        of step since the epoch. Steps with no samples have a value of NaN,
+        or 0 for "count".
+
+        :param metric: Metric name
+        :param start: time.time() of the first sample to include
+        :param end: time.time() the samples end before
+        :param step: Time, in seconds, between values
+        :param agg: How samples in each step are combined, one of AGGREGATES
+
+        """
+        if agg not in AGGREGATES:
+            raise ValueError(f"Aggregate {agg!r} is not one of {AGGREGATES}")
+        if step <= 0:
+            raise ValueError("Step must be greater than 0")
+
+        start -= start % step
+        steps = max(0, int(numpy.ceil((end - start) / step)))
+        timestamps = start + numpy.arange(steps) * step
+
+        columns = self._rollup_columns(metric, start, end, step)
+        if columns is None and self.store is not None:
+            columns = self._store_columns(metric, start, end)
+        if columns is None:
+            columns = self._rollup_columns(metric, start, end, step, partial=True)
+        if columns is None:
+            columns = _columns(numpy.zeros(0), numpy.zeros(0))
+
+        return timestamps, _aggregate(columns, start, step, steps, agg)
+
+    def last(self, metric, duration, step, agg="mean"):
+        """Return (timestamps, values) arrays for the last duration seconds, eg: for a graph.
+
+        :param metric: Metric name
+        :param duration: Time, in seconds, to return
+        :param step: Time, in seconds, between values
+        :param agg: How samples in each step are combined, one of AGGREGATES
+
+        """
+        end = time.time()
+        return self.query(metric, end - duration, end, step, agg)
+
+    def _rollup_columns(self, metric, start, end, step, partial=False):
+        if self.rollup is None:
+            return None
+        # Coarsest first, a resolution must divide step so buckets do not straddle steps
+        for resolution in sorted(self.rollup.resolutions, reverse=True):
+            if resolution > step or step % resolution:
+                continue
+            buckets = self.rollup.buckets(metric, resolution, include_current=True)
+            if not buckets or (buckets[0].start > start and not partial):
+                continue
+            starts = [bucket.start for bucket in buckets]
+            buckets = buckets[bisect.bisect_left(starts, start):bisect.bisect_left(starts, end)]
+            counts = numpy.array([bucket.count for bucket in buckets], dtype="<f8")
+            return {
+                "timestamp": numpy.array([bucket.start for bucket in buckets], dtype="<f8"),
+                "count": counts,
+                "sum": numpy.array([bucket.mean for bucket in buckets], dtype="<f8") * counts,
+                "min": numpy.array([bucket.min for bucket in buckets], dtype="<f8"),
+                "max": numpy.array([bucket.max for bucket in buckets], dtype="<f8"),
+                "last": numpy.array([bucket.last for bucket in buckets], dtype="<f8")
+            }
+        return None
+
+    def _store_columns(self, metric, start, end):
+        timestamps, values = self.store.query(metric, start, end)
+        if len(timestamps) == 0:
+            return None
+        return _columns(timestamps, values)
+
+
+def _columns(timestamps, values):
+    values = numpy.asarray(values, dtype="<f8")
+    return {
+        "timestamp": numpy.asarray(timestamps, dtype="<f8"),
+        "count": numpy.ones(len(values)),
+        "sum": values,
+        "min": values,
+        "max": values,
+        "last": values
+    }
+
+
+def _aggregate(columns, start, step, steps, agg):
+    index = ((columns["timestamp"] - start) // step).astype(numpy.intp)
+    keep = (index >= 0) & (index < steps)
+    index = index[keep]
+
+    counts = numpy.bincount(index, weights=columns["count"][keep], minlength=steps)
+    if agg == "count":
+        return counts
+
+    result = numpy.full(steps, numpy.nan)
+    if agg == "mean":
+        sums = numpy.bincount(index, weights=columns["sum"][keep], minlength=steps)
+        numpy.divide(sums, counts, out=result, where=counts > 0)
+    elif agg == "min":
+        numpy.fmin.at(result, index, columns["min"][keep])
+    elif agg == "max":
+        numpy.fmax.at(result, index, columns["max"][keep])
+    else:
+        # Samples are in time order, so the highest position in each step is its last
+        positions = numpy.full(steps, -1, dtype=numpy.intp)
+        numpy.maximum.at(positions, index, numpy.arange(len(index)))
+        found = positions >= 0
+        result[found] = columns["last"][keep][positions[found]]
+    return result
@@ -0,0 +1,271 @@
+"""Read Enviro+ sensors at independent rates"""
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from enviroplus import metrics
+
+Sample = collections.namedtuple("Sample", ("metric", "value", "timestamp"))
+
+
+class Source:
+    def __init__(self, name, read, period):
+        """A sensor read at a fixed period.
+
+        :param name: Name of the source, eg: "bme280"
+        :param read: Function returning a dict of metric: value
+        :param period: Time, in seconds, between reads
+
+        """
+        self.name = name
+        self.read = read
+        self.period = period
+
+        self.next_due = None
+        self.busy = False
+        self.reads = 0
+        self.errors = 0
+        self.overruns = 0
+        self.last_error = None
+        self.last_duration = None
+
+    def __repr__(self):
+        return f"Source({self.name!r}, period={self.period}, reads={self.reads}, errors={self.errors}, overruns={self.overruns})"
+
+
+class Hub:
+    def __init__(self, workers=4, on_error=None):
+        """Multi-rate sensor scheduler.
+
+        Each source is read on a worker thread at its own period, so a slow sensor
+        does not hold up the others. Every value read is published to subscribers
+        as a Sample with a time.time() timestamp.
+
+        A source that is still busy when its next read falls due misses that read,
+        this is counted in Source.overruns.
+
+        :param workers: Number of worker threads
+        :param on_error: Optional function accepting (source, exception) for failed reads
+
+        """
+        self.workers = workers
+        self.on_error = on_error
+        self._sources = []
+        self._subscribers = []
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._executor = None
+
+    @property
+    def sources(self):
+        return list(self._sources)
+
+    def add(self, source):
+        """Add a source, it will be read immediately if the hub is running.
+
+        :param source: Source to add
+
+        """
+        with self._condition:
+            source.next_due = time.monotonic()
+            self._sources.append(source)
+            self._condition.notify()
+        return source
+
+    def remove(self, source):
+        """Remove a source.
+
+        :param source: Source to remove
+
+        """
+        with self._condition:
+            self._sources.remove(source)
+
+    def subscribe(self, callback):
+        """Call a function with every Sample.
+
+        Callbacks are called from worker threads and should return quickly.
+
+        :param callback: Function accepting a Sample
+
+        """
+        self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        """Stop calling a function with every Sample.
+
+        :param callback: Function previously passed to subscribe()
+
+        """
+        self._subscribers = [s for s in self._subscribers if s != callback]
+
+    def start(self):
+        """Start reading sources in the background."""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enviroplus-hub")
+        self._thread = threading.Thread(target=self._run, name="enviroplus-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop reading sources, waiting for any reads in progress to finish."""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self._thread = self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                timeout = None
+                for source in self._sources:
+                    if source.next_due <= now:
+                        if source.busy:
+                            source.overruns += 1
+                        else:
+                            source.busy = True
+                            self._executor.submit(self._read, source)
+                        source.next_due += source.period
+                        if source.next_due <= now:
+                            missed = int((now - source.next_due) // source.period) + 1
+                            source.overruns += missed
+                            source.next_due += missed * source.period
+                    wait = source.next_due - now
+                    if timeout is None or wait < timeout:
+                        timeout = wait
+                self._condition.wait(timeout)
+
+    def _read(self, source):
+        start = time.monotonic()
+        try:
+            values = source.read()
+        except Exception as e:
+            source.errors += 1
+            source.last_error = e
+            metrics.increment(f"{source.name}.read.errors")
+            if self.on_error is not None:
+                self.on_error(source, e)
+            values = {}
+        finally:
+            source.reads += 1
+            source.last_duration = time.monotonic() - start
+            metrics.observe(f"{source.name}.read", source.last_duration)
+            with self._condition:
+                source.busy = False
+
+        with metrics.timer("hub.publish"):
+            self.publish(values)
+
+    def publish(self, values, timestamp=None):
+        """Publish a dict of metric: value to subscribers.
+
+        :param values: Dict of metric: value
+        :param timestamp: Optional time.time() timestamp, defaults to now
+
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        subscribers = self._subscribers
+        for metric, value in values.items():
+            sample = Sample(metric, value, timestamp)
+            for callback in subscribers:
+                callback(sample)
+
+
+def bme280_source(bme280, period=1.0):
+    """Return a Source for temperature, pressure and humidity.
+
+    :param bme280: BME280 instance
+    :param period: Time, in seconds, between reads
+
+    """
+    def read():
+        return {
+            "temperature": bme280.get_temperature(),
+            "pressure": bme280.get_pressure(),
+            "humidity": bme280.get_humidity()
+        }
+    return Source("bme280", read, period)
+
+
+def ltr559_source(ltr559, period=0.5):
+    """Return a Source for lux and proximity.
+
+    :param ltr559: LTR559 instance
+    :param period: Time, in seconds, between reads
+
+    """
+    def read():
+        return {
+            "lux": ltr559.get_lux(),
+            "proximity": ltr559.get_proximity()
+        }
+    return Source("ltr559", read, period)
+
+
+def gas_source(period=1.0, gas=None):
+    """Return a Source for the MICS6814 gas sensor, and the spare ADC channel if enabled.
+
+    :param period: Time, in seconds, between reads
+    :param gas: Optional object with read_all(), defaults to enviroplus.gas, eg: a replayed session
+
+    """
+    if gas is None:
+        from enviroplus import gas
+
+    def read():
+        reading = gas.read_all()
+        values = {
+            "oxidising": reading.oxidising,
+            "reducing": reading.reducing,
+            "nh3": reading.nh3
+        }
+        if reading.adc is not None:
+            values["adc"] = reading.adc
+        return values
+    return Source("gas", read, period)
+
+
+def pms5003_source(pms5003, period=1.0):
+    """Return a Source for PM1.0, PM2.5 and PM10 particulate readings.
+
+    :param pms5003: PMS5003 instance
+    :param period: Time, in seconds, between reads
+
+    """
+    def read():
+        data = pms5003.read()
+        return {
+            "pm1": data.pm_ug_per_m3(1.0),
+            "pm25": data.pm_ug_per_m3(2.5),
+            "pm10": data.pm_ug_per_m3(10)
+        }
+    return Source("pms5003", read, period)
+
+
+def noise_source(noise, period=5.0):
+    """Return a Source for the low, mid, high and total noise profile.
+
+    :param noise: enviroplus.noise.Noise instance
+    :param period: Time, in seconds, between reads
+
+    """
+    def read():
+        return dict(zip(("noise_low", "noise_mid", "noise_high", "noise_total"), noise.get_noise_profile()))
+    return Source("noise", read, period)
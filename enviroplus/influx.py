@@ -0,0 +1,209 @@
+"""Upload sensor readings to InfluxDB in line protocol"""
+
+import gzip
+import http.client
+import math
+import urllib.parse
+
+from enviroplus import metrics
+from enviroplus.spool import Spool
+from enviroplus.storage import _BatchWriter
+
+# Rejected as malformed or too large, retrying would fail again
+_REJECTED = (400, 413, 422)
+
+
+def _escape(text, special):
+    text = str(text).replace("\\", "\\\\")
+    for character in special:
+        text = text.replace(character, f"\\{character}")
+    return text
+
+
+def _measurement(name):
+    return _escape(name, ", ")
+
+
+def _key(name):
+    return _escape(name, ",= ")
+
+
+class InfluxWriter(_BatchWriter):
+    _thread_name = "enviroplus-influx"
+
+    def __init__(self, url, spool, token=None, measurement="enviroplus", tags=None, batch_size=1000, interval=10.0,
+                 spool_bytes=16 * 1024 * 1024, drain_bytes=1024 * 1024, compresslevel=6, timeout=10.0):
+        """Batched InfluxDB line protocol writer.
+
+        Each metric is written as a field of measurement, eg: "enviroplus,host=pi temperature=21.5 1700000000000".
+        The measurement, tags and field key of every metric are escaped and joined once,
+        a sample only adds its value and millisecond timestamp.
+
+        Samples are buffered like SQLiteSink, each batch is gzip compressed and POSTed
+        over one persistent connection. Batches that fail to send are kept in an
+        enviroplus.spool.Spool, up to spool_bytes, and once a POST succeeds are sent
+        oldest first, several batches per POST. Batches InfluxDB rejects as malformed
+        are dropped. The spool directory is required so readings are never lost to a
+        network outage by default, pass spool=None to drop failed batches instead.
+
+        :param url: Write endpoint, eg: "http://influxdb:8086/api/v2/write?org=home&bucket=enviroplus" or "http://influxdb:8086/write?db=enviroplus"
+        :param spool: Directory to keep failed batches in, created if needed, or None to drop them
+        :param token: Optional API token, sent as "Authorization: Token <token>"
+        :param measurement: Measurement name
+        :param tags: Optional dict of tag: value added to every sample, eg: {"host": "enviroplus"}
+        :param batch_size: Number of buffered samples that triggers a write
+        :param interval: Maximum time, in seconds, a sample is buffered
+        :param spool_bytes: Maximum size of the spooled batches, the oldest are dropped first
+        :param drain_bytes: Maximum size of the spooled batches sent in one POST
+        :param compresslevel: gzip compression level, 1 (fastest) to 9 (smallest)
+        :param timeout: Time, in seconds, to wait for InfluxDB
+
+        """
+        _BatchWriter.__init__(self, batch_size, interval)
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme {parsed.scheme!r}")
+        query = urllib.parse.parse_qsl(parsed.query)
+        if not any(key == "precision" for key, _ in query):
+            query.append(("precision", "ms"))
+        elif ("precision", "ms") not in query:
+            raise ValueError("Timestamps are written in milliseconds, use precision=ms")
+
+        self.url = url
+        self.compresslevel = compresslevel
+        self.drain_bytes = drain_bytes
+        self.timeout = timeout
+        self.sent = 0
+        self.dropped = 0
+
+        self._scheme = parsed.scheme
+        self._netloc = parsed.netloc
+        self._path = f"{parsed.path or '/'}?{urllib.parse.urlencode(query)}"
+        self._headers = {
+            "Content-Type": "text/plain; charset=utf-8",
+            "Content-Encoding": "gzip"
+        }
+        if token is not None:
+            self._headers["Authorization"] = f"Token {token}"
+
+        self._series = _measurement(measurement) + "".join(
+            f",{_key(key)}={_key(value)}" for key, value in sorted((tags or {}).items())
+        )
+        self._prefixes = {}
+        self._connection = None
+        self._spool = None
+        if spool is not None:
+            self._spool = Spool(spool, max_bytes=spool_bytes, segment_bytes=max(1, min(1024 * 1024, spool_bytes // 16)))
+
+    @property
+    def spooled(self):
+        """Size, in bytes, of the failed batches waiting to be sent."""
+        return 0 if self._spool is None else self._spool.pending
+
+    def _prefix(self, metric):
+        prefix = self._prefixes.get(metric)
+        if prefix is None:
+            prefix = self._prefixes[metric] = f"{self._series} {_key(metric)}="
+        return prefix
+
+    def encode(self, samples):
+        """Return a list of (timestamp, metric, value) samples as line protocol bytes.
+
+        Values that are not finite numbers are skipped, InfluxDB cannot store them.
+
+        :param samples: List of (time.time() timestamp, metric, value) tuples
+
+        """
+        prefix = self._prefix
+        lines = []
+        for timestamp, metric, value in samples:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if not math.isfinite(value):
+                continue
+            lines.append(f"{prefix(metric)}{value!r} {int(timestamp * 1000)}\n")
+        return "".join(lines).encode("utf-8")
+
+    def _write(self, pending):
+        body = self.encode(pending)
+        if not body:
+            return
+        body = gzip.compress(body, compresslevel=self.compresslevel)
+
+        status = self._post(body)
+        if status is None or not self._finished(status):
+            if self._spool is not None:
+                self._spool.put(body)
+            else:
+                self.dropped += 1
+        elif self._spool is not None and self._spool.pending:
+            self._drain()
+
+    def _drain(self):
+        while self._spool.pending:
+            records = self._spool.read(max_bytes=self.drain_bytes)
+            # Concatenated gzip members are a valid gzip stream, so spooled batches can be sent together
+            status = self._post(b"".join(record.data for record in records))
+            if status in _REJECTED and len(records) > 1:
+                # Send them one at a time to only drop the rejected batch
+                for record in records:
+                    status = self._post(record.data)
+                    if status is None or not self._finished(status):
+                        return
+                    self._spool.ack(record.offset)
+                continue
+            if status is None or not self._finished(status):
+                return
+            self._spool.ack(records[-1].offset)
+
+    def _finished(self, status):
+        # True if the batch has been sent, or was rejected and is dropped
+        if 200 <= status < 300:
+            return True
+        if status in _REJECTED:
+            self.dropped += 1
+            return True
+        return False
+
+    def _post(self, body):
+        # Returns the response status, or None if InfluxDB could not be reached
+        while True:
+            # An idle keep-alive connection may have been closed by the server, retry those once
+            reused = self._connection is not None
+            try:
+                with metrics.timer("influx.post"):
+                    if self._connection is None:
+                        connection = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+                        self._connection = connection(self._netloc, timeout=self.timeout)
+                    self._connection.request("POST", self._path, body, self._headers)
+                    response = self._connection.getresponse()
+                    detail = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._disconnect()
+                if reused:
+                    metrics.increment("influx.post.retries")
+                    continue
+                self.errors += 1
+                self.last_error = e
+                return None
+
+        if 200 <= response.status < 300:
+            self.sent += 1
+        else:
+            self.errors += 1
+            self.last_error = IOError(f"InfluxDB returned {response.status}: {detail[:200].decode('utf-8', 'replace')}")
+            metrics.increment("influx.post.errors")
+        return response.status
+
+    def _disconnect(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _close(self):
+        self._disconnect()
+        if self._spool is not None:
+            self._spool.close()
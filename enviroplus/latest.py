@@ -0,0 +1,127 @@
+"""Cache the latest reading of every sensor"""
+
+import collections
+import threading
+import time
+
+Reading = collections.namedtuple("Reading", ("value", "timestamp", "monotonic"))
+
+
+class _Refresh:
+    def __init__(self, metrics, read):
+        self.metrics = tuple(metrics)
+        self.read = read
+        self.lock = threading.Lock()
+        self.count = 0
+
+
+class LatestValues:
+    def __init__(self):
+        """Latest value of every metric, with a timestamp.
+
+        Values can be pushed in with update() or add_sample(), eg: as an enviroplus.hub
+        subscriber, or pulled on demand by registering a refresh function for them.
+
+        Readers ask for a maximum age. If the cached value is older, the metric's refresh
+        function is called, and however many threads ask at once it is only called once.
+
+        """
+        self._values = {}
+        self._refreshers = {}
+
+    def register(self, metrics, read):
+        """Register a function to refresh a group of metrics.
+
+        :param metrics: List of metric names returned by read
+        :param read: Function returning a dict of metric: value, eg: an enviroplus.hub Source.read
+
+        """
+        refresh = _Refresh(metrics, read)
+        for metric in metrics:
+            self._refreshers[metric] = refresh
+
+    def update(self, metric, value, timestamp=None):
+        """Store the latest value for a metric.
+
+        :param metric: Metric name
+        :param value: Latest value
+        :param timestamp: Optional time.time() the value was read, defaults to now
+
+        """
+        now = time.time()
+        monotonic = time.monotonic()
+        if timestamp is None:
+            timestamp = now
+        else:
+            monotonic -= now - timestamp
+        self._values[metric] = Reading(value, timestamp, monotonic)
+
+    def add_sample(self, sample):
+        """Store the value of an enviroplus.hub Sample, use as a Hub subscriber.
+
+        :param sample: Sample to store
+
+        """
+        self.update(sample.metric, sample.value, sample.timestamp)
+
+    def age(self, metric):
+        """Return the age of a metric in seconds, or None if it has never been read.
+
+        :param metric: Metric name
+
+        """
+        reading = self._values.get(metric)
+        if reading is None:
+            return None
+        return time.monotonic() - reading.monotonic
+
+    def get_reading(self, metric, max_age=None):
+        """Return the latest Reading for a metric, refreshing it if older than max_age.
+
+        Raises KeyError if the metric has never been read, and ValueError if it is older
+        than max_age and cannot be refreshed, eg: its refresh function did not return it.
+
+        :param metric: Metric name
+        :param max_age: Maximum age in seconds, or None to accept any cached value
+
+        """
+        reading = self._values.get(metric)
+        if reading is not None and (max_age is None or time.monotonic() - reading.monotonic <= max_age):
+            return reading
+
+        refresh = self._refreshers.get(metric)
+        if refresh is None:
+            if reading is None:
+                raise KeyError(metric)
+            raise ValueError(f"{metric} is older than {max_age}s and cannot be refreshed")
+
+        with refresh.lock:
+            # Another reader may have refreshed it while we waited for the lock
+            reading = self._values.get(metric)
+            if reading is not None and (max_age is None or time.monotonic() - reading.monotonic <= max_age):
+                return reading
+
+            values = refresh.read()
+            refresh.count += 1
+            for key, value in values.items():
+                self.update(key, value)
+
+        if metric not in values:
+            group = ", ".join(refresh.metrics)
+            if reading is None:
+                raise KeyError(f"Refreshing {group} did not return {metric}")
+            raise ValueError(f"{metric} is older than {max_age}s and refreshing {group} did not return it")
+        return self._values[metric]
+
+    def get(self, metric, max_age=None):
+        """Return the latest value for a metric, refreshing it if older than max_age.
+
+        :param metric: Metric name
+        :param max_age: Maximum age in seconds, or None to accept any cached value
+
+        """
+        return self.get_reading(metric, max_age).value
+
+    def snapshot(self):
+        """Return a dict of metric: Reading for every cached metric."""
+        return dict(self._values)
@@ -0,0 +1,205 @@
+"""Time sensor reads and processing into latency histograms"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets, the last bucket counts anything slower
+BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0
+)
+
+_enabled = os.environ.get("ENVIROPLUS_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    __slots__ = "counts", "count", "sum", "max"
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.max = self.max
+        return histogram
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, quantile):
+        """Return the upper bound of the bucket holding a quantile, or None if empty.
+
+        Latencies above the last bucket are reported as the maximum seen.
+
+        :param quantile: Quantile as a float, 0.9 = 90th percentile
+
+        """
+        if self.count == 0:
+            return None
+        target = quantile * self.count
+        total = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            total += count
+            if total >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def __repr__(self):
+        if self.count == 0:
+            return "Count: 0"
+        return f"""Count: {self.count}
+Mean: {self.mean:.6f} s
+P50: {self.quantile(0.5):.6f} s
+P99: {self.quantile(0.99):.6f} s
+Max: {self.max:.6f} s"""
+
+    __str__ = __repr__
+
+
+class _Timer:
+    __slots__ = "name", "start"
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            increment(f"{self.name}.errors")
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(value=True):
+    """Start or stop collecting metrics.
+
+    Collection is off by default, or on if the ENVIROPLUS_METRICS environment
+    variable is set to anything but 0. While off every hook returns immediately.
+
+    :param value: True to collect metrics
+
+    """
+    global _enabled
+    _enabled = value
+
+
+def enabled():
+    return _enabled
+
+
+def observe(name, seconds):
+    """Add a latency to a histogram.
+
+    :param name: Histogram name, eg: "gas.read_all"
+    :param seconds: Latency in seconds
+
+    """
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def increment(name, count=1):
+    """Add to a counter.
+
+    :param name: Counter name, eg: "pms5003.resets"
+    :param count: Amount to add
+
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + count
+
+
+def timer(name):
+    """Return a context manager that times its block into a histogram.
+
+    An exception leaving the block also increments the "{name}.errors" counter.
+
+    :param name: Histogram name, eg: "noise.fft"
+
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    """Decorate a function to time every call into a histogram, see timer().
+
+    :param name: Histogram name
+
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Return a copy of every metric collected so far.
+
+    Returns a dict with "histograms", a dict of name: Histogram, and "counters",
+    a dict of name: count.
+
+    """
+    with _lock:
+        return {
+            "histograms": {name: histogram.copy() for name, histogram in _histograms.items()},
+            "counters": dict(_counters)
+        }
+
+
+def reset():
+    """Discard every metric collected so far."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -1,36 +1,224 @@
+import json
+import os
+import time
+
 import numpy
 import sounddevice
 
+from enviroplus import metrics
+
+_calibrations = {}
+
+
+class Calibration:
+    def __init__(self, sensitivity=-26.0, frequencies=None, response=None):
+        """Microphone calibration.
+
+        Converts FFT magnitudes into pressure, so band levels can be expressed in dB SPL.
+
+        :param sensitivity: Microphone sensitivity in dBFS for a 94dB SPL 1kHz tone
+        :param frequencies: Optional list of frequencies (in Hz) for the response correction
+        :param response: Optional list of microphone response (in dB, relative to 1kHz) at each frequency
+
+        """
+        if (frequencies is None) != (response is None):
+            raise ValueError("Both frequencies and response must be given")
+
+        self.sensitivity = sensitivity
+        self.frequencies = frequencies
+        self.response = response
+        self._gains = {}
+
+    def gain(self, sample_rate, count, n):
+        """Return the per-bin gain for an n point rfft of count samples.
+
+        Gains are cached, so this is only computed once for each capture size.
+
+        :param sample_rate: Sample rate in Hz
+        :param count: Number of samples captured
+        :param n: FFT length
+
+        """
+        key = sample_rate, count, n
+        try:
+            return self._gains[key]
+        except KeyError:
+            pass
+
+        correction = 94.0 - self.sensitivity
+        if self.frequencies is not None:
+            correction = correction - numpy.interp(numpy.fft.rfftfreq(n, 1.0 / sample_rate), self.frequencies, self.response)
+
+        gain = (2.0 / numpy.sqrt(n * count)) * 10 ** (correction / 20.0)
+        self._gains[key] = gain
+        return gain
+
+    def apply(self, magnitude, sample_rate, count):
+        """Return the FFT magnitude scaled to pressure relative to 20uPa.
+
+        :param magnitude: FFT magnitude from an rfft
+        :param sample_rate: Sample rate in Hz
+        :param count: Number of samples captured
+
+        """
+        return magnitude * self.gain(sample_rate, count, (len(magnitude) - 1) * 2)
+
+
+def load_calibration(path):
+    """Load a microphone calibration from a JSON file.
+
+    The file should contain a "sensitivity" and optionally "frequencies" and "response" lists.
+
+    Calibrations are cached, so each file is only read once.
+
+    :param path: Path to calibration file
+
+    """
+    try:
+        return _calibrations[path]
+    except KeyError:
+        pass
+
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    calibration = Calibration(
+        sensitivity=data["sensitivity"],
+        frequencies=data.get("frequencies"),
+        response=data.get("response")
+    )
+    _calibrations[path] = calibration
+    return calibration
+
+
+def _spl(pressure):
+    return 10 * numpy.log10(numpy.sum(numpy.square(pressure)))
+
+
+class P2Quantile:
+    def __init__(self, quantile):
+        """Streaming quantile estimate using the P-Square algorithm.
+
+        Tracks a single quantile in constant memory without storing observations.
+        See Jain & Chlamtac, "The P2 algorithm for dynamic calculation of quantiles and histograms without storing observations".
+
+        :param quantile: Quantile to estimate (as a float, 0.5 = median)
+
+        """
+        if not 0.0 < quantile < 1.0:
+            raise ValueError("Quantile must be between 0 and 1")
+        self.quantile = quantile
+        self.reset()
+
+    def reset(self):
+        """Discard all observations."""
+        p = self.quantile
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        """Add an observation.
+
+        :param value: Observed value
+
+        """
+        self.count += 1
+        q = self._heights
+
+        if self.count <= 5:
+            q.append(value)
+            q.sort()
+            return
+
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    @property
+    def value(self):
+        """Current estimate of the quantile, or None if nothing has been observed."""
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            return self._heights[min(int(self.quantile * self.count), self.count - 1)]
+        return self._heights[2]
+
 
 class Noise:
-    def __init__(self, sample_rate=16000, duration=0.5):
+    BANDS = "low", "mid", "high", "total"
+
+    def __init__(self, sample_rate=16000, duration=0.5, calibration=None, quantiles=None):
         """Noise measurement.
 
+        If a calibration is supplied, all amplitudes are returned in dB SPL.
+
+        If quantiles are supplied, each noise profile updates a streaming estimate of those
+        quantiles for every band, see get_noise_quantiles().
+
         :param sample_rate: Sample rate in Hz
         :param duraton: Duration, in seconds, of noise sample capture
+        :param calibration: Optional Calibration, or path to a calibration file
+        :param quantiles: Optional list of quantiles to track (as floats, 0.9 = 90th percentile)
 
         """
 
         self.duration = duration
         self.sample_rate = sample_rate
+        if isinstance(calibration, str):
+            calibration = load_calibration(calibration)
+        self.calibration = calibration
+        self._quantiles = None
+        if quantiles is not None:
+            self._quantiles = {band: [P2Quantile(q) for q in quantiles] for band in self.BANDS}
 
     def get_amplitudes_at_frequency_ranges(self, ranges):
         """Return the mean amplitude of frequencies in the given ranges.
 
+        If calibrated, returns the level of each range in dB SPL.
+
         :param ranges: List of ranges including a start and end range
 
         """
-        recording = self._record()
-        magnitude = numpy.abs(numpy.fft.rfft(recording[:, 0], n=self.sample_rate))
+        magnitude = self._magnitude()
         result = []
         for r in ranges:
             start, end = r
-            result.append(numpy.mean(magnitude[start:end]))
+            result.append(self._level(magnitude[start:end]))
         return result
 
     def get_amplitude_at_frequency_range(self, start, end):
         """Return the mean amplitude of frequencies in the specified range.
 
+        If calibrated, returns the level of the range in dB SPL.
+
         :param start: Start frequency (in Hz)
         :param end: End frequency (in Hz)
 
@@ -39,27 +227,28 @@ class Noise:
         if start > n or end > n:
             raise ValueError(f"Maximum frequency is {n}")
 
-        recording = self._record()
-        magnitude = numpy.abs(numpy.fft.rfft(recording[:, 0], n=self.sample_rate))
-        return numpy.mean(magnitude[start:end])
+        magnitude = self._magnitude()
+        return self._level(magnitude[start:end])
 
-    def get_noise_profile(self, noise_floor=100, low=0.12, mid=0.36, high=None):
+    def get_noise_profile(self, noise_floor=100, low=0.12, mid=0.36, high=None, recording=None):
         """Returns a noise characteristic profile.
 
         Bins all frequencies into 3 weighted groups expressed as a percentage of the total frequency range.
 
+        If calibrated, each group and the total are returned as a level in dB SPL.
+
         :param noise_floor: "High-pass" frequency, exclude frequencies below this value
         :param low: Percentage of frequency ranges to count in the low bin (as a float, 0.5 = 50%)
         :param mid: Percentage of frequency ranges to count in the mid bin (as a float, 0.5 = 50%)
         :param high: Optional percentage for high bin, effectively creates a "Low-pass" if total percentage is less than 100%
+        :param recording: Optional (samples, 1) array to analyse instead of capturing a new recording
 
         """
 
         if high is None:
             high = 1.0 - low - mid
 
-        recording = self._record()
-        magnitude = numpy.abs(numpy.fft.rfft(recording[:, 0], n=self.sample_rate))
+        magnitude = self._magnitude(recording)
 
         sample_count = (self.sample_rate // 2) - noise_floor
 
@@ -67,13 +256,101 @@ class Noise:
         high_start = mid_start + int(sample_count * mid)
         noise_ceiling = high_start + int(sample_count * high)
 
-        amp_low = numpy.mean(magnitude[noise_floor:mid_start])
-        amp_mid = numpy.mean(magnitude[mid_start:high_start])
-        amp_high = numpy.mean(magnitude[high_start:noise_ceiling])
-        amp_total = (amp_low + amp_mid + amp_high) / 3.0
+        amp_low = self._level(magnitude[noise_floor:mid_start])
+        amp_mid = self._level(magnitude[mid_start:high_start])
+        amp_high = self._level(magnitude[high_start:noise_ceiling])
+
+        if self.calibration is not None:
+            amp_total = _spl(magnitude[noise_floor:noise_ceiling])
+        else:
+            amp_total = (amp_low + amp_mid + amp_high) / 3.0
+
+        if self._quantiles is not None:
+            for band, level in zip(self.BANDS, (amp_low, amp_mid, amp_high, amp_total)):
+                for quantile in self._quantiles[band]:
+                    quantile.add(float(level))
 
         return amp_low, amp_mid, amp_high, amp_total
 
+    def get_noise_quantiles(self, band):
+        """Return the tracked quantiles of a band's level across all noise profiles.
+
+        Returns a dict of quantile: level, with None for each quantile until a profile has been taken.
+
+        :param band: One of "low", "mid", "high" or "total"
+
+        """
+        if self._quantiles is None:
+            raise RuntimeError("Noise was not created with quantiles")
+        return {quantile.quantile: quantile.value for quantile in self._quantiles[band]}
+
+    def reset_noise_quantiles(self):
+        """Discard all tracked quantiles, eg: at the start of each day."""
+        if self._quantiles is None:
+            return
+        for quantiles in self._quantiles.values():
+            for quantile in quantiles:
+                quantile.reset()
+
+    def open_stream(self, callback, blocksize=1024):
+        """Start a non-blocking capture stream.
+
+        The callback is called from the audio thread with a 1D array of samples
+        and the time.monotonic() timestamp of the first sample in the block.
+        The array is only valid for the duration of the call, copy it if you need to keep it.
+
+        Returns the running sounddevice.InputStream, call stop() and close() on it when finished.
+
+        :param callback: Function accepting (block, timestamp)
+        :param blocksize: Number of samples per block
+
+        """
+        sample_rate = self.sample_rate
+
+        def _callback(indata, frames, time_info, status):
+            if status:
+                metrics.increment("noise.overflows")
+            with metrics.timer("noise.block"):
+                callback(indata[:, 0], time.monotonic() - frames / sample_rate)
+
+        stream = sounddevice.InputStream(
+            device="adau7002",
+            samplerate=self.sample_rate,
+            blocksize=blocksize,
+            channels=1,
+            dtype="float64",
+            callback=_callback
+        )
+        stream.start()
+        return stream
+
+    def publish(self, ring):
+        """Start a capture stream that writes each block into a shared AudioRing.
+
+        Returns the running sounddevice.InputStream, call stop() and close() on it when finished.
+
+        :param ring: AudioRing created with this sample rate
+
+        """
+        if ring.sample_rate != self.sample_rate:
+            raise ValueError(f"AudioRing sample rate {ring.sample_rate} does not match {self.sample_rate}")
+        return self.open_stream(ring.write, blocksize=ring.blocksize)
+
+    def _magnitude(self, recording=None):
+        if recording is None:
+            with metrics.timer("noise.capture"):
+                recording = self._record()
+        with metrics.timer("noise.fft"):
+            magnitude = numpy.abs(numpy.fft.rfft(recording[:, 0], n=self.sample_rate))
+            if self.calibration is not None:
+                magnitude = self.calibration.apply(magnitude, self.sample_rate, len(recording))
+        return magnitude
+
+    def _level(self, magnitude):
+        if self.calibration is not None:
+            return _spl(magnitude)
+        return numpy.mean(magnitude)
+
     def _record(self):
         return sounddevice.rec(
             int(self.duration * self.sample_rate),
@@ -83,3 +360,224 @@ class Noise:
             channels=1,
             dtype="float64"
         )
+
+
+class EventDetector:
+    def __init__(self, bands, sample_rate=16000, blocksize=1024, on_onset=None, on_peak=None, calibration=None):
+        """Acoustic event detection on a streaming capture.
+
+        Each band is a (start, end, threshold, hysteresis) tuple with frequencies in Hz.
+        A band's level is the mean FFT magnitude of its frequencies within a single block,
+        or its level in dB SPL if a calibration is supplied.
+
+        An event starts when a band's level rises above its threshold, on_onset is called
+        with (band, level, timestamp) from the same block.
+
+        An event ends when the level falls below threshold - hysteresis, on_peak is called
+        with (band, level, timestamp) for the loudest block of the event.
+
+        Pass process() as the callback to Noise.open_stream with the same blocksize.
+
+        :param bands: List of (start, end, threshold, hysteresis) tuples
+        :param sample_rate: Sample rate in Hz
+        :param blocksize: Number of samples per block
+        :param on_onset: Function accepting (band, level, timestamp)
+        :param on_peak: Function accepting (band, level, timestamp)
+        :param calibration: Optional Calibration, or path to a calibration file
+
+        """
+        n = sample_rate // 2
+        for start, end, threshold, hysteresis in bands:
+            if start > n or end > n:
+                raise ValueError(f"Maximum frequency is {n}")
+
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.on_onset = on_onset
+        self.on_peak = on_peak
+        if isinstance(calibration, str):
+            calibration = load_calibration(calibration)
+        self.calibration = calibration
+
+        bands = numpy.array(bands, dtype="float64").reshape(-1, 4)
+        self._starts = (bands[:, 0] * blocksize // sample_rate).astype(int)
+        self._ends = numpy.maximum((bands[:, 1] * blocksize // sample_rate).astype(int), self._starts + 1)
+        self._on = bands[:, 2]
+        self._off = bands[:, 2] - bands[:, 3]
+
+        count = len(bands)
+        self.active = numpy.zeros(count, dtype=bool)
+        self._peak_level = numpy.zeros(count)
+        self._peak_time = numpy.zeros(count)
+
+    def levels(self, block):
+        """Return the level of each band for a single block of samples.
+
+        :param block: 1D array of samples
+
+        """
+        with metrics.timer("noise.levels"):
+            magnitude = numpy.abs(numpy.fft.rfft(block, n=self.blocksize))
+            if self.calibration is not None:
+                pressure = self.calibration.apply(magnitude, self.sample_rate, len(block))
+                total = numpy.concatenate(([0.0], numpy.cumsum(numpy.square(pressure))))
+                return 10 * numpy.log10(total[self._ends] - total[self._starts])
+            total = numpy.concatenate(([0.0], numpy.cumsum(magnitude)))
+            return (total[self._ends] - total[self._starts]) / (self._ends - self._starts)
+
+    def process(self, block, timestamp):
+        """Process a block of samples, firing any onset or peak callbacks.
+
+        :param block: 1D array of samples
+        :param timestamp: Time of the first sample in the block
+
+        """
+        levels = self.levels(block)
+
+        louder = self.active & (levels > self._peak_level)
+        self._peak_level[louder] = levels[louder]
+        self._peak_time[louder] = timestamp
+
+        for band in numpy.flatnonzero(~self.active & (levels > self._on)):
+            self.active[band] = True
+            self._peak_level[band] = levels[band]
+            self._peak_time[band] = timestamp
+            if self.on_onset is not None:
+                self.on_onset(int(band), float(levels[band]), timestamp)
+
+        for band in numpy.flatnonzero(self.active & (levels < self._off)):
+            self.active[band] = False
+            if self.on_peak is not None:
+                self.on_peak(int(band), float(self._peak_level[band]), float(self._peak_time[band]))
+
+        return levels
+
+
+class AudioRing:
+    _HEADER = 4  # sequence, blocksize, capacity, sample_rate
+
+    def __init__(self, name=None, create=False, sample_rate=16000, blocksize=1024, capacity=64):
+        """Shared memory ring buffer of audio blocks.
+
+        One process creates the ring and writes to it, usually with Noise.publish(),
+        any number of other processes can attach to it by name and read blocks without copying.
+
+        Every block has a sequence number, readers use it to detect blocks they have missed
+        and blocks that were overwritten while they were being read.
+
+        :param name: Shared memory name, generated if not given when creating
+        :param create: True to create the ring, False to attach to an existing one
+        :param sample_rate: Sample rate in Hz, ignored when attaching
+        :param blocksize: Number of samples per block, ignored when attaching
+        :param capacity: Number of blocks in the ring, ignored when attaching
+
+        """
+        from multiprocessing import shared_memory
+
+        if create:
+            size = (self._HEADER + capacity * (blocksize + 2)) * 8
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = numpy.ndarray((self._HEADER,), dtype="int64", buffer=self._shm.buf)
+            header[:] = 0, blocksize, capacity, sample_rate
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            _untrack(self._shm)
+            header = numpy.ndarray((self._HEADER,), dtype="int64", buffer=self._shm.buf)
+            blocksize, capacity, sample_rate = (int(v) for v in header[1:])
+
+        self.name = self._shm.name
+        self.blocksize = blocksize
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._owner = create
+
+        offset = self._HEADER * 8
+        self._header = header
+        self._timestamps = numpy.ndarray((capacity,), dtype="float64", buffer=self._shm.buf, offset=offset)
+        offset += capacity * 8
+        self._sequences = numpy.ndarray((capacity,), dtype="int64", buffer=self._shm.buf, offset=offset)
+        offset += capacity * 8
+        self._blocks = numpy.ndarray((capacity, blocksize), dtype="float64", buffer=self._shm.buf, offset=offset)
+        if create:
+            self._sequences[:] = -1
+
+    @property
+    def sequence(self):
+        """Sequence number of the next block to be written."""
+        return int(self._header[0])
+
+    def write(self, block, timestamp):
+        """Write a block into the ring.
+
+        :param block: 1D array of blocksize samples
+        :param timestamp: Time of the first sample in the block
+
+        """
+        sequence = int(self._header[0])
+        slot = sequence % self.capacity
+        self._sequences[slot] = -1
+        self._blocks[slot] = block
+        self._timestamps[slot] = timestamp
+        self._sequences[slot] = sequence
+        self._header[0] = sequence + 1
+
+    def read(self, sequence):
+        """Return (block, timestamp) for a sequence number, or None if it is not in the ring.
+
+        The block is a view into shared memory. It is overwritten once the writer
+        wraps around, use valid() after processing it to check it was not.
+
+        :param sequence: Sequence number of the block
+
+        """
+        slot = sequence % self.capacity
+        if self._sequences[slot] != sequence:
+            return None
+        return self._blocks[slot], float(self._timestamps[slot])
+
+    def valid(self, sequence):
+        """Return True if the block for a sequence number is still in the ring.
+
+        :param sequence: Sequence number of the block
+
+        """
+        return self._sequences[sequence % self.capacity] == sequence
+
+    def blocks(self, sequence=None, poll=0.01):
+        """Yield (sequence, block, timestamp) for each block as it is written.
+
+        If the reader falls behind by more than the ring capacity, missed blocks are skipped.
+
+        :param sequence: Sequence number to start at, defaults to the next block written
+        :param poll: Time, in seconds, to wait between checks for a new block
+
+        """
+        if sequence is None:
+            sequence = self.sequence
+        while True:
+            head = self.sequence
+            if sequence >= head:
+                time.sleep(poll)
+                continue
+            sequence = max(sequence, head - self.capacity)
+            result = self.read(sequence)
+            if result is not None:
+                yield (sequence,) + result
+            sequence += 1
+
+    def close(self):
+        """Detach from the shared memory, removing it if this ring created it."""
+        self._header = self._timestamps = self._sequences = self._blocks = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _untrack(shm):
+    # Attaching registers the segment with this process's resource tracker,
+    # which would otherwise unlink it from under the writer when we exit.
+    # Only POSIX segments are tracked, under their name with a leading "/".
+    if os.name != "posix":
+        return
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(f"/{shm.name}", "shared_memory")
@@ -0,0 +1,312 @@
+"""Read the PMS5003 particulate sensor in the background"""
+
+import collections
+import struct
+import threading
+import time
+
+import numpy
+from pms5003 import ChecksumMismatchError
+
+from enviroplus import metrics
+
+PMS5003_SOF = b"\x42\x4d"
+FRAME_LENGTH = 32
+DATA_LENGTH = 28
+DATA_WORDS = 13
+
+PM1 = 0
+PM25 = 1
+PM10 = 2
+
+_WORD = struct.Struct(">H")
+_DATA = struct.Struct(">13H")
+
+Frame = collections.namedtuple("Frame", ("data", "timestamp"))
+
+
+class PMS5003Reader:
+    def __init__(self, pms5003, maxsize=16, backoff=1.0, max_backoff=30.0):
+        """Background PMS5003 reader.
+
+        A thread reads frames from the sensor as they arrive, about one per second, into a
+        bounded queue and a latest-frame cache. Consumers never block on the serial port.
+
+        On a timeout, or any other error such as the serial adapter being unplugged,
+        the error is recorded in errors and last_error and the sensor is reset, waiting
+        longer after each consecutive failure. Frames with a bad checksum are dropped
+        without a reset.
+
+        :param pms5003: PMS5003 instance
+        :param maxsize: Maximum number of queued frames, the oldest are dropped when full
+        :param backoff: Time, in seconds, to wait before the first reset
+        :param max_backoff: Maximum time, in seconds, to wait between resets
+
+        """
+        self.pms5003 = pms5003
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.frames = 0
+        self.errors = 0
+        self.resets = 0
+        self.dropped = 0
+        self.last_error = None
+
+        self._queue = collections.deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self._latest = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start reading in the background."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="enviroplus-pms5003", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop reading, waiting for the current read to finish.
+
+        :param timeout: Optional time, in seconds, to wait for the thread
+
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def latest(self, max_age=None):
+        """Return the most recent Frame, or None if there is none.
+
+        :param max_age: Optional maximum age, in seconds, of the frame
+
+        """
+        frame = self._latest
+        if frame is None:
+            return None
+        if max_age is not None and time.time() - frame.timestamp > max_age:
+            return None
+        return frame
+
+    def get(self, timeout=None):
+        """Return the oldest queued Frame, waiting for one if the queue is empty.
+
+        Returns None if no frame arrives in time.
+
+        :param timeout: Time, in seconds, to wait, or None to wait forever
+
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue, timeout):
+                return None
+            return self._queue.popleft()
+
+    def get_all(self):
+        """Return and remove all queued Frames, without waiting."""
+        with self._condition:
+            frames = list(self._queue)
+            self._queue.clear()
+            return frames
+
+    def _run(self):
+        recovery = _Recovery(self.pms5003, self.backoff, self.max_backoff)
+        while not self._stop.is_set():
+            try:
+                with metrics.timer("pms5003.read"):
+                    data = self.pms5003.read()
+            except ChecksumMismatchError as e:
+                self.errors += 1
+                self.last_error = e
+                metrics.increment("pms5003.retries")
+                continue
+            except Exception as e:
+                # Timeouts, and serial errors such as EIO from an unplugged adapter,
+                # must not end the thread or latest() would go stale without a word
+                self.errors += 1
+                self.last_error = e
+                if self._stop.wait(recovery.delay()):
+                    return
+                error = recovery.reset()
+                if error is None:
+                    self.resets += 1
+                else:
+                    self.last_error = error
+                continue
+
+            recovery.succeeded()
+            frame = Frame(data, time.time())
+            self._latest = frame
+            self.frames += 1
+            with self._condition:
+                if len(self._queue) == self._queue.maxlen:
+                    self.dropped += 1
+                    metrics.increment("pms5003.dropped")
+                self._queue.append(frame)
+                self._condition.notify_all()
+
+
+class _Recovery:
+    # Reset policy after a failed read, shared with enviroplus.aio.AsyncHub
+
+    def __init__(self, pms5003, backoff, max_backoff):
+        self.pms5003 = pms5003
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._delay = backoff
+
+    def delay(self):
+        # Time to wait before the next reset, doubled for each consecutive failure
+        delay = self._delay
+        self._delay = min(delay * 2, self.max_backoff)
+        return delay
+
+    def succeeded(self):
+        self._delay = self.backoff
+
+    def reset(self):
+        # Returns the exception if the reset failed, or None
+        try:
+            self.pms5003.reset()
+        except Exception as e:
+            metrics.increment("pms5003.reset.errors")
+            return e
+        metrics.increment("pms5003.resets")
+        return None
+
+
+class FrameParser:
+    def __init__(self, size=1024):
+        """Incremental PMS5003 frame parser.
+
+        Serial data is read into a reusable buffer and frames are found, validated and
+        unpacked in place. Each frame is returned as a tuple of its 13 data words,
+        use PM1, PM25 and PM10 to index the standard particle readings.
+
+        :param size: Buffer size in bytes, must hold at least one frame
+
+        """
+        if size < FRAME_LENGTH:
+            raise ValueError(f"Buffer must hold at least {FRAME_LENGTH} bytes")
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+        self.frames = 0
+        self.errors = 0
+
+    def _compact(self):
+        if self._start == 0:
+            return
+        remaining = self._end - self._start
+        if remaining > self._start:
+            # Overlapping ranges, bytearray copies slices with memcpy so go through a temporary copy
+            self._buffer[:remaining] = bytes(self._view[self._start:self._end])
+        else:
+            self._buffer[:remaining] = self._view[self._start:self._end]
+        self._start = 0
+        self._end = remaining
+
+    def readinto(self, port, size=None):
+        """Read available data from a serial port straight into the buffer.
+
+        Returns the number of bytes read.
+
+        :param port: File-like object with readinto(), eg: serial.Serial
+        :param size: Optional maximum number of bytes to read
+
+        """
+        self._compact()
+        end = len(self._buffer) if size is None else min(len(self._buffer), self._end + size)
+        count = port.readinto(self._view[self._end:end]) or 0
+        self._end += count
+        return count
+
+    def feed(self, data):
+        """Parse data, yielding a tuple of data words for every valid frame.
+
+        :param data: bytes-like data, of any length
+
+        """
+        data = memoryview(data)
+        offset = 0
+        while offset < len(data):
+            self._compact()
+            count = min(len(data) - offset, len(self._buffer) - self._end)
+            self._view[self._end:self._end + count] = data[offset:offset + count]
+            self._end += count
+            offset += count
+            yield from self.frames_available()
+
+    def frames_available(self):
+        """Yield a tuple of data words for every valid frame in the buffer."""
+        buffer = self._buffer
+        while True:
+            start = buffer.find(PMS5003_SOF, self._start, self._end)
+            if start < 0:
+                # Keep a trailing 0x42 in case it starts the next frame
+                self._start = max(self._start, self._end - 1)
+                return
+            if self._end - start < FRAME_LENGTH:
+                self._start = start
+                return
+            checksum_offset = start + FRAME_LENGTH - 2
+            if _WORD.unpack_from(buffer, start + 2)[0] != DATA_LENGTH:
+                checksum = None
+            else:
+                checksum = int(numpy.frombuffer(buffer, numpy.uint8, FRAME_LENGTH - 2, start).sum())
+            if checksum != _WORD.unpack_from(buffer, checksum_offset)[0]:
+                self.errors += 1
+                self._start = start + 1
+                continue
+            self.frames += 1
+            self._start = start + FRAME_LENGTH
+            yield _DATA.unpack_from(buffer, start + 4)
+
+
+def parse_frames(data):
+    """Parse every valid PMS5003 frame in a recorded capture.
+
+    Frames are located, checksummed and unpacked for the whole capture at once,
+    returning an (n, 13) array of data words, one row per frame.
+
+    :param data: bytes-like recorded serial data
+
+    """
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(raw) < FRAME_LENGTH:
+        return numpy.zeros((0, DATA_WORDS), dtype=numpy.uint16)
+
+    last = len(raw) - FRAME_LENGTH
+    starts = numpy.flatnonzero((raw[:last + 1] == 0x42) & (raw[1:last + 2] == 0x4d))
+
+    words = raw.astype(numpy.uint32)
+    totals = numpy.concatenate(([0], numpy.cumsum(words)))
+    checksums = totals[starts + FRAME_LENGTH - 2] - totals[starts]
+    expected = (words[starts + FRAME_LENGTH - 2] << 8) | words[starts + FRAME_LENGTH - 1]
+    lengths = (words[starts + 2] << 8) | words[starts + 3]
+    starts = starts[(checksums == expected) & (lengths == DATA_LENGTH)]
+
+    # Overlapping candidates can only come from corrupt data, keep the first of each
+    if len(starts) > 1 and numpy.any(numpy.diff(starts) < FRAME_LENGTH):
+        keep = []
+        end = -1
+        for start in starts:
+            if start >= end:
+                keep.append(start)
+                end = start + FRAME_LENGTH
+        starts = numpy.array(keep, dtype=starts.dtype)
+
+    offsets = starts[:, None] + 4 + 2 * numpy.arange(DATA_WORDS)
+    return ((words[offsets] << 8) | words[offsets + 1]).astype(numpy.uint16)
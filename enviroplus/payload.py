@@ -0,0 +1,193 @@
+"""Encode sensor readings for MQTT and Sensor.Community uploads"""
+
+import json
+import math
+import struct
+
+ENCODINGS = ("json", "cbor", "msgpack", "struct")
+
+# Packed header: schema id, bitmask of the schema fields present and number of samples
+STRUCT_HEADER = struct.Struct("<HIB")
+MAX_FIELDS = 32
+MAX_SAMPLES = 255
+
+
+class PayloadEncoder:
+    def __init__(self, fields, encoding="json", schema_id=1, tags=None):
+        """Encoder for one or more samples of sensor readings per message.
+
+        A sample is a (timestamp, values) tuple, where values is a dict of metric: value.
+
+        With "json", "cbor" or "msgpack" a single sample is encoded as a map of
+        tags, "timestamp" and metrics, eg: {"serial": "...", "timestamp": 1700000000.0, "temperature": 21.5}.
+        Several samples are encoded as one map with a list of values per key, so each
+        key is only sent once. Metrics missing from a single sample are left out,
+        and are encoded as null in a list of values.
+
+        With "struct" a message is a packed little-endian header of the schema id,
+        a bitmask of the fields present and the number of samples, followed by each
+        sample as a uint32 timestamp, in seconds, and a float32 per field present.
+        Fields are identified by position, so the schema id must change whenever
+        fields changes, and tags are not sent, use a topic per device instead.
+        Missing metrics are encoded as NaN.
+
+        The "cbor" and "msgpack" encodings need the cbor2 and msgpack packages.
+
+        :param fields: Metric names in schema order, metrics not listed are not encoded
+        :param encoding: One of "json", "cbor", "msgpack" or "struct"
+        :param schema_id: Identifies fields to consumers of "struct" payloads, 0 to 65535
+        :param tags: Optional dict of tag: value added to every "json", "cbor" or "msgpack" message, eg: {"serial": "..."}
+
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding {encoding!r}, use one of {', '.join(ENCODINGS)}")
+        if len(fields) > MAX_FIELDS:
+            raise ValueError(f"A schema has at most {MAX_FIELDS} fields")
+        if not 0 <= schema_id <= 0xffff:
+            raise ValueError("schema_id must be 0 to 65535")
+
+        self.fields = tuple(fields)
+        self.encoding = encoding
+        self.schema_id = schema_id
+        self.tags = dict(tags or {})
+
+        self._masks = {field: 1 << index for index, field in enumerate(self.fields)}
+        self._structs = {}
+
+        if encoding == "json":
+            self._dumps = lambda data: json.dumps(data, separators=(",", ":")).encode("utf-8")
+            self._loads = json.loads
+        elif encoding == "cbor":
+            import cbor2
+            self._dumps = cbor2.dumps
+            self._loads = cbor2.loads
+        elif encoding == "msgpack":
+            import msgpack
+            self._dumps = msgpack.packb
+            self._loads = msgpack.unpackb
+
+    def encode(self, samples, fields=None):
+        """Return a list of samples as one message.
+
+        :param samples: List of (time.time() timestamp, dict of metric: value) tuples
+        :param fields: Optional subset of fields to encode, eg: ("temperature",) for a per-metric topic
+
+        """
+        fields = self.fields if fields is None else tuple(field for field in self.fields if field in fields)
+        if self.encoding == "struct":
+            return self._pack(samples, fields)
+
+        data = dict(self.tags)
+        if len(samples) == 1:
+            timestamp, values = samples[0]
+            data["timestamp"] = timestamp
+            for field in fields:
+                if values.get(field) is not None:
+                    data[field] = values[field]
+        else:
+            data["timestamp"] = [timestamp for timestamp, _ in samples]
+            for field in fields:
+                data[field] = [values.get(field) for _, values in samples]
+        return self._dumps(data)
+
+    def encode_metrics(self, samples):
+        """Return a list of samples as one message per metric, in a dict of metric: message.
+
+        :param samples: List of (time.time() timestamp, dict of metric: value) tuples
+
+        """
+        present = set()
+        for _, values in samples:
+            present.update(values)
+        return {field: self.encode(samples, (field,)) for field in self.fields if field in present}
+
+    def decode(self, data):
+        """Return a message as a list of (timestamp, dict of metric: value) samples.
+
+        Tags are dropped, and missing metrics are left out of each sample.
+
+        :param data: Message from encode() or encode_metrics()
+
+        """
+        if self.encoding == "struct":
+            return self._unpack(data)
+
+        data = self._loads(data)
+        fields = [field for field in self.fields if field in data]
+        if not isinstance(data["timestamp"], list):
+            return [(data["timestamp"], {field: data[field] for field in fields if data[field] is not None})]
+        return [
+            (timestamp, {field: data[field][index] for field in fields if data[field][index] is not None})
+            for index, timestamp in enumerate(data["timestamp"])
+        ]
+
+    def _struct(self, mask):
+        sample = self._structs.get(mask)
+        if sample is None:
+            sample = self._structs[mask] = struct.Struct("<I" + "f" * bin(mask).count("1"))
+        return sample
+
+    def _pack(self, samples, fields):
+        if len(samples) > MAX_SAMPLES:
+            raise ValueError(f"A struct message holds at most {MAX_SAMPLES} samples")
+        mask = 0
+        for field in fields:
+            mask |= self._masks[field]
+        sample = self._struct(mask)
+        nan = math.nan
+        parts = [STRUCT_HEADER.pack(self.schema_id, mask, len(samples))]
+        for timestamp, values in samples:
+            row = [nan if values.get(field) is None else values[field] for field in fields]
+            parts.append(sample.pack(int(timestamp), *row))
+        return b"".join(parts)
+
+    def _unpack(self, data):
+        schema_id, mask, count = STRUCT_HEADER.unpack_from(data)
+        if schema_id != self.schema_id:
+            raise ValueError(f"Schema {schema_id} does not match {self.schema_id}")
+        fields = [field for field in self.fields if mask & self._masks[field]]
+        sample = self._struct(mask)
+        if len(data) != STRUCT_HEADER.size + count * sample.size:
+            raise ValueError(f"Expected {count} samples of {sample.size} bytes")
+        samples = []
+        for row in sample.iter_unpack(data[STRUCT_HEADER.size:]):
+            samples.append((row[0], {field: value for field, value in zip(fields, row[1:]) if not math.isnan(value)}))
+        return samples
+
+
+def average_values(samples):
+    """Return the mean of each metric's readings as a whole number, as published by examples/mqtt-all.py.
+
+    Pressure, in pascals, is rounded to the nearest 10.
+
+    :param samples: Dict of metric: list of readings
+
+    """
+    values = {}
+    for metric, readings in samples.items():
+        mean = sum(readings) / len(readings)
+        if metric == "pressure":
+            values[metric] = round(int(mean), -1)
+        else:
+            values[metric] = int(mean)
+    return values
+
+
+def sensorcommunity_payloads(values, software_version="enviro-plus 1.0.0"):
+    """Return the Sensor.Community uploads for a set of readings.
+
+    Sensor.Community takes one upload per sensor, identified by the X-PIN header.
+    Returns a list of (pin, body) tuples: particulates, whose value types start
+    with "P", as pin 1 and the climate readings as pin 11. Each body is a dict
+    to POST as JSON.
+
+    :param values: Dict of Sensor.Community value type: value, eg: {"P2": "7.00", "temperature": "21.84"}
+    :param software_version: Software version reported with each upload
+
+    """
+    pm_values = [{"value_type": key, "value": value} for key, value in values.items() if key.startswith("P")]
+    climate_values = [{"value_type": key, "value": value} for key, value in values.items() if not key.startswith("P")]
+    return [
+        ("1", {"software_version": software_version, "sensordatavalues": pm_values}),
+        ("11", {"software_version": software_version, "sensordatavalues": climate_values})
+    ]
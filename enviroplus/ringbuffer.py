@@ -0,0 +1,83 @@
+"""Fixed-size history of sensor readings"""
+
+import numpy
+
+
+class RingBuffer:
+    def __init__(self, size, fill=0.0, dtype="float64"):
+        """Fixed-size history of values, oldest first.
+
+        Appending is O(1) and never copies the history. Every value is stored twice,
+        at its slot and one buffer length later, so the ordered history is always
+        a contiguous slice and values is a view rather than a copy.
+
+        :param size: Number of values to keep
+        :param fill: Initial value of every slot
+        :param dtype: NumPy dtype of the values
+
+        """
+        if size < 1:
+            raise ValueError("Size must be at least 1")
+        self.size = size
+        self._buffer = numpy.full(size * 2, fill, dtype=dtype)
+        self._head = 0
+
+    def append(self, value):
+        """Add a value, discarding the oldest.
+
+        :param value: Value to add
+
+        """
+        head = self._head
+        self._buffer[head] = value
+        self._buffer[head + self.size] = value
+        self._head = (head + 1) % self.size
+
+    def extend(self, values):
+        """Add several values, discarding the oldest.
+
+        :param values: Iterable of values to add
+
+        """
+        for value in values:
+            self.append(value)
+
+    @property
+    def values(self):
+        """Read-only view of the history, oldest first."""
+        view = self._buffer[self._head:self._head + self.size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def latest(self):
+        """The most recently appended value."""
+        return self._buffer[self._head + self.size - 1]
+
+    def min(self):
+        return self.values.min()
+
+    def max(self):
+        return self.values.max()
+
+    def mean(self):
+        return self.values.mean()
+
+    def scaled(self):
+        """Return the history scaled between 0 and 1, eg: for drawing a graph.
+
+        The range is padded by 1 so a flat history does not divide by zero.
+
+        """
+        values = self.values
+        vmin = values.min()
+        return (values - vmin + 1) / (values.max() - vmin + 1)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
@@ -0,0 +1,149 @@
+"""Summarise sensor readings over fixed time periods"""
+
+import collections
+import threading
+import time
+
+# (resolution in seconds, number of completed buckets to keep)
+DEFAULT_RESOLUTIONS = (
+    (60, 1440),     # 1 minute for a day
+    (300, 2016),    # 5 minutes for a week
+    (3600, 720),    # 1 hour for 30 days
+    (86400, 365)    # 1 day for a year
+)
+
+Bucket = collections.namedtuple("Bucket", ("start", "count", "min", "max", "mean", "last"))
+
+
+class _Accumulator:
+    __slots__ = "start", "count", "min", "max", "total", "last"
+
+    def __init__(self, start, value):
+        self.start = start
+        self.count = 1
+        self.min = value
+        self.max = value
+        self.total = value
+        self.last = value
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.total += value
+        self.last = value
+
+    def bucket(self):
+        return Bucket(self.start, self.count, self.min, self.max, self.total / self.count, self.last)
+
+
+class Rollup:
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS):
+        """Incremental count/min/max/mean/last summaries of every metric at several resolutions.
+
+        Each sample updates the in-progress bucket of every resolution in O(1).
+        Buckets are aligned to multiples of their resolution since the epoch, and
+        a bounded number of completed buckets are kept for each.
+
+        Completed buckets are not changed, a sample older than a resolution's
+        in-progress bucket is left out of that resolution and counted in late.
+
+        :param resolutions: List of (resolution in seconds, number of buckets to keep)
+
+        """
+        self.resolutions = tuple(resolution for resolution, _ in resolutions)
+        self._history = dict(resolutions)
+        self._current = {}
+        self._completed = {}
+        self._lock = threading.Lock()
+        self.late = 0
+
+    def add(self, metric, value, timestamp=None):
+        """Add a value to every resolution's summary of a metric.
+
+        :param metric: Metric name
+        :param value: Value read
+        :param timestamp: Optional time.time() the value was read, defaults to now
+
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            current = self._current.get(metric)
+            if current is None:
+                current = self._current[metric] = {}
+                self._completed[metric] = {
+                    resolution: collections.deque(maxlen=history) for resolution, history in self._history.items()
+                }
+            completed = self._completed[metric]
+
+            late = False
+            for resolution in self.resolutions:
+                start = timestamp - (timestamp % resolution)
+                accumulator = current.get(resolution)
+                if accumulator is None:
+                    current[resolution] = _Accumulator(start, value)
+                elif start > accumulator.start:
+                    completed[resolution].append(accumulator.bucket())
+                    current[resolution] = _Accumulator(start, value)
+                elif start < accumulator.start:
+                    late = True
+                else:
+                    accumulator.add(value)
+            if late:
+                self.late += 1
+
+    def add_sample(self, sample):
+        """Add the value of an enviroplus.hub Sample, use as a Hub subscriber.
+
+        :param sample: Sample to add
+
+        """
+        self.add(sample.metric, sample.value, sample.timestamp)
+
+    @property
+    def metrics(self):
+        return list(self._current)
+
+    def current(self, metric, resolution):
+        """Return the in-progress Bucket for a metric, or None if there is none.
+
+        :param metric: Metric name
+        :param resolution: Resolution in seconds
+
+        """
+        with self._lock:
+            accumulator = self._current.get(metric, {}).get(resolution)
+            return None if accumulator is None else accumulator.bucket()
+
+    def latest(self, metric, resolution):
+        """Return the most recently completed Bucket for a metric, or None if there is none.
+
+        :param metric: Metric name
+        :param resolution: Resolution in seconds
+
+        """
+        with self._lock:
+            completed = self._completed.get(metric, {}).get(resolution)
+            return completed[-1] if completed else None
+
+    def buckets(self, metric, resolution, include_current=False):
+        """Return a list of completed Buckets for a metric, oldest first.
+
+        :param metric: Metric name
+        :param resolution: Resolution in seconds
+        :param include_current: True to append the in-progress bucket
+
+        """
+        if resolution not in self._history:
+            raise ValueError(f"Resolution {resolution} is not one of {self.resolutions}")
+        with self._lock:
+            buckets = list(self._completed.get(metric, {}).get(resolution, ()))
+            if include_current:
+                accumulator = self._current.get(metric, {}).get(resolution)
+                if accumulator is not None:
+                    buckets.append(accumulator.bucket())
+            return buckets
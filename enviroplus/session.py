@@ -0,0 +1,393 @@
+"""Record raw sensor reads to a session file and replay them"""
+
+import collections
+import functools
+import struct
+import threading
+import time
+
+import numpy
+
+# Record header: time since the session started, channel id, kind of payload, payload length
+_HEADER = struct.Struct("<dHBI")
+_FLOAT = struct.Struct("<d")
+
+KIND_CHANNEL = 0
+KIND_FLOAT = 1
+KIND_BYTES = 2
+KIND_AUDIO = 3
+KIND_NONE = 4
+
+BME280_METHODS = {
+    "get_temperature": "bme280.temperature",
+    "get_pressure": "bme280.pressure",
+    "get_humidity": "bme280.humidity"
+}
+LTR559_METHODS = {
+    "get_lux": "ltr559.lux",
+    "get_proximity": "ltr559.proximity"
+}
+GAS_CHANNELS = ("oxidising", "reducing", "nh3", "adc")
+
+
+class Recorder:
+    def __init__(self, path):
+        """Record raw sensor reads to a session file.
+
+        Wrap each device, then use the wrapper in its place. Every value read
+        through a wrapper is appended to the session with the time it was read.
+
+        Replay the session with Player.
+
+        :param path: Session file path
+
+        """
+        self.path = path
+        self._file = open(path, "wb")
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def record(self, channel, value, timestamp=None):
+        """Append a value to the session, returning it unchanged.
+
+        :param channel: Channel name, eg: "bme280.temperature"
+        :param value: A number, bytes, a NumPy array of audio samples or None
+        :param timestamp: Optional time.monotonic() the value was read, defaults to now
+
+        """
+        offset = (time.monotonic() if timestamp is None else timestamp) - self._start
+        if value is None:
+            kind, payload = KIND_NONE, b""
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            kind, payload = KIND_BYTES, bytes(value)
+        elif isinstance(value, numpy.ndarray):
+            kind, payload = KIND_AUDIO, numpy.ascontiguousarray(value, dtype="<f8").tobytes()
+        else:
+            kind, payload = KIND_FLOAT, _FLOAT.pack(value)
+
+        with self._lock:
+            channel_id = self._channels.get(channel)
+            if channel_id is None:
+                channel_id = len(self._channels)
+                self._channels[channel] = channel_id
+                name = channel.encode("utf-8")
+                self._file.write(_HEADER.pack(offset, channel_id, KIND_CHANNEL, len(name)) + name)
+            self._file.write(_HEADER.pack(offset, channel_id, kind, len(payload)) + payload)
+        return value
+
+    def bme280(self, bme280):
+        """Record temperature, pressure and humidity read from a BME280.
+
+        :param bme280: BME280 instance
+
+        """
+        return _Recording(self, bme280, BME280_METHODS)
+
+    def ltr559(self, ltr559):
+        """Record lux and proximity read from an LTR559.
+
+        :param ltr559: LTR559 instance
+
+        """
+        return _Recording(self, ltr559, LTR559_METHODS)
+
+    def pms5003(self, pms5003):
+        """Record the raw frames read from a PMS5003.
+
+        :param pms5003: PMS5003 instance
+
+        """
+        def read():
+            data = pms5003.read()
+            self.record("pms5003.frame", data.raw_data)
+            return data
+        return _Recording(self, pms5003, {}, read=read)
+
+    def gas(self, gas=None):
+        """Record the raw ADC voltages read from the MICS6814 gas sensor.
+
+        Resistances are converted from the voltages on replay, so a session can be
+        replayed through changed conversion or calibration code.
+
+        :param gas: Optional object with read_voltages() and from_voltages(), defaults to enviroplus.gas
+
+        """
+        if gas is None:
+            from enviroplus import gas
+
+        def read_voltages():
+            voltages = gas.read_voltages()
+            for channel, voltage in zip(GAS_CHANNELS, voltages):
+                self.record(f"gas.{channel}.voltage", voltage)
+            return voltages
+
+        def read_all():
+            return gas.from_voltages(*read_voltages())
+        return _Recording(self, gas, {}, read_voltages=read_voltages, read_all=read_all)
+
+    def noise(self, noise):
+        """Record the audio captured by a Noise instance.
+
+        Both blocking recordings and stream blocks are recorded, the Noise
+        instance is returned for convenience.
+
+        :param noise: enviroplus.noise.Noise instance
+
+        """
+        self.record("noise.sample_rate", noise.sample_rate)
+        self.record("noise.duration", noise.duration)
+        record = noise._record
+        open_stream = noise.open_stream
+
+        def _record():
+            return self.record("noise.recording", record())
+
+        def _open_stream(callback, blocksize=1024):
+            def _callback(block, timestamp):
+                self.record("noise.block", block, timestamp)
+                callback(block, timestamp)
+            return open_stream(_callback, blocksize=blocksize)
+
+        noise._record = _record
+        noise.open_stream = _open_stream
+        return noise
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _Recording:
+    def __init__(self, recorder, device, methods, **overrides):
+        self._recorder = recorder
+        self._device = device
+        self._methods = methods
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        attr = getattr(self._device, name)
+        channel = self._methods.get(name)
+        if channel is None:
+            return attr
+
+        def method(*args, **kwargs):
+            return self._recorder.record(channel, attr(*args, **kwargs))
+        setattr(self, name, method)
+        return method
+
+
+class Player:
+    def __init__(self, path, speed=1.0):
+        """Replay a session recorded by Recorder.
+
+        Each replayed device returns the values recorded for it, in order, through
+        the same methods as the real device. A read waits until the time it was
+        recorded, relative to the first read, divided by speed.
+
+        Replayed values are timed on the session's clock: a value recorded t seconds
+        into the session was read at the time.monotonic() the replay started, plus t.
+
+        Reading past the end of a channel raises EOFError.
+
+        :param path: Session file path
+        :param speed: Playback speed, eg: 100 for 100x real time, or None for as fast as possible
+
+        """
+        self.path = path
+        self.speed = speed
+        self._channels = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        self._start = None
+        self._origin = None
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        names = {}
+        offset = 0
+        # A partial record at the end of an interrupted session is ignored
+        while offset + _HEADER.size <= len(data):
+            timestamp, channel_id, kind, length = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if offset + length > len(data):
+                break
+            payload = data[offset:offset + length]
+            offset += length
+            if kind == KIND_CHANNEL:
+                names[channel_id] = payload.decode("utf-8")
+                continue
+            if kind == KIND_FLOAT:
+                value = _FLOAT.unpack(payload)[0]
+            elif kind == KIND_BYTES:
+                value = payload
+            elif kind == KIND_AUDIO:
+                value = numpy.frombuffer(payload, dtype="<f8")
+            else:
+                value = None
+            self._channels[names[channel_id]].append((timestamp, value))
+
+    @property
+    def channels(self):
+        return list(self._channels)
+
+    def remaining(self, channel):
+        """Return the number of values left to read from a channel.
+
+        :param channel: Channel name
+
+        """
+        return len(self._channels.get(channel, ()))
+
+    def peek(self, channel):
+        """Return the next value of a channel without reading it, or None.
+
+        :param channel: Channel name
+
+        """
+        values = self._channels.get(channel)
+        return values[0][1] if values else None
+
+    def read(self, channel):
+        """Return the next value of a channel, waiting until it is due.
+
+        :param channel: Channel name
+
+        """
+        return self.read_timestamped(channel)[1]
+
+    def read_timestamped(self, channel):
+        """Return the next (timestamp, value) of a channel, waiting until it is due.
+
+        The timestamp is the time.monotonic() the value was read on the session's
+        clock, so the time between values is as recorded whatever the speed.
+
+        :param channel: Channel name
+
+        """
+        with self._lock:
+            values = self._channels.get(channel)
+            if not values:
+                raise EOFError(f"No more {channel} values in session")
+            timestamp, value = values.popleft()
+            if self._start is None:
+                now = time.monotonic()
+                self._start = now - (0 if self.speed is None else timestamp / self.speed)
+                self._origin = now - timestamp
+        if self.speed is not None:
+            delay = self._start + timestamp / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return self._origin + timestamp, value
+
+    def bme280(self):
+        """Return a BME280 stand-in replaying temperature, pressure and humidity."""
+        return _Replay(self, BME280_METHODS, ("setup", "update_sensor"))
+
+    def ltr559(self):
+        """Return an LTR559 stand-in replaying lux and proximity."""
+        return _Replay(self, LTR559_METHODS, ("update_sensor",))
+
+    def pms5003(self):
+        """Return a PMS5003 stand-in replaying frames."""
+        from pms5003 import PMS5003Data
+
+        def read():
+            return PMS5003Data(self.read("pms5003.frame"))
+        return _Replay(self, {}, ("setup", "reset"), read=read)
+
+    def gas(self):
+        """Return an enviroplus.gas stand-in replaying gas voltages, eg: for enviroplus.hub.gas_source().
+
+        Voltages are converted to resistances by enviroplus.gas.from_voltages().
+
+        """
+        from enviroplus.gas import from_voltages
+
+        def read_voltages():
+            return tuple(self.read(f"gas.{channel}.voltage") for channel in GAS_CHANNELS)
+
+        def read_all():
+            return from_voltages(*read_voltages())
+        return _Replay(self, {}, ("setup", "cleanup", "enable_adc", "set_adc_gain"), **{
+            "read_voltages": read_voltages,
+            "from_voltages": from_voltages,
+            "read_all": read_all,
+            "read_oxidising": lambda: read_all().oxidising,
+            "read_reducing": lambda: read_all().reducing,
+            "read_nh3": lambda: read_all().nh3,
+            "read_adc": lambda: read_all().adc,
+            "available": lambda: True
+        })
+
+    def noise(self, **kwargs):
+        """Return an enviroplus.noise.Noise replaying recorded audio.
+
+        :param kwargs: Optional Noise arguments, eg: calibration, the recorded sample rate and duration are used by default
+
+        """
+        from enviroplus.noise import Noise
+
+        kwargs.setdefault("sample_rate", int(self.peek("noise.sample_rate") or 16000))
+        kwargs.setdefault("duration", self.peek("noise.duration") or 0.5)
+        noise = Noise(**kwargs)
+
+        def _record():
+            return self.read("noise.recording").reshape(-1, 1)
+
+        def open_stream(callback, blocksize=1024):
+            return _ReplayStream(self, callback)
+
+        noise._record = _record
+        noise.open_stream = open_stream
+        return noise
+
+
+class _Replay:
+    def __init__(self, player, methods, ignored=(), **overrides):
+        self._player = player
+        self._methods = methods
+        self._ignored = ignored
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        channel = self._methods.get(name)
+        if channel is not None:
+            method = functools.partial(self._player.read, channel)
+        elif name in self._ignored:
+            def method(*args, **kwargs):
+                pass
+        else:
+            raise AttributeError(name)
+        setattr(self, name, method)
+        return method
+
+
+class _ReplayStream:
+    def __init__(self, player, callback):
+        self._player = player
+        self._callback = callback
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="enviroplus-replay-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                timestamp, block = self._player.read_timestamped("noise.block")
+            except EOFError:
+                return
+            self._callback(block, timestamp)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
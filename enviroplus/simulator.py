@@ -0,0 +1,655 @@
+"""Simulate Enviro+ hardware for tests and benchmarks"""
+
+import fcntl
+import math
+import os
+import random
+import select
+import struct
+import termios
+import threading
+import time
+
+import numpy
+from i2cdevice import MockSMBus
+
+PMS5003_SOF = b"\x42\x4d"
+
+# Typical BME280 trimming parameters, from the Bosch datasheet compensation example
+BME280_CALIBRATION = {
+    "dig_t1": 27504, "dig_t2": 26435, "dig_t3": -1000,
+    "dig_p1": 36477, "dig_p2": -10685, "dig_p3": 3024, "dig_p4": 2855, "dig_p5": 140,
+    "dig_p6": -7, "dig_p7": 15500, "dig_p8": -14600, "dig_p9": 6000,
+    "dig_h1": 75, "dig_h2": 362, "dig_h3": 0, "dig_h4": 313, "dig_h5": 50, "dig_h6": 30
+}
+
+ADS1015_DATA_RATES = (128, 250, 490, 920, 1600, 2400, 3300, 3300)
+ADS1115_DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+ADS1015_GAINS = (6.144, 4.096, 2.048, 1.024, 0.512, 0.256, 0.256, 0.256)
+# Positive and negative input of each multiplexer setting, None is ground
+ADS1015_MULTIPLEXER = (("in0", "in1"), ("in0", "in3"), ("in1", "in3"), ("in2", "in3"), ("in0", None), ("in1", None), ("in2", None), ("in3", None))
+
+LTR559_GAINS = {0: 1, 1: 2, 2: 4, 3: 8, 6: 48, 7: 96}
+LTR559_INTEGRATION_TIMES = (100, 50, 200, 400, 150, 250, 300, 350)
+LTR559_REPEAT_RATES = (50, 100, 200, 500, 1000, 2000, 2000, 2000)
+LTR559_PS_RATES = {0: 50, 1: 70, 2: 100, 3: 200, 4: 500, 5: 1000, 6: 2000, 8: 10}
+# Lux coefficients for ch0 and ch1 at increasing ch1 ratios, from the LTR559 library
+LTR559_CH0_C = (17743, 42785, 5926, 0)
+LTR559_CH1_C = (-11059, 19548, -1185, 0)
+
+
+def waveform(mean, amplitude=0.0, period=60.0, noise=0.0, seed=None):
+    """Return a function of time, in seconds, for a simulated reading.
+
+    The value is a sine wave around mean, plus optional Gaussian noise.
+
+    :param mean: Average value
+    :param amplitude: Amplitude of the sine wave
+    :param period: Period, in seconds, of the sine wave
+    :param noise: Standard deviation of the noise
+    :param seed: Optional seed for repeatable noise
+
+    """
+    rng = random.Random(seed)
+
+    def value(t):
+        result = mean + amplitude * math.sin(2 * math.pi * t / period)
+        if noise:
+            result += rng.gauss(0, noise)
+        return result
+    return value
+
+
+def _value(source, t):
+    return source(t) if callable(source) else source
+
+
+class SimulatedBus(MockSMBus):
+    def __init__(self, i2c_bus=1, latency=0.0):
+        """i2cdevice mock bus with register-level device models attached.
+
+        Pass as the i2c_dev of the BME280, LTR559 or ADS1015 libraries, or as the
+        bus of an enviroplus.bus.BusManager. Addresses with no device attached
+        raise OSError, like a real bus.
+
+        :param i2c_bus: Bus number, unused
+        :param latency: Time, in seconds, each transaction takes
+
+        """
+        MockSMBus.__init__(self, i2c_bus)
+        self.latency = latency
+        self.transactions = 0
+        self.devices = {}
+
+    def add(self, device):
+        """Attach a device model at its address, returning it.
+
+        :param device: Device model, eg: BME280Model
+
+        """
+        self.devices[device.address] = device
+        return device
+
+    def _device(self, i2c_address):
+        self.transactions += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return self.devices[i2c_address]
+        except KeyError:
+            raise OSError(121, "Remote I/O error")
+
+    def read_i2c_block_data(self, i2c_address, register, length):
+        return self._device(i2c_address).read(register, length)
+
+    def write_i2c_block_data(self, i2c_address, register, values):
+        self._device(i2c_address).write(register, values)
+
+    def read_byte_data(self, i2c_address, register):
+        return self.read_i2c_block_data(i2c_address, register, 1)[0]
+
+    def write_byte_data(self, i2c_address, register, value):
+        self.write_i2c_block_data(i2c_address, register, [value])
+
+    def close(self):
+        pass
+
+
+class RegisterDevice:
+    def __init__(self, address):
+        """Base for simulated I2C devices, a bank of 8-bit registers.
+
+        Subclasses update registers in _before_read() and react to writes in _after_write().
+
+        :param address: I2C address
+
+        """
+        self.address = address
+        self.regs = bytearray(256)
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def elapsed(self):
+        """Return the time, in seconds, since the device was created."""
+        return time.monotonic() - self._start
+
+    def read(self, register, length):
+        with self._lock:
+            self._before_read(register, length)
+            return list(self.regs[register:register + length])
+
+    def write(self, register, values):
+        with self._lock:
+            self.regs[register:register + len(values)] = bytes(values)
+            self._after_write(register, values)
+
+    def _before_read(self, register, length):
+        pass
+
+    def _after_write(self, register, values):
+        pass
+
+
+class ADS1015Model(RegisterDevice):
+    def __init__(self, address=0x49, chip="ADS1015", inputs=None):
+        """ADS1015 or ADS1115 analog to digital converter.
+
+        Single-shot conversions take 1 / data rate seconds, so chip detection by
+        the ads1015 library works. The defaults are the MICS6814 gas sensor
+        voltages in clean air, with the 1.241V reference on in3.
+
+        :param address: I2C address, the Enviro+ uses 0x49
+        :param chip: "ADS1015" or "ADS1115"
+        :param inputs: Optional dict of "in0" to "in3": voltage or waveform()
+
+        """
+        RegisterDevice.__init__(self, address)
+        if chip not in ("ADS1015", "ADS1115"):
+            raise ValueError(f"Unknown chip {chip}")
+        self.chip = chip
+        self.inputs = {"in0": 0.87, "in1": 2.89, "in2": 2.4, "in3": 1.241}
+        self.inputs.update(inputs or {})
+        self.conversions = 0
+        self._ready_at = None
+        # Conversion, config, low and high threshold, each a 16-bit register
+        self.words = [0x0000, 0x8583, 0x8000, 0x7fff]
+
+    def _word(self, register):
+        return self.words[register]
+
+    def _write_word(self, register, value):
+        self.words[register] = value
+
+    def read(self, register, length):
+        # The register pointer selects a 16-bit register, longer reads continue into the next
+        with self._lock:
+            self._before_read(register, length)
+            data = []
+            for offset in range((length + 1) // 2):
+                word = self.words[(register + offset) & 0b11]
+                data += (word >> 8, word & 0xff)
+            return data[:length]
+
+    def write(self, register, values):
+        with self._lock:
+            for offset in range(len(values) // 2):
+                self.words[(register + offset) & 0b11] = (values[offset * 2] << 8) | values[offset * 2 + 1]
+            self._after_write(register, values)
+
+    def voltage(self, multiplexer, t):
+        """Return the voltage across a multiplexer setting at a time.
+
+        :param multiplexer: Multiplexer setting, 0 to 7
+        :param t: Time, in seconds, since the device was created
+
+        """
+        positive, negative = ADS1015_MULTIPLEXER[multiplexer]
+        voltage = _value(self.inputs[positive], t)
+        if negative is not None:
+            voltage -= _value(self.inputs[negative], t)
+        return voltage
+
+    def _convert(self, t):
+        config = self._word(0x01)
+        voltage = self.voltage((config >> 12) & 0b111, t)
+        full_scale = ADS1015_GAINS[(config >> 9) & 0b111]
+        if self.chip == "ADS1115":
+            value = max(-32768, min(32767, int(round(voltage / full_scale * 32768))))
+            self._write_word(0x00, value & 0xffff)
+        else:
+            value = max(-2048, min(2047, int(round(voltage / full_scale * 2048))))
+            self._write_word(0x00, (value & 0xfff) << 4)
+        self.conversions += 1
+
+    def _before_read(self, register, length):
+        t = self.elapsed()
+        config = self._word(0x01)
+        if not config & 0x0100:
+            # Continuous mode, always converting
+            self._convert(t)
+        elif self._ready_at is not None and t >= self._ready_at:
+            self._convert(self._ready_at)
+            self._ready_at = None
+            self._write_word(0x01, config | 0x8000)
+
+    def _after_write(self, register, values):
+        if register != 0x01:
+            return
+        config = self._word(0x01)
+        if config & 0x8000:
+            rates = ADS1115_DATA_RATES if self.chip == "ADS1115" else ADS1015_DATA_RATES
+            self._ready_at = self.elapsed() + 1.0 / rates[(config >> 5) & 0b111]
+            # The status bit reads 0 while converting
+            self._write_word(0x01, config & 0x7fff)
+
+
+class BME280Model(RegisterDevice):
+    def __init__(self, address=0x76, temperature=22.0, pressure=1013.25, humidity=45.0):
+        """BME280 temperature, pressure and humidity sensor.
+
+        Readings are converted to raw ADC values using the trimming parameters in
+        BME280_CALIBRATION, so the bme280 library's compensation returns them.
+        Forced mode measurements take the datasheet's maximum measurement time.
+
+        :param address: I2C address
+        :param temperature: Temperature in degrees C, or waveform()
+        :param pressure: Pressure in hPa, or waveform()
+        :param humidity: Relative humidity in %, or waveform()
+
+        """
+        RegisterDevice.__init__(self, address)
+        self.temperature = temperature
+        self.pressure = pressure
+        self.humidity = humidity
+        self.measurements = 0
+        self._ready_at = None
+
+        from bme280 import BME280Calibration
+        self._calibration = BME280Calibration()
+        for name, value in BME280_CALIBRATION.items():
+            setattr(self._calibration, name, value)
+        self._reset()
+
+    def _reset(self):
+        c = BME280_CALIBRATION
+        self.regs[:] = bytes(256)
+        self.regs[0xD0] = 0x60
+        self.regs[0x88:0xA2] = struct.pack(
+            "<HhhHhhhhhhhhBB",
+            c["dig_t1"], c["dig_t2"], c["dig_t3"],
+            c["dig_p1"], c["dig_p2"], c["dig_p3"], c["dig_p4"], c["dig_p5"],
+            c["dig_p6"], c["dig_p7"], c["dig_p8"], c["dig_p9"],
+            0, c["dig_h1"]
+        )
+        self.regs[0xE1:0xE8] = struct.pack(
+            "<hBBBBb",
+            c["dig_h2"], c["dig_h3"],
+            c["dig_h4"] >> 4,
+            (c["dig_h4"] & 0x0f) | ((c["dig_h5"] & 0x0f) << 4),
+            c["dig_h5"] >> 4,
+            c["dig_h6"]
+        )
+
+    def _measurement_time(self):
+        # Datasheet maximum measurement time, with oversampling of 0 meaning skipped
+        oversampling = [0, 1, 2, 4, 8, 16, 16, 16]
+        osrs_t = oversampling[self.regs[0xF4] >> 5]
+        osrs_p = oversampling[(self.regs[0xF4] >> 2) & 0b111]
+        osrs_h = oversampling[self.regs[0xF2] & 0b111]
+        return (1.25 + 2.3 * osrs_t + (2.3 * osrs_p + 0.575 if osrs_p else 0) + (2.3 * osrs_h + 0.575 if osrs_h else 0)) / 1000.0
+
+    @staticmethod
+    def _solve(function, target, low, high):
+        # Bisect for the raw value that compensates to target, function must be monotonic
+        increasing = function(high) > function(low)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if (function(middle) < target) == increasing:
+                low = middle
+            else:
+                high = middle
+        return low if abs(function(low) - target) <= abs(function(high) - target) else high
+
+    def _measure(self, t):
+        calibration = self._calibration
+        raw_temperature = self._solve(calibration.compensate_temperature, _value(self.temperature, t), 0, (1 << 20) - 1)
+        calibration.compensate_temperature(raw_temperature)
+        raw_pressure = self._solve(calibration.compensate_pressure, _value(self.pressure, t) * 100.0, 0, (1 << 20) - 1)
+        raw_humidity = self._solve(calibration.compensate_humidity, _value(self.humidity, t), 0, (1 << 16) - 1)
+        self.regs[0xF7:0xFF] = bytes((
+            raw_pressure >> 12, (raw_pressure >> 4) & 0xff, (raw_pressure & 0x0f) << 4,
+            raw_temperature >> 12, (raw_temperature >> 4) & 0xff, (raw_temperature & 0x0f) << 4,
+            raw_humidity >> 8, raw_humidity & 0xff
+        ))
+        self.measurements += 1
+
+    def _before_read(self, register, length):
+        t = self.elapsed()
+        if self._ready_at is not None and t >= self._ready_at:
+            self._measure(self._ready_at)
+            self._ready_at = None
+            self.regs[0xF4] &= 0b11111100
+            self.regs[0xF3] &= ~0b00001000
+        if register <= 0xFE and register + length > 0xF7 and (self.regs[0xF4] & 0b11) == 0b11:
+            # Normal mode, a measurement is always available
+            self._measure(t)
+
+    def _after_write(self, register, values):
+        if register <= 0xE0 < register + len(values) and self.regs[0xE0] == 0xB6:
+            self._reset()
+            self._ready_at = None
+        elif register <= 0xF4 < register + len(values) and (self.regs[0xF4] & 0b11) in (0b01, 0b10):
+            self._ready_at = self.elapsed() + self._measurement_time()
+            self.regs[0xF3] |= 0b00001000
+
+
+class LTR559Model(RegisterDevice):
+    def __init__(self, lux=100.0, proximity=0, ir_ratio=30.0):
+        """LTR559 light and proximity sensor.
+
+        Lux is converted to raw channel counts for the configured gain and integration
+        time, using the same coefficients as the ltr559 library. New data is flagged in
+        the status register once per measurement repeat rate.
+
+        :param lux: Light level in lux, or waveform()
+        :param proximity: Raw proximity, 0 to 2047, or waveform()
+        :param ir_ratio: Infrared channel as a percentage of both channels
+
+        """
+        RegisterDevice.__init__(self, 0x23)
+        self.lux = lux
+        self.proximity = proximity
+        self.ir_ratio = ir_ratio
+        self._reset()
+
+    def _reset(self):
+        self.regs[:] = bytes(256)
+        self.regs[0x85] = 0x03
+        self.regs[0x86] = 0x92
+        self.regs[0x87] = 0x05
+        self._als_read = None
+        self._ps_read = None
+
+    def _als(self, t):
+        gain = LTR559_GAINS.get((self.regs[0x80] >> 2) & 0b111, 1)
+        integration_time = LTR559_INTEGRATION_TIMES[(self.regs[0x85] >> 3) & 0b111]
+        ratio = self.ir_ratio
+        index = 0 if ratio < 45 else 1 if ratio < 64 else 2 if ratio < 85 else 3
+        ch1_per_ch0 = ratio / (100.0 - ratio)
+        per_count = LTR559_CH0_C[index] - LTR559_CH1_C[index] * ch1_per_ch0
+        lux = max(0.0, _value(self.lux, t))
+        ch0 = lux * 10000.0 * gain * (integration_time / 100.0) / per_count if per_count > 0 else 0
+        ch0 = max(0, min(0xffff, int(round(ch0))))
+        ch1 = max(0, min(0xffff, int(round(ch0 * ch1_per_ch0))))
+        self.regs[0x88:0x8C] = bytes((ch1 & 0xff, ch1 >> 8, ch0 & 0xff, ch0 >> 8))
+
+    def _ps(self, t):
+        value = max(0, min(2047, int(round(_value(self.proximity, t)))))
+        self.regs[0x8D] = value & 0xff
+        self.regs[0x8E] = value >> 8
+
+    def _before_read(self, register, length):
+        t = self.elapsed()
+        als_active = self.regs[0x80] & 0b1
+        ps_active = (self.regs[0x81] & 0b11) == 0b11
+        repeat = LTR559_REPEAT_RATES[self.regs[0x85] & 0b111] / 1000.0
+        ps_rate = LTR559_PS_RATES.get(self.regs[0x84] & 0b1111, 100) / 1000.0
+
+        status = (self.regs[0x80] & 0b00011100) << 2
+        if als_active and (self._als_read is None or t - self._als_read >= repeat):
+            status |= 0b100
+        if ps_active and (self._ps_read is None or t - self._ps_read >= ps_rate):
+            status |= 0b001
+        self.regs[0x8C] = status
+
+        # Reading the data clears its new data flag
+        if register <= 0x8B and register + length > 0x88 and als_active:
+            self._als(t)
+            self._als_read = t
+        if register <= 0x8E and register + length > 0x8D and ps_active:
+            self._ps(t)
+            self._ps_read = t
+
+    def _after_write(self, register, values):
+        if register <= 0x80 < register + len(values) and self.regs[0x80] & 0b10:
+            self._reset()
+
+
+class PMS5003Port:
+    def __init__(self, pm1=5, pm25=8, pm10=10, interval=1.0, error_rate=0.0, timeout=4.0, seed=None):
+        """PMS5003 serial port emulator.
+
+        A thread writes a frame every interval seconds into a pipe, so the port has a
+        real file descriptor, eg: for asyncio add_reader(). read() and readinto() behave
+        like pyserial, waiting up to timeout for the requested number of bytes, use
+        in_waiting to read only what has arrived.
+
+        :param pm1: PM1.0 in ug/m3, or waveform()
+        :param pm25: PM2.5 in ug/m3, or waveform()
+        :param pm10: PM10 in ug/m3, or waveform()
+        :param interval: Time, in seconds, between frames
+        :param error_rate: Fraction of frames sent with a corrupt byte
+        :param timeout: Time, in seconds, read() and readinto() wait for data
+        :param seed: Optional seed for repeatable errors
+
+        """
+        self.pm1 = pm1
+        self.pm25 = pm25
+        self.pm10 = pm10
+        self.interval = interval
+        self.error_rate = error_rate
+        self.timeout = timeout
+        self.frames = 0
+        self._rng = random.Random(seed)
+        self._start = time.monotonic()
+        self._read_fd, self._write_fd = os.pipe()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="enviroplus-pms5003-port", daemon=True)
+        self._thread.start()
+
+    def frame(self, t):
+        """Return the 32 byte frame for a time.
+
+        :param t: Time, in seconds, since the port was opened
+
+        """
+        pm = [max(0, min(0xffff, int(round(_value(source, t))))) for source in (self.pm1, self.pm25, self.pm10)]
+        # Rough particle counts per 0.1L for the standard bins, from the mass readings
+        counts = [pm[0] * 150, pm[0] * 45, pm[1] * 8, pm[1], pm[2] // 4, pm[2] // 10]
+        data = struct.pack(">13H", *pm, *pm, *(min(0xffff, c) for c in counts), 0)
+        frame = PMS5003_SOF + struct.pack(">H", 28) + data
+        return frame + struct.pack(">H", sum(frame) & 0xffff)
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = bytearray(self.frame(time.monotonic() - self._start))
+            if self.error_rate and self._rng.random() < self.error_rate:
+                frame[self._rng.randrange(4, 30)] ^= 0xff
+            try:
+                os.write(self._write_fd, frame)
+            except OSError:
+                return
+            self.frames += 1
+            self._stop.wait(self.interval)
+
+    def fileno(self):
+        return self._read_fd
+
+    @property
+    def in_waiting(self):
+        """Number of bytes that can be read without waiting."""
+        return struct.unpack("i", fcntl.ioctl(self._read_fd, termios.FIONREAD, bytes(4)))[0]
+
+    def read(self, size=1):
+        """Read size bytes, returning fewer if the timeout expires first.
+
+        :param size: Number of bytes to read
+
+        """
+        data = bytearray(size)
+        return bytes(data[:self.readinto(data)])
+
+    def readinto(self, buffer):
+        """Fill a buffer, returning the number of bytes read, fewer if the timeout expires first.
+
+        :param buffer: Writable bytes-like object
+
+        """
+        view = memoryview(buffer).cast("B")
+        count = 0
+        deadline = time.monotonic() + self.timeout
+        while count < len(view):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self._read_fd], [], [], remaining)
+            if not readable:
+                break
+            count += os.readv(self._read_fd, [view[count:]])
+        return count
+
+    def reset_input_buffer(self):
+        while select.select([self._read_fd], [], [], 0)[0]:
+            os.read(self._read_fd, 4096)
+
+    flushInput = reset_input_buffer
+
+    def close(self):
+        self._stop.set()
+        # Closing the read end first fails any write the thread is blocked in
+        os.close(self._read_fd)
+        self._thread.join()
+        os.close(self._write_fd)
+
+
+class AudioSource:
+    def __init__(self, sample_rate=16000, tones=((1000.0, 0.1),), noise=0.01, speed=1.0, seed=None):
+        """Synthetic microphone, a stand-in for the sounddevice module.
+
+        Generates a sum of sine tones plus white noise, with phase continuing
+        between reads. Use it in place of sounddevice in enviroplus.noise:
+
+            enviroplus.noise.sounddevice = AudioSource()
+
+        :param sample_rate: Default sample rate in Hz
+        :param tones: List of (frequency in Hz, amplitude) tones
+        :param noise: Standard deviation of the white noise
+        :param speed: Rate relative to real time that audio is captured, or None to not wait
+        :param seed: Optional seed for repeatable noise
+
+        """
+        self.sample_rate = sample_rate
+        self.tones = tones
+        self.noise = noise
+        self.speed = speed
+        self._rng = numpy.random.default_rng(seed)
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def generate(self, frames, samplerate=None):
+        """Return the next frames samples as a 1D float64 array.
+
+        :param frames: Number of samples
+        :param samplerate: Optional sample rate, defaults to sample_rate
+
+        """
+        samplerate = samplerate or self.sample_rate
+        with self._lock:
+            t = (self._position + numpy.arange(frames)) / samplerate
+            self._position += frames
+            samples = self._rng.normal(0, self.noise, frames) if self.noise else numpy.zeros(frames)
+        for frequency, amplitude in self.tones:
+            samples += amplitude * numpy.sin(2 * numpy.pi * frequency * t)
+        return samples
+
+    def _wait(self, frames, samplerate):
+        if self.speed is not None:
+            time.sleep(frames / samplerate / self.speed)
+
+    def rec(self, frames, samplerate=None, channels=1, dtype="float64", blocking=True, device=None):
+        """Record like sounddevice.rec(), returning a (frames, channels) array."""
+        samplerate = samplerate or self.sample_rate
+        samples = self.generate(int(frames), samplerate)
+        self._wait(int(frames), samplerate)
+        return numpy.repeat(samples.reshape(-1, 1), channels, axis=1).astype(dtype)
+
+    def InputStream(self, device=None, samplerate=None, blocksize=1024, channels=1, dtype="float64", callback=None):
+        """Return a stream like sounddevice.InputStream(), call start() to begin calling callback."""
+        return _AudioStream(self, samplerate or self.sample_rate, blocksize, channels, dtype, callback)
+
+
+class _AudioStream:
+    def __init__(self, source, samplerate, blocksize, channels, dtype, callback):
+        self._source = source
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self._callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="enviroplus-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            samples = self._source.generate(self.blocksize, self.samplerate)
+            block = numpy.repeat(samples.reshape(-1, 1), self.channels, axis=1).astype(self.dtype)
+            self._callback(block, self.blocksize, None, None)
+            self._source._wait(self.blocksize, self.samplerate)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+
+class Simulator:
+    def __init__(self, latency=0.0, adc_chip="ADS1015", pms5003_interval=1.0):
+        """A virtual Enviro+: BME280, LTR559 and gas sensor ADC on one bus, a PMS5003 port and a microphone.
+
+        Each model's readings can be changed at any time, eg: simulator.bme280.temperature = waveform(20, 5).
+
+        :param latency: Time, in seconds, each I2C transaction takes
+        :param adc_chip: "ADS1015" or "ADS1115"
+        :param pms5003_interval: Time, in seconds, between PMS5003 frames
+
+        """
+        self.bus = SimulatedBus(latency=latency)
+        self.bme280 = self.bus.add(BME280Model())
+        self.ltr559 = self.bus.add(LTR559Model())
+        self.adc = self.bus.add(ADS1015Model(chip=adc_chip))
+        self.pms5003_port = PMS5003Port(interval=pms5003_interval)
+        self.audio = AudioSource()
+
+    def pms5003(self):
+        """Return a pms5003.PMS5003 reading from the emulated port, without touching GPIO or a serial port."""
+        from pms5003 import PMS5003
+
+        pms5003 = PMS5003.__new__(PMS5003)
+        pms5003._device = "simulated"
+        pms5003._baudrate = 9600
+        pms5003._pin_enable = pms5003._pin_reset = (_Lines(), 0)
+        pms5003._serial = self.pms5003_port
+        return pms5003
+
+    def close(self):
+        self.pms5003_port.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _Lines:
+    def set_value(self, offset, value):
+        pass
@@ -0,0 +1,227 @@
+"""Keep data on disk until it has been uploaded"""
+
+import collections
+import os
+import struct
+import threading
+import zlib
+
+# Record header: payload length and CRC-32 of the payload
+RECORD_HEADER = struct.Struct("<II")
+ACK = struct.Struct("<Q")
+SEGMENT_SUFFIX = ".spool"
+ACK_FILE = "ack"
+
+Record = collections.namedtuple("Record", ("offset", "data"))
+
+
+def _segment_name(base):
+    return f"{base:016d}{SEGMENT_SUFFIX}"
+
+
+class Spool:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, segment_bytes=1024 * 1024):
+        """Durable store-and-forward queue.
+
+        Records are appended to segment files in directory and stay there until the
+        uploader acknowledges them, so nothing is lost while the network is down:
+
+            spool.put(payload)
+            ...
+            records = spool.read()
+            if send(records):
+                spool.ack(records[-1].offset)
+
+        Every record has a position, its offset in bytes since the spool was created.
+        Segments are named after the offset of their first record and the acknowledged
+        offset is kept in a small ack file, so opening a spool only lists the directory
+        and checks the end of the newest segment for a partial write.
+
+        Segments are deleted once every record in them has been acknowledged. If the
+        spool grows beyond max_bytes the oldest segments are deleted, acknowledged or not.
+
+        A spool has a single consumer, give each uploader its own directory.
+
+        :param directory: Directory to keep segments in, created if needed
+        :param max_bytes: Maximum size of all segments, the oldest are deleted first
+        :param segment_bytes: Size at which a new segment is started
+
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+        # Base offset and size of every segment, oldest first
+        self._segments = [
+            [int(name[:-len(SEGMENT_SUFFIX)]), os.path.getsize(os.path.join(directory, name))]
+            for name in sorted(os.listdir(directory)) if name.endswith(SEGMENT_SUFFIX)
+        ]
+        try:
+            with open(os.path.join(directory, ACK_FILE), "rb") as f:
+                self._ack = ACK.unpack(f.read(ACK.size))[0]
+        except (FileNotFoundError, struct.error):
+            self._ack = self._segments[0][0] if self._segments else 0
+
+        if self._segments:
+            self._recover(self._segments[-1])
+            self._ack = min(max(self._ack, self._segments[0][0]), self.head)
+        else:
+            self._segments.append([self._ack, 0])
+
+    def _path(self, base):
+        return os.path.join(self.directory, _segment_name(base))
+
+    def _recover(self, segment):
+        # Only the newest segment can hold a partial record from an interrupted write
+        base, size = segment
+        with open(self._path(base), "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= size:
+            length, crc = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > size or zlib.crc32(data[offset + RECORD_HEADER.size:end]) != crc:
+                break
+            offset = end
+        if offset < size:
+            os.truncate(self._path(base), offset)
+            segment[1] = offset
+
+    @property
+    def head(self):
+        """Offset the next record will be written at."""
+        base, size = self._segments[-1]
+        return base + size
+
+    @property
+    def acked(self):
+        """Offset of the first unacknowledged record."""
+        return self._ack
+
+    @property
+    def pending(self):
+        """Size, in bytes, of the unacknowledged records."""
+        return self.head - self._ack
+
+    @property
+    def size(self):
+        """Size, in bytes, of all segments on disk."""
+        return sum(size for _, size in self._segments)
+
+    def put(self, data):
+        """Append a record, returning the offset after it.
+
+        :param data: bytes to store
+
+        """
+        return self.put_many((data,))
+
+    def put_many(self, records):
+        """Append several records with one write and fsync, returning the offset after the last.
+
+        :param records: List of bytes to store
+
+        """
+        with self._lock:
+            if self._segments[-1][1] >= self.segment_bytes:
+                self._roll()
+            data = b"".join(RECORD_HEADER.pack(len(record), zlib.crc32(record)) + bytes(record) for record in records)
+            if self._file is None:
+                self._file = open(self._path(self._segments[-1][0]), "ab")
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._segments[-1][1] += len(data)
+            self._evict()
+            return self.head
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._segments.append([self.head, 0])
+
+    def _evict(self):
+        while len(self._segments) > 1 and self.size > self.max_bytes:
+            base, size = self._segments.pop(0)
+            os.unlink(self._path(base))
+            if self._ack < base + size:
+                self.evicted += base + size - max(self._ack, base)
+                self._ack = base + size
+
+    def read(self, max_records=1000, max_bytes=1024 * 1024):
+        """Return a list of unacknowledged Records, oldest first, without acknowledging them.
+
+        Each Record has the record's data and the offset after it, pass the offset
+        of the last record uploaded to ack(). At least one record is returned if any
+        are pending, even if it is larger than max_bytes.
+
+        :param max_records: Maximum number of records to return
+        :param max_bytes: Maximum total size of the records returned
+
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            records = []
+            total = 0
+            for base, size in self._segments:
+                if base + size <= self._ack:
+                    continue
+                with open(self._path(base), "rb") as f:
+                    f.seek(max(0, self._ack - base))
+                    data = f.read(size - max(0, self._ack - base))
+                position = max(self._ack, base)
+                offset = 0
+                while offset + RECORD_HEADER.size <= len(data):
+                    length, crc = RECORD_HEADER.unpack_from(data, offset)
+                    if records and total + length > max_bytes:
+                        return records
+                    start = offset + RECORD_HEADER.size
+                    if start + length > len(data):
+                        break
+                    offset = start + length
+                    records.append(Record(position + offset, data[start:offset]))
+                    total += length
+                    if len(records) >= max_records:
+                        return records
+            return records
+
+    def ack(self, offset):
+        """Acknowledge every record before an offset, deleting segments that are no longer needed.
+
+        :param offset: Offset from a Record returned by read()
+
+        """
+        with self._lock:
+            if offset <= self._ack:
+                return
+            if offset > self.head:
+                raise ValueError(f"Offset {offset} is beyond the end of the spool")
+            self._ack = offset
+            path = os.path.join(self.directory, ACK_FILE)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(ACK.pack(offset))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+            while len(self._segments) > 1 and sum(self._segments[0]) <= offset:
+                base, _ = self._segments.pop(0)
+                os.unlink(self._path(base))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
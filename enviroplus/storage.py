@@ -0,0 +1,676 @@
+"""Store sensor readings on disk"""
+
+import bisect
+import collections
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+import numpy
+
+from enviroplus import gorilla
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    timestamp INTEGER NOT NULL,
+    metric INTEGER NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS samples_metric_timestamp ON samples (metric, timestamp);
+"""
+
+INSERT_SAMPLE = "INSERT INTO samples (timestamp, metric, value) VALUES (?, ?, ?)"
+INSERT_METRIC = "INSERT OR IGNORE INTO metrics (name) VALUES (?)"
+SELECT_METRIC = "SELECT id FROM metrics WHERE name = ?"
+SELECT_SAMPLES = "SELECT timestamp, value FROM samples WHERE metric = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp"
+
+
+class _BatchWriter:
+    _thread_name = "enviroplus-storage"
+
+    def __init__(self, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+
+        self._pending = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def add(self, metric, value, timestamp=None):
+        """Buffer a value for writing.
+
+        :param metric: Metric name
+        :param value: Value read
+        :param timestamp: Optional time.time() the value was read, defaults to now
+
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._condition:
+            self._pending.append((timestamp, metric, value))
+            if len(self._pending) >= self.batch_size:
+                if self._running:
+                    self._condition.notify()
+                    return
+            else:
+                return
+        self.flush()
+
+    def add_sample(self, sample):
+        """Buffer an enviroplus.hub Sample for writing, use as a Hub subscriber.
+
+        :param sample: Sample to add
+
+        """
+        self.add(sample.metric, sample.value, sample.timestamp)
+
+    def flush(self):
+        """Write all buffered samples in one batch.
+
+        Returns the number of samples written.
+
+        """
+        with self._condition:
+            pending = self._pending
+            self._pending = []
+        if not pending:
+            return 0
+
+        with self._write_lock:
+            try:
+                self._write(pending)
+            except (OSError, sqlite3.Error):
+                # Keep the batch to retry with the next flush
+                with self._condition:
+                    self._pending = pending + self._pending
+                raise
+            self.written += len(pending)
+            self.batches += 1
+        return len(pending)
+
+    def _write(self, pending):
+        raise NotImplementedError
+
+    def start(self):
+        """Start writing batches in the background."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop writing in the background, writing any buffered samples."""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def close(self):
+        """Write any buffered samples and close the store."""
+        self.stop()
+        self.flush()
+        with self._write_lock:
+            self._close()
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        failed = False
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.interval
+                # After a failed write wait the full interval before retrying
+                while self._running and (failed or len(self._pending) < self.batch_size):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+            try:
+                self.flush()
+                failed = False
+            except (OSError, sqlite3.Error) as e:
+                self.errors += 1
+                self.last_error = e
+                failed = True
+
+
+class SQLiteSink(_BatchWriter):
+    _thread_name = "enviroplus-sqlite"
+
+    def __init__(self, path, batch_size=500, interval=30.0):
+        """Batched SQLite store for sensor samples.
+
+        Samples are buffered in memory and written in a single transaction once
+        batch_size have been added or interval seconds have passed, so an SD card
+        sees a few large writes instead of one per reading. The database uses WAL
+        mode, so it can be read by other processes while samples are written.
+
+        Timestamps are stored as integer milliseconds and metric names as a
+        small integer id.
+
+        Call start() to write batches from a background thread, or flush() to
+        write the buffered samples immediately.
+
+        :param path: Database file path, or ":memory:"
+        :param batch_size: Number of buffered samples that triggers a write
+        :param interval: Maximum time, in seconds, a sample is buffered
+
+        """
+        _BatchWriter.__init__(self, batch_size, interval)
+        self.path = path
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+        self._metrics = {}
+
+    def _write(self, pending):
+        with self._db:
+            self._db.executemany(INSERT_SAMPLE, [
+                (int(timestamp * 1000), self._metric_id(metric), value) for timestamp, metric, value in pending
+            ])
+
+    def _metric_id(self, metric):
+        try:
+            return self._metrics[metric]
+        except KeyError:
+            self._db.execute(INSERT_METRIC, (metric,))
+            metric_id = self._db.execute(SELECT_METRIC, (metric,)).fetchone()[0]
+            self._metrics[metric] = metric_id
+            return metric_id
+
+    @property
+    def metrics(self):
+        """List of metric names in the database."""
+        with self._write_lock:
+            return [name for name, in self._db.execute("SELECT name FROM metrics ORDER BY id")]
+
+    def query(self, metric, start=None, end=None):
+        """Return (timestamps, values) arrays for a metric, oldest first.
+
+        Only samples that have been written are returned, call flush() first to include
+        buffered samples.
+
+        :param metric: Metric name
+        :param start: Optional time.time() of the first sample to include
+        :param end: Optional time.time() the samples end before
+
+        """
+        start = -(2 ** 63) if start is None else int(start * 1000)
+        end = 2 ** 63 - 1 if end is None else int(end * 1000)
+        with self._write_lock:
+            row = self._db.execute(SELECT_METRIC, (metric,)).fetchone()
+            rows = [] if row is None else self._db.execute(SELECT_SAMPLES, (row[0], start, end)).fetchall()
+        rows = numpy.array(rows, dtype="<f8").reshape(-1, 2)
+        return rows[:, 0] / 1000.0, rows[:, 1]
+
+    def _close(self):
+        self._db.close()
+
+
+# Fixed-width sample log record, 18 bytes with no padding
+RECORD = numpy.dtype([("timestamp", "<f8"), ("metric", "<u2"), ("value", "<f8")])
+SEGMENT_SUFFIX = ".seg"
+METRICS_FILE = "metrics"
+
+
+def _segment_paths(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def _read_metrics(directory):
+    try:
+        with open(os.path.join(directory, METRICS_FILE), encoding="utf-8") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+class SampleLog(_BatchWriter):
+    _thread_name = "enviroplus-samplelog"
+
+    def __init__(self, directory, segment_records=1 << 20, batch_size=500, interval=30.0):
+        """Append-only binary log of raw sensor samples.
+
+        Samples are written as fixed-width RECORD structs, float64 time.time() timestamp,
+        uint16 metric id and float64 value, to numbered segment files in directory.
+        Metric names are listed, one per line, in the directory's metrics file.
+
+        Like SQLiteSink, samples are buffered and group-committed: each batch is
+        sorted by time, appended with a single write and fsync'd once. A batch that
+        starts before the end of the last one, eg: from Hub threads flushing out of
+        order, is written to a new segment so every segment stays in time order.
+        A batch that fails part way through is truncated off the log before it is
+        retried.
+
+        Read the log with SampleLogReader.
+
+        :param directory: Directory to write segments to, created if needed
+        :param segment_records: Number of records per segment file
+        :param batch_size: Number of buffered samples that triggers a write
+        :param interval: Maximum time, in seconds, a sample is buffered
+
+        """
+        _BatchWriter.__init__(self, batch_size, interval)
+        self.directory = directory
+        self.segment_records = segment_records
+        os.makedirs(directory, exist_ok=True)
+
+        self._metrics = {name: metric_id for metric_id, name in enumerate(_read_metrics(directory))}
+        self._file = None
+        self._index = 0
+        self._records = 0
+        self._last = None
+
+        segments = _segment_paths(directory)
+        if segments:
+            path = segments[-1]
+            self._index = int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+            # Drop any partial record left by an interrupted write
+            self._records = os.path.getsize(path) // RECORD.itemsize
+            os.truncate(path, self._records * RECORD.itemsize)
+            if self._records:
+                last = numpy.fromfile(path, dtype=RECORD, count=1, offset=(self._records - 1) * RECORD.itemsize)
+                self._last = float(last["timestamp"][0])
+
+    def _metric_id(self, metric):
+        try:
+            return self._metrics[metric]
+        except KeyError:
+            metric_id = len(self._metrics)
+            with open(os.path.join(self.directory, METRICS_FILE), "a", encoding="utf-8") as f:
+                f.write(f"{metric}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._metrics[metric] = metric_id
+            return metric_id
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"{index:08d}{SEGMENT_SUFFIX}")
+
+    def _next_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index += 1
+        self._records = 0
+
+    def _open(self):
+        if self._records >= self.segment_records:
+            self._next_segment()
+        if self._file is None:
+            self._file = open(self._segment_path(self._index), "ab")
+        return self._file
+
+    def _write(self, pending):
+        records = numpy.empty(len(pending), dtype=RECORD)
+        records["timestamp"] = [timestamp for timestamp, _, _ in pending]
+        records["metric"] = [self._metric_id(metric) for _, metric, _ in pending]
+        records["value"] = [value for _, _, value in pending]
+        records = records[numpy.argsort(records["timestamp"], kind="stable")]
+
+        index, count, last = self._index, self._records, self._last
+        if last is not None and count > 0 and records["timestamp"][0] < last:
+            # Keep segments in time order, SampleLogReader merges overlapping segments
+            self._next_segment()
+            index, count = self._index, 0
+
+        try:
+            offset = 0
+            while offset < len(records):
+                f = self._open()
+                size = min(len(records) - offset, self.segment_records - self._records)
+                f.write(records[offset:offset + size].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+                self._records += size
+                offset += size
+        except OSError:
+            # Remove what was written so the retried batch isn't duplicated
+            self._rollback(index, count)
+            raise
+        self._last = float(records["timestamp"][-1])
+
+    def _rollback(self, index, records):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for later in range(index + 1, self._index + 1):
+            path = self._segment_path(later)
+            if os.path.exists(path):
+                os.remove(path)
+        path = self._segment_path(index)
+        if os.path.exists(path):
+            os.truncate(path, records * RECORD.itemsize)
+        self._index = index
+        self._records = records
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SampleLogReader:
+    def __init__(self, directory):
+        """Read a SampleLog without parsing.
+
+        Each segment is memory-mapped and viewed as a NumPy RECORD array, so
+        only the pages a query touches are read from disk. Segments are found
+        again on every query, so a log can be read while it is being written.
+
+        :param directory: Directory the SampleLog writes to
+
+        """
+        self.directory = directory
+        self._segments = {}
+
+    @property
+    def metrics(self):
+        """List of metric names in the log."""
+        return _read_metrics(self.directory)
+
+    def segments(self):
+        """Return a list of read-only RECORD arrays, one per segment, oldest first."""
+        segments = []
+        for path in _segment_paths(self.directory):
+            count = os.path.getsize(path) // RECORD.itemsize
+            if count == 0:
+                continue
+            cached = self._segments.get(path)
+            if cached is None or len(cached) != count:
+                cached = numpy.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+                self._segments[path] = cached
+            segments.append(cached)
+        return segments
+
+    def query(self, metric, start=None, end=None):
+        """Return (timestamps, values) arrays for a metric, oldest first.
+
+        Segments outside the time range are skipped and the range within a
+        segment is found by binary search on its timestamps. Samples from
+        segments that overlap in time, written by out of order batches, are
+        merged into time order.
+
+        :param metric: Metric name
+        :param start: Optional time.time() of the first sample to include
+        :param end: Optional time.time() the samples end before
+
+        """
+        try:
+            metric_id = self.metrics.index(metric)
+        except ValueError:
+            return numpy.zeros(0, dtype="<f8"), numpy.zeros(0, dtype="<f8")
+
+        timestamps = []
+        values = []
+        for segment in self.segments():
+            times = segment["timestamp"]
+            if (start is not None and times[-1] < start) or (end is not None and times[0] >= end):
+                continue
+            first = 0 if start is None else numpy.searchsorted(times, start, side="left")
+            last = len(times) if end is None else numpy.searchsorted(times, end, side="left")
+            records = segment[first:last]
+            records = records[records["metric"] == metric_id]
+            timestamps.append(records["timestamp"])
+            values.append(records["value"])
+
+        if not timestamps:
+            return numpy.zeros(0, dtype="<f8"), numpy.zeros(0, dtype="<f8")
+        timestamps = numpy.concatenate(timestamps)
+        values = numpy.concatenate(values)
+        if len(timestamps) > 1 and (timestamps[1:] < timestamps[:-1]).any():
+            order = numpy.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values
+
+
+# Compressed series block header: start and end in milliseconds, count, min, max, payload size
+BLOCK_HEADER = struct.Struct("<qqIddI")
+SERIES_SUFFIX = ".series"
+
+Block = collections.namedtuple("Block", ("start", "end", "count", "min", "max", "offset", "size"))
+
+
+class SeriesStore:
+    def __init__(self, directory, block_size=1024):
+        """Compressed long-term store for sensor samples.
+
+        Each metric is kept in its own append-only file of blocks compressed with
+        enviroplus.gorilla. Every block has a header with its time range, sample
+        count and minimum and maximum value, which is read into an index when the
+        store is opened, so queries only decode the blocks they need and summary()
+        only decodes blocks at the edges of its range.
+
+        Samples are held in memory until block_size have been added for a metric,
+        call flush() to write partial blocks, eg: before shutdown. Samples for a
+        metric must be added in time order.
+
+        :param directory: Directory to write series to, created if needed
+        :param block_size: Number of samples per block
+
+        """
+        self.directory = directory
+        self.block_size = block_size
+        os.makedirs(directory, exist_ok=True)
+
+        self._index = {}
+        self._starts = {}
+        self._ends = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        for name in os.listdir(directory):
+            if name.endswith(SERIES_SUFFIX):
+                metric = name[:-len(SERIES_SUFFIX)]
+                for block in self._read_index(os.path.join(directory, name)):
+                    self._add_block(metric, block)
+
+    def _path(self, metric):
+        return os.path.join(self.directory, f"{metric}{SERIES_SUFFIX}")
+
+    def _read_index(self, path):
+        blocks = []
+        offset = 0
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            while offset + BLOCK_HEADER.size <= size:
+                start, end, count, vmin, vmax, length = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+                if offset + BLOCK_HEADER.size + length > size:
+                    break
+                blocks.append(Block(start, end, count, vmin, vmax, offset + BLOCK_HEADER.size, length))
+                offset += BLOCK_HEADER.size + length
+                f.seek(offset)
+        if offset < size:
+            # Drop a partial block left by an interrupted write
+            os.truncate(path, offset)
+        return blocks
+
+    @property
+    def metrics(self):
+        return sorted(set(self._index) | set(self._pending))
+
+    def add(self, metric, value, timestamp=None):
+        """Add a value, writing a block once block_size values are held.
+
+        :param metric: Metric name
+        :param value: Value read
+        :param timestamp: Optional time.time() the value was read, defaults to now
+
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            pending = self._pending.setdefault(metric, [])
+            pending.append((int(round(timestamp * 1000)), value))
+            if len(pending) >= self.block_size:
+                self._write_block(metric)
+
+    def add_sample(self, sample):
+        """Add the value of an enviroplus.hub Sample, use as a Hub subscriber.
+
+        :param sample: Sample to add
+
+        """
+        self.add(sample.metric, sample.value, sample.timestamp)
+
+    def flush(self):
+        """Write every metric's held values as a, possibly partial, block."""
+        with self._lock:
+            for metric in list(self._pending):
+                self._write_block(metric)
+
+    def close(self):
+        self.flush()
+
+    def _write_block(self, metric):
+        pending = self._pending.pop(metric, None)
+        if not pending:
+            return
+        timestamps, values = zip(*pending)
+        payload = gorilla.encode(timestamps, values)
+        header = BLOCK_HEADER.pack(timestamps[0], timestamps[-1], len(values), min(values), max(values), len(payload))
+        path = self._path(metric)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(header + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self._add_block(metric, Block(timestamps[0], timestamps[-1], len(values), min(values), max(values), offset + BLOCK_HEADER.size, len(payload)))
+
+    def _add_block(self, metric, block):
+        self._index.setdefault(metric, []).append(block)
+        self._starts.setdefault(metric, []).append(block.start)
+        self._ends.setdefault(metric, []).append(block.end)
+
+    def blocks(self, metric, start=None, end=None):
+        """Return the index entries of written Blocks overlapping a time range.
+
+        Block start and end are in integer milliseconds.
+
+        :param metric: Metric name
+        :param start: Optional time.time() of the first sample to include
+        :param end: Optional time.time() the samples end before
+
+        """
+        with self._lock:
+            blocks = self._index.get(metric, [])
+            first = 0
+            last = len(blocks)
+            if start is not None:
+                first = bisect.bisect_left(self._ends.get(metric, []), int(round(start * 1000)))
+            if end is not None:
+                last = bisect.bisect_left(self._starts.get(metric, []), int(round(end * 1000)))
+            return blocks[first:last]
+
+    def _decode(self, metric, blocks):
+        if not blocks:
+            return
+        with open(self._path(metric), "rb") as f:
+            for block in blocks:
+                f.seek(block.offset)
+                yield gorilla.decode(f.read(block.size), block.count)
+
+    def query(self, metric, start=None, end=None):
+        """Return (timestamps, values) arrays for a metric, oldest first.
+
+        Includes values that have not yet been written.
+
+        :param metric: Metric name
+        :param start: Optional time.time() of the first sample to include
+        :param end: Optional time.time() the samples end before
+
+        """
+        timestamps = []
+        values = []
+        for block_timestamps, block_values in self._decode(metric, self.blocks(metric, start, end)):
+            timestamps.append(block_timestamps)
+            values.append(block_values)
+        with self._lock:
+            pending = list(self._pending.get(metric, ()))
+        if pending:
+            timestamps.append(numpy.array([t for t, _ in pending], dtype="<i8"))
+            values.append(numpy.array([v for _, v in pending], dtype="<f8"))
+
+        if not timestamps:
+            return numpy.zeros(0, dtype="<f8"), numpy.zeros(0, dtype="<f8")
+        timestamps = numpy.concatenate(timestamps)
+        values = numpy.concatenate(values)
+        mask = numpy.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= int(round(start * 1000))
+        if end is not None:
+            mask &= timestamps < int(round(end * 1000))
+        return timestamps[mask] / 1000.0, values[mask]
+
+    def summary(self, metric, start=None, end=None):
+        """Return (count, min, max) of a metric's written values over a time range.
+
+        Blocks entirely inside the range are summarised from the index without
+        being read, only blocks that straddle start or end are decoded.
+
+        :param metric: Metric name
+        :param start: Optional time.time() of the first sample to include
+        :param end: Optional time.time() the samples end before
+
+        """
+        start_ms = None if start is None else int(round(start * 1000))
+        end_ms = None if end is None else int(round(end * 1000))
+        count = 0
+        vmin = vmax = None
+        edges = []
+        for block in self.blocks(metric, start, end):
+            if (start_ms is None or block.start >= start_ms) and (end_ms is None or block.end < end_ms):
+                count += block.count
+                vmin = block.min if vmin is None else min(vmin, block.min)
+                vmax = block.max if vmax is None else max(vmax, block.max)
+            else:
+                edges.append(block)
+
+        for timestamps, values in self._decode(metric, edges):
+            mask = numpy.ones(len(timestamps), dtype=bool)
+            if start_ms is not None:
+                mask &= timestamps >= start_ms
+            if end_ms is not None:
+                mask &= timestamps < end_ms
+            values = values[mask]
+            if len(values):
+                count += len(values)
+                vmin = values.min() if vmin is None else min(vmin, values.min())
+                vmax = values.max() if vmax is None else max(vmax, values.max())
+
+        return count, vmin, vmax
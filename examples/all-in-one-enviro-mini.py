@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import colorsys
 import os
 import sys
 import time
@@ -21,6 +20,9 @@ from bme280 import BME280
 from fonts.ttf import RobotoMedium as UserFont
 from PIL import Image, ImageDraw, ImageFont
 
+from enviroplus import display
+from enviroplus.ringbuffer import RingBuffer
+
 logging.basicConfig(
     format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
     level=logging.INFO,
@@ -64,27 +66,8 @@ top_pos = 25
 
 # Displays data and text on the 0.96" LCD
 def display_text(variable, data, unit):
-    # Maintain length of list
-    values[variable] = values[variable][1:] + [data]
-    # Scale the values for the variable between 0 and 1
-    vmin = min(values[variable])
-    vmax = max(values[variable])
-    colours = [(v - vmin + 1) / (vmax - vmin + 1) for v in values[variable]]
-    # Format the variable name and value
-    message = f"{variable[:4]}: {data:.1f} {unit}"
+    message = display.draw_history(draw, font, values[variable], variable, data, unit, WIDTH, HEIGHT, top_pos)
     logging.info(message)
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (255, 255, 255))
-    for i in range(len(colours)):
-        # Convert the values to colours from red to blue
-        colour = (1.0 - colours[i]) * 0.6
-        r, g, b = [int(x * 255.0) for x in colorsys.hsv_to_rgb(colour, 1.0, 1.0)]
-        # Draw a 1-pixel wide rectangle of colour
-        draw.rectangle((i, top_pos, i + 1, HEIGHT), (r, g, b))
-        # Draw a line graph in black
-        line_y = HEIGHT - (top_pos + (colours[i] * (HEIGHT - top_pos))) + top_pos
-        draw.rectangle((i, line_y, i + 1, line_y + 1), (0, 0, 0))
-    # Write the text at the top in black
-    draw.text((0, 0), message, font=font, fill=(0, 0, 0))
     st7735.display(img)
 
 
@@ -99,7 +82,7 @@ def get_cpu_temperature():
 # temperature down, and increase to adjust up
 factor = 2.25
 
-cpu_temps = [get_cpu_temperature()] * 5
+cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
 
 delay = 0.5  # Debounce the proximity tap
 mode = 0  # The starting mode
@@ -115,7 +98,7 @@ variables = ["temperature",
 values = {}
 
 for v in variables:
-    values[v] = [1] * WIDTH
+    values[v] = RingBuffer(WIDTH, fill=1)
 
 # The main loop
 try:
@@ -134,8 +117,8 @@ try:
             unit = "°C"
             cpu_temp = get_cpu_temperature()
             # Smooth out with some averaging to decrease jitter
-            cpu_temps = cpu_temps[1:] + [cpu_temp]
-            avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+            cpu_temps.append(cpu_temp)
+            avg_cpu_temp = cpu_temps.mean()
             raw_temp = bme280.get_temperature()
             data = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
             display_text(variables[mode], data, unit)
@@ -6,7 +6,6 @@ combined.py - Displays readings from all of Enviro plus' sensors
 Press Ctrl+C to exit!
 """
 
-import colorsys
 import sys
 import time
 import logging
@@ -25,10 +24,11 @@ from bme280 import BME280
 from fonts.ttf import RobotoMedium as UserFont
 from PIL import Image, ImageDraw, ImageFont
 from pms5003 import PMS5003
-from pms5003 import ReadTimeoutError as pmsReadTimeoutError
-from pms5003 import SerialTimeoutError
 
-from enviroplus import gas
+from enviroplus import display, hub
+from enviroplus.latest import LatestValues
+from enviroplus.particulates import PMS5003Reader
+from enviroplus.ringbuffer import RingBuffer
 
 
 logging.basicConfig(
@@ -42,9 +42,10 @@ logging.info(__doc__)
 # BME280 temperature/pressure/humidity sensor
 bme280 = BME280()
 
-# PMS5003 particulate sensor
-pms5003 = PMS5003()
-time.sleep(1.0)
+# PMS5003 particulate sensor, read in the background so it never blocks the display
+pms5003 = PMS5003Reader(PMS5003())
+pms5003.start()
+PMS_MAX_AGE = 5.0
 
 # Create ST7735 LCD display class
 # Changed from dc="GPIO9", backlight="GPIO12" to dc=9, backlight=12 (BCM pins)
@@ -137,6 +138,11 @@ palette = [
 
 values = {}
 
+# Cache gas readings so the oxidised, reduced and NH3 modes share one read
+latest = LatestValues()
+latest.register(("oxidising", "reducing", "nh3"), hub.gas_source().read)
+GAS_MAX_AGE = 1.0
+
 
 def get_cpu_temperature():
     """
@@ -157,38 +163,8 @@ def display_text(variable, data, unit):
     Displays data and text on the 0.96" LCD for a single variable.
     Shows a colored bar (0→blue to 1→red) and a small line graph of recent data.
     """
-    # Maintain length of list
-    values[variable] = values[variable][1:] + [data]
-
-    # Scale the values for the variable between 0 and 1
-    vmin = min(values[variable])
-    vmax = max(values[variable])
-    # Avoid division by zero if all values are the same
-    spread = (vmax - vmin) + 1
-    colours = [(v - vmin + 1) / spread for v in values[variable]]
-
-    # Format the variable name and value
-    msg = f"{variable[:4]}: {data:.1f} {unit}"
-    logging.info(msg)
-
-    # Clear the screen to white
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (255, 255, 255))
-
-    for i, c in enumerate(colours):
-        # Convert the values to colours from red (1.0) to blue (0.0)
-        colour_scale = (1.0 - c) * 0.6
-        r, g, b = [int(x * 255.0)
-                   for x in colorsys.hsv_to_rgb(colour_scale, 1.0, 1.0)]
-
-        # Draw a 1-pixel wide rectangle of colour
-        draw.rectangle((i, top_pos, i + 1, HEIGHT), (r, g, b))
-
-        # Draw a line graph in black
-        line_y = HEIGHT - (top_pos + (c * (HEIGHT - top_pos))) + top_pos
-        draw.rectangle((i, line_y, i + 1, line_y + 1), (0, 0, 0))
-
-    # Write the text at the top in black
-    draw.text((0, 0), msg, font=font, fill=(0, 0, 0))
+    message = display.draw_history(draw, font, values[variable], variable, data, unit, WIDTH, HEIGHT, top_pos)
+    logging.info(message)
     st7735.display(img)
 
 
@@ -198,7 +174,7 @@ def save_data(idx, data):
     variable and logs it. Used when displaying everything on one screen.
     """
     variable = variables[idx]
-    values[variable] = values[variable][1:] + [data]
+    values[variable].append(data)
     unit = units[idx]
     msg = f"{variable[:4]}: {data:.1f} {unit}"
     logging.info(msg)
@@ -209,31 +185,7 @@ def display_everything():
     Splits the screen into multiple rows/columns so that each variable can be
     displayed simultaneously with color-coded text (based on defined limits).
     """
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (0, 0, 0))
-    column_count = 2
-    row_count = len(variables) / column_count
-
-    for i, variable in enumerate(variables):
-        data_value = values[variable][-1]
-        unit = units[i]
-
-        # Calculate the row & column
-        col_index = i // int(row_count)
-        row_index = i % int(row_count)
-
-        x = x_offset + ((WIDTH // column_count) * col_index)
-        y = y_offset + int((HEIGHT / row_count) * row_index)
-        msg = f"{variable[:4]}: {data_value:.1f} {unit}"
-
-        # Determine the color of the text using the user-defined limits
-        lim = limits[i]
-        rgb = palette[0]
-        for j, limit in enumerate(lim):
-            if data_value > limit:
-                rgb = palette[j + 1]
-
-        draw.text((x, y), msg, font=smallfont, fill=rgb)
-
+    display.draw_everything(draw, smallfont, values, variables, units, limits, palette, WIDTH, HEIGHT, x_offset, y_offset)
     st7735.display(img)
 
 
@@ -246,7 +198,7 @@ def main():
     # increase to adjust up
     factor = 2.25
 
-    cpu_temps = [get_cpu_temperature()] * 5
+    cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
 
     delay = 0.5  # Debounce the proximity tap
     mode = 10    # The starting mode
@@ -254,7 +206,7 @@ def main():
 
     # Initialize the values dictionary
     for var in variables:
-        values[var] = [1] * WIDTH
+        values[var] = RingBuffer(WIDTH, fill=1)
 
     try:
         while True:
@@ -269,8 +221,8 @@ def main():
                 # Temperature
                 unit = "°C"
                 cpu_temp = get_cpu_temperature()
-                cpu_temps = cpu_temps[1:] + [cpu_temp]
-                avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+                cpu_temps.append(cpu_temp)
+                avg_cpu_temp = cpu_temps.mean()
                 raw_temp = bme280.get_temperature()
                 data = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
                 display_text(variables[mode], data, unit)
@@ -296,31 +248,28 @@ def main():
             elif mode == 4:
                 # Oxidised
                 unit = "kO"
-                gas_data = gas.read_all()
-                data = gas_data.oxidising / 1000
+                data = latest.get("oxidising", max_age=GAS_MAX_AGE) / 1000
                 display_text(variables[mode], data, unit)
 
             elif mode == 5:
                 # Reduced
                 unit = "kO"
-                gas_data = gas.read_all()
-                data = gas_data.reducing / 1000
+                data = latest.get("reducing", max_age=GAS_MAX_AGE) / 1000
                 display_text(variables[mode], data, unit)
 
             elif mode == 6:
                 # NH3
                 unit = "kO"
-                gas_data = gas.read_all()
-                data = gas_data.nh3 / 1000
+                data = latest.get("nh3", max_age=GAS_MAX_AGE) / 1000
                 display_text(variables[mode], data, unit)
 
             elif mode == 7:
                 # PM1
                 unit = "ug/m3"
-                try:
-                    pms_data = pms5003.read()
-                    data = float(pms_data.pm_ug_per_m3(1.0))
-                except (SerialTimeoutError, pmsReadTimeoutError):
+                frame = pms5003.latest(max_age=PMS_MAX_AGE)
+                if frame is not None:
+                    data = float(frame.data.pm_ug_per_m3(1.0))
+                else:
                     logging.warning("Failed to read PMS5003")
                     data = 0
                 display_text(variables[mode], data, unit)
@@ -328,10 +277,10 @@ def main():
             elif mode == 8:
                 # PM2.5
                 unit = "ug/m3"
-                try:
-                    pms_data = pms5003.read()
-                    data = float(pms_data.pm_ug_per_m3(2.5))
-                except (SerialTimeoutError, pmsReadTimeoutError):
+                frame = pms5003.latest(max_age=PMS_MAX_AGE)
+                if frame is not None:
+                    data = float(frame.data.pm_ug_per_m3(2.5))
+                else:
                     logging.warning("Failed to read PMS5003")
                     data = 0
                 display_text(variables[mode], data, unit)
@@ -339,10 +288,10 @@ def main():
             elif mode == 9:
                 # PM10
                 unit = "ug/m3"
-                try:
-                    pms_data = pms5003.read()
-                    data = float(pms_data.pm_ug_per_m3(10))
-                except (SerialTimeoutError, pmsReadTimeoutError):
+                frame = pms5003.latest(max_age=PMS_MAX_AGE)
+                if frame is not None:
+                    data = float(frame.data.pm_ug_per_m3(10))
+                else:
                     logging.warning("Failed to read PMS5003")
                     data = 0
                 display_text(variables[mode], data, unit)
@@ -350,8 +299,8 @@ def main():
             else:
                 # Everything on one screen (mode == 10)
                 cpu_temp = get_cpu_temperature()
-                cpu_temps = cpu_temps[1:] + [cpu_temp]
-                avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+                cpu_temps.append(cpu_temp)
+                avg_cpu_temp = cpu_temps.mean()
                 raw_temp = bme280.get_temperature()
                 adjusted_temp = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
                 save_data(0, adjusted_temp)
@@ -365,22 +314,22 @@ def main():
                 lux_data = ltr559.get_lux() if proximity < 10 else 1
                 save_data(3, lux_data)
 
-                gas_data = gas.read_all()
-                save_data(4, gas_data.oxidising / 1000)
-                save_data(5, gas_data.reducing / 1000)
-                save_data(6, gas_data.nh3 / 1000)
-
-                try:
-                    pms_data = pms5003.read()
-                    save_data(7, float(pms_data.pm_ug_per_m3(1.0)))
-                    save_data(8, float(pms_data.pm_ug_per_m3(2.5)))
-                    save_data(9, float(pms_data.pm_ug_per_m3(10)))
-                except (SerialTimeoutError, pmsReadTimeoutError):
+                save_data(4, latest.get("oxidising", max_age=GAS_MAX_AGE) / 1000)
+                save_data(5, latest.get("reducing", max_age=GAS_MAX_AGE) / 1000)
+                save_data(6, latest.get("nh3", max_age=GAS_MAX_AGE) / 1000)
+
+                frame = pms5003.latest(max_age=PMS_MAX_AGE)
+                if frame is not None:
+                    save_data(7, float(frame.data.pm_ug_per_m3(1.0)))
+                    save_data(8, float(frame.data.pm_ug_per_m3(2.5)))
+                    save_data(9, float(frame.data.pm_ug_per_m3(10)))
+                else:
                     logging.warning("Failed to read PMS5003")
 
                 display_everything()
 
     except KeyboardInterrupt:
+        pms5003.stop()
         sys.exit(0)
 
 
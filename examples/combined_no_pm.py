@@ -6,7 +6,6 @@ combined_no_pms.py - Displays readings from Enviro plus' sensors, EXCLUDING PMS5
 Press Ctrl+C to exit!
 """
 
-import colorsys
 import sys
 import time
 import logging
@@ -28,7 +27,8 @@ from PIL import Image, ImageDraw, ImageFont
 # from pms5003 import ReadTimeoutError as pmsReadTimeoutError
 # from pms5003 import SerialTimeoutError
 
-from enviroplus import gas
+from enviroplus import display, gas
+from enviroplus.ringbuffer import RingBuffer
 
 logging.basicConfig(
     format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
@@ -139,30 +139,8 @@ def display_text(variable, data, unit):
     Displays data and text on the 0.96" LCD for a single variable.
     Shows a colored bar (0→blue to 1→red) and a small line graph of recent data.
     """
-    # Maintain length of list
-    values[variable] = values[variable][1:] + [data]
-
-    # Scale the values for the variable between 0 and 1
-    vmin = min(values[variable])
-    vmax = max(values[variable])
-    spread = (vmax - vmin) + 1
-    colours = [(v - vmin + 1) / spread for v in values[variable]]
-
-    # Format the variable name and value
-    msg = f"{variable[:4]}: {data:.1f} {unit}"
-    logging.info(msg)
-
-    # Clear the screen to white
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (255, 255, 255))
-
-    for i, c in enumerate(colours):
-        colour_scale = (1.0 - c) * 0.6
-        r, g, b = [int(x * 255.0) for x in colorsys.hsv_to_rgb(colour_scale, 1.0, 1.0)]
-        draw.rectangle((i, top_pos, i + 1, HEIGHT), (r, g, b))
-        line_y = HEIGHT - (top_pos + (c * (HEIGHT - top_pos))) + top_pos
-        draw.rectangle((i, line_y, i + 1, line_y + 1), (0, 0, 0))
-
-    draw.text((0, 0), msg, font=font, fill=(0, 0, 0))
+    message = display.draw_history(draw, font, values[variable], variable, data, unit, WIDTH, HEIGHT, top_pos)
+    logging.info(message)
     st7735.display(img)
 
 def save_data(idx, data):
@@ -171,7 +149,7 @@ def save_data(idx, data):
     variable and logs it. Used when displaying everything on one screen.
     """
     variable = variables[idx]
-    values[variable] = values[variable][1:] + [data]
+    values[variable].append(data)
     unit = units[idx]
     msg = f"{variable[:4]}: {data:.1f} {unit}"
     logging.info(msg)
@@ -181,29 +159,7 @@ def display_everything():
     Splits the screen into multiple rows/columns so that each variable can be
     displayed simultaneously with color-coded text (based on defined limits).
     """
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (0, 0, 0))
-    column_count = 2
-    row_count = len(variables) / column_count
-
-    for i, variable in enumerate(variables):
-        data_value = values[variable][-1]
-        unit = units[i]
-
-        col_index = i // int(row_count)
-        row_index = i % int(row_count)
-
-        x = x_offset + ((WIDTH // column_count) * col_index)
-        y = y_offset + int((HEIGHT / row_count) * row_index)
-        msg = f"{variable[:4]}: {data_value:.1f} {unit}"
-
-        lim = limits[i]
-        rgb = palette[0]
-        for j, limit in enumerate(lim):
-            if data_value > limit:
-                rgb = palette[j + 1]
-
-        draw.text((x, y), msg, font=smallfont, fill=rgb)
-
+    display.draw_everything(draw, smallfont, values, variables, units, limits, palette, WIDTH, HEIGHT, x_offset, y_offset)
     st7735.display(img)
 
 def main():
@@ -212,13 +168,13 @@ def main():
     that shows everything on one screen. Tap near the sensor to change modes.
     """
     factor = 2.25
-    cpu_temps = [get_cpu_temperature()] * 5
+    cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
     delay = 0.5
     mode = 7  # Start in "everything on one screen" mode
     last_page = 0
 
     for var in variables:
-        values[var] = [1] * WIDTH
+        values[var] = RingBuffer(WIDTH, fill=1)
 
     try:
         while True:
@@ -233,8 +189,8 @@ def main():
                 # Temperature
                 unit = "°C"
                 cpu_temp = get_cpu_temperature()
-                cpu_temps = cpu_temps[1:] + [cpu_temp]
-                avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+                cpu_temps.append(cpu_temp)
+                avg_cpu_temp = cpu_temps.mean()
                 raw_temp = bme280.get_temperature()
                 data = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
                 display_text(variables[mode], data, unit)
@@ -281,8 +237,8 @@ def main():
             else:
                 # Everything on one screen (mode == 7)
                 cpu_temp = get_cpu_temperature()
-                cpu_temps = cpu_temps[1:] + [cpu_temp]
-                avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+                cpu_temps.append(cpu_temp)
+                avg_cpu_temp = cpu_temps.mean()
                 raw_temp = bme280.get_temperature()
                 adjusted_temp = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
                 save_data(0, adjusted_temp)
@@ -6,6 +6,8 @@ import time
 from bme280 import BME280
 from smbus2 import SMBus
 
+from enviroplus.ringbuffer import RingBuffer
+
 logging.basicConfig(
     format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
     level=logging.INFO,
@@ -36,13 +38,13 @@ def get_cpu_temperature():
 # temperature down, and increase to adjust up
 factor = 2.25
 
-cpu_temps = [get_cpu_temperature()] * 5
+cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
 
 while True:
     cpu_temp = get_cpu_temperature()
     # Smooth out with some averaging to decrease jitter
-    cpu_temps = cpu_temps[1:] + [cpu_temp]
-    avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+    cpu_temps.append(cpu_temp)
+    avg_cpu_temp = cpu_temps.mean()
     raw_temp = bme280.get_temperature()
     comp_temp = raw_temp - ((avg_cpu_temp - raw_temp) / factor)
     logging.info(f"Compensated temperature: {comp_temp:05.2f} °C")
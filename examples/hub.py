@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+
+from bme280 import BME280
+from ltr559 import LTR559
+from pms5003 import PMS5003
+
+from enviroplus import gas, hub, metrics
+from enviroplus.bus import BusManager
+from enviroplus.noise import Noise
+from enviroplus.storage import SQLiteSink
+
+logging.basicConfig(
+    format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S")
+
+logging.info("""hub.py - Read every sensor at its own rate.
+
+Each sensor is read on a worker thread, so the slow particulate sensor
+and noise capture do not hold up the faster sensors.
+
+Every reading is also stored in enviroplus.db, written in batches.
+
+The time taken by each read is logged on exit.
+
+Press Ctrl+C to exit!
+
+""")
+
+metrics.enable()
+
+# Sensors are read from several threads, so share the I2C bus through a BusManager
+bus = BusManager(1)
+gas.setup(i2c_dev=bus.device("ads1015"))
+
+
+def on_sample(sample):
+    logging.info(f"{sample.metric}: {sample.value:.2f}")
+
+
+def on_error(source, error):
+    logging.warning(f"Failed to read {source.name}: {error}")
+
+
+sensors = hub.Hub(on_error=on_error)
+sensors.add(hub.bme280_source(BME280(i2c_dev=bus.device("bme280")), period=1.0))
+sensors.add(hub.ltr559_source(LTR559(i2c_dev=bus.device("ltr559")), period=0.5))
+sensors.add(hub.gas_source(period=1.0))
+sensors.add(hub.pms5003_source(PMS5003(), period=1.0))
+sensors.add(hub.noise_source(Noise(), period=5.0))
+sensors.subscribe(on_sample)
+
+store = SQLiteSink("enviroplus.db")
+sensors.subscribe(store.add_sample)
+
+with store, sensors:
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+
+for name, stats in bus.stats().items():
+    logging.info(f"{name}:\n{stats}")
+
+snapshot = metrics.snapshot()
+for name, histogram in sorted(snapshot["histograms"].items()):
+    logging.info(f"{name}:\n{histogram}")
+for name, count in sorted(snapshot["counters"].items()):
+    logging.info(f"{name}: {count}")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import time
+
+from bme280 import BME280
+from ltr559 import LTR559
+from pms5003 import PMS5003
+
+from enviroplus import gas, hub
+from enviroplus.bus import BusManager
+from enviroplus.influx import InfluxWriter
+from enviroplus.noise import Noise
+
+logging.basicConfig(
+    format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S")
+
+logging.info("""influxdb.py - Upload every sensor reading to InfluxDB.
+
+Readings are sent in compressed batches of line protocol, batches that
+fail to send, eg: while the network is down, are kept on disk and sent
+once it is back.
+
+Example: ./influxdb.py --url "http://influxdb:8086/api/v2/write?org=home&bucket=enviroplus" --token xxxx
+
+Press Ctrl+C to exit!
+
+""")
+
+parser = argparse.ArgumentParser(description="Upload Enviro+ readings to InfluxDB")
+parser.add_argument("--url", required=True, help="InfluxDB write endpoint")
+parser.add_argument("--token", default=None, help="InfluxDB API token")
+parser.add_argument("--host", default="enviroplus", help="Value of the host tag")
+parser.add_argument("--spool", default="influxdb-spool", help="Directory to keep unsent batches in")
+parser.add_argument("--interval", default=30.0, type=float, help="Maximum time, in seconds, between uploads")
+args = parser.parse_args()
+
+bus = BusManager(1)
+gas.setup(i2c_dev=bus.device("ads1015"))
+
+writer = InfluxWriter(args.url, args.spool, token=args.token, tags={"host": args.host}, interval=args.interval)
+
+sensors = hub.Hub()
+sensors.add(hub.bme280_source(BME280(i2c_dev=bus.device("bme280")), period=1.0))
+sensors.add(hub.ltr559_source(LTR559(i2c_dev=bus.device("ltr559")), period=1.0))
+sensors.add(hub.gas_source(period=1.0))
+sensors.add(hub.pms5003_source(PMS5003(), period=1.0))
+sensors.add(hub.noise_source(Noise(), period=5.0))
+sensors.subscribe(writer.add_sample)
+
+with writer, sensors:
+    try:
+        while True:
+            time.sleep(args.interval)
+            logging.info(f"Sent {writer.sent} batches, {writer.spooled} bytes waiting, {writer.errors} errors")
+    except KeyboardInterrupt:
+        pass
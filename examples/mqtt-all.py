@@ -3,17 +3,30 @@
 Run mqtt broker on localhost: sudo apt-get install mosquitto mosquitto-clients
 
 Example run: python3 mqtt-all.py --broker 192.168.1.164 --topic enviro --username xxx --password xxxx
+
+Readings are published every --interval seconds, add --oversample 10 to publish
+the average of 10 readings taken evenly across each interval.
+
+To save bandwidth, add --encoding struct (or cbor, msgpack) for binary payloads,
+--batch 12 to send 12 readings per message and --per-metric to publish each
+metric on its own topic, eg: enviro/temperature. Struct payloads do not include
+the serial number, give each device its own --topic.
 """
 
 import argparse
+import collections
+import math
 import ssl
 import time
 
 import st7735
 from bme280 import BME280
-from pms5003 import PMS5003, ReadTimeoutError, SerialTimeoutError
+from pms5003 import PMS5003, SerialTimeoutError
 
-from enviroplus import gas
+from enviroplus import gas, metrics
+from enviroplus.particulates import PMS5003Reader
+from enviroplus.payload import ENCODINGS, MAX_SAMPLES, PayloadEncoder, average_values
+from enviroplus.spool import Spool
 
 try:
     # Transitional fix for breaking change in LTR559
@@ -24,7 +37,7 @@ except ImportError:
     import ltr559
 
 import json
-from subprocess import PIPE, Popen, check_output
+from subprocess import check_output
 
 import paho.mqtt.client as mqtt
 from fonts.ttf import RobotoMedium as UserFont
@@ -40,9 +53,18 @@ DEFAULT_MQTT_BROKER_IP = "localhost"
 DEFAULT_MQTT_BROKER_PORT = 1883
 DEFAULT_MQTT_TOPIC = "enviroplus"
 DEFAULT_READ_INTERVAL = 5
+DEFAULT_OVERSAMPLE = 1
 DEFAULT_TLS_MODE = False
 DEFAULT_USERNAME = None
 DEFAULT_PASSWORD = None
+DEFAULT_SPOOL = "mqtt-spool"
+DEFAULT_ENCODING = "json"
+DEFAULT_SCHEMA_ID = 1
+DEFAULT_BATCH = 1
+
+# Metrics published, in the order they are packed by --encoding struct
+# Change DEFAULT_SCHEMA_ID if these change
+FIELDS = ("temperature", "pressure", "humidity", "oxidised", "reduced", "nh3", "lux", "pm1", "pm25", "pm10")
 
 
 # mqtt callbacks
@@ -57,51 +79,112 @@ def on_publish(client, userdata, mid):
     print("mid: " + str(mid))
 
 
-# Read values from BME280 and return as dict
+# Read values from BME280, gas sensor and LTR559 and return as dict
 def read_bme280(bme280):
     # Compensation factor for temperature
     comp_factor = 2.25
     values = {}
     cpu_temp = get_cpu_temperature()
     raw_temp = bme280.get_temperature()  # float
-    comp_temp = raw_temp - ((cpu_temp - raw_temp) / comp_factor)
-    values["temperature"] = int(comp_temp)
-    values["pressure"] = round(
-        int(bme280.get_pressure() * 100), -1
-    )  # round to nearest 10
-    values["humidity"] = int(bme280.get_humidity())
+    values["temperature"] = raw_temp - ((cpu_temp - raw_temp) / comp_factor)
+    values["pressure"] = bme280.get_pressure() * 100
+    values["humidity"] = bme280.get_humidity()
     data = gas.read_all()
-    values["oxidised"] = int(data.oxidising / 1000)
-    values["reduced"] = int(data.reducing / 1000)
-    values["nh3"] = int(data.nh3 / 1000)
-    values["lux"] = int(ltr559.get_lux())
+    values["oxidised"] = data.oxidising / 1000
+    values["reduced"] = data.reducing / 1000
+    values["nh3"] = data.nh3 / 1000
+    values["lux"] = ltr559.get_lux()
     return values
 
 
-# Read values PMS5003 and return as dict
-def read_pms5003(pms5003):
-    values = {}
-    try:
-        pm_values = pms5003.read()  # int
-        values["pm1"] = pm_values.pm_ug_per_m3(1)
-        values["pm25"] = pm_values.pm_ug_per_m3(2.5)
-        values["pm10"] = pm_values.pm_ug_per_m3(10)
-    except ReadTimeoutError:
-        pms5003.reset()
-        pm_values = pms5003.read()
-        values["pm1"] = pm_values.pm_ug_per_m3(1)
-        values["pm25"] = pm_values.pm_ug_per_m3(2.5)
-        values["pm10"] = pm_values.pm_ug_per_m3(10)
-    return values
+# Read values from the latest PMS5003 frame and return as dict
+# Frames are read in the background, so this never waits for the sensor
+def read_pms5003(reader, max_age):
+    frame = reader.latest(max_age)
+    if frame is None:
+        return {}
+    return {
+        "pm1": frame.data.pm_ug_per_m3(1),
+        "pm25": frame.data.pm_ug_per_m3(2.5),
+        "pm10": frame.data.pm_ug_per_m3(10)
+    }
+
+
+# Publish the readings kept in the spool, oldest first and batch_size readings per message
+# Readings stay in the spool until the broker has them, so none are lost while it is unreachable
+# publish() never waits for the broker, confirmed batches are acknowledged on the next call
+# Only the message with the newest reading is retained, so a backlog never replaces it
+# A partial batch is sent once its oldest reading is max_delay seconds old, or by flush()
+class SpoolPublisher:
+    def __init__(self, client, topic, spool, encoder, batch_size=1, per_metric=False, max_inflight=100, timeout=30.0, max_delay=None):
+        self.client = client
+        self.topic = topic
+        self.spool = spool
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.per_metric = per_metric
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+        self.max_delay = max_delay
+        # (offset after the batch, messages, time published) for each unconfirmed batch
+        self._inflight = collections.deque()
+        self._published = spool.acked
+
+    def _retry(self):
+        # Publish every unconfirmed batch again, the broker may receive some twice
+        self._inflight.clear()
+        self._published = self.spool.acked
+
+    def publish(self, partial=False):
+        while self._inflight:
+            offset, messages, published = self._inflight[0]
+            if not all(message.is_published() for message in messages):
+                if time.monotonic() - published > self.timeout:
+                    self._retry()
+                break
+            self._inflight.popleft()
+            self.spool.ack(offset)
+
+        if not self.client.is_connected() or len(self._inflight) >= self.max_inflight:
+            return
+        records = self.spool.read(max_records=self.max_inflight * self.batch_size)
+        records = [record for record in records if record.offset > self._published]
+        for start in range(0, len(records), self.batch_size):
+            if len(self._inflight) >= self.max_inflight:
+                return
+            batch = records[start:start + self.batch_size]
+            samples = []
+            for record in batch:
+                values = json.loads(record.data)
+                samples.append((values.pop("timestamp", time.time()), values))
+            if len(batch) < self.batch_size and not partial:
+                if self.max_delay is None or time.time() - samples[0][0] < self.max_delay:
+                    return
+            if self.per_metric:
+                payloads = [(f"{self.topic}/{metric}", payload) for metric, payload in self.encoder.encode_metrics(samples).items()]
+            else:
+                payloads = [(self.topic, self.encoder.encode(samples))]
+            retain = batch[-1].offset == self.spool.head
+            messages = [self.client.publish(name, payload, qos=1, retain=retain) for name, payload in payloads]
+            if any(message.rc != mqtt.MQTT_ERR_SUCCESS for message in messages):
+                self._retry()
+                return
+            self._inflight.append((batch[-1].offset, messages, time.monotonic()))
+            self._published = batch[-1].offset
+
+    def flush(self, timeout=5.0):
+        # Publish every spooled reading, including a partial batch, and wait for the broker to confirm them
+        deadline = time.monotonic() + timeout
+        self.publish(partial=True)
+        while self._inflight and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.publish(partial=True)
 
 
 # Get CPU temperature to use for compensation
 def get_cpu_temperature():
-    process = Popen(
-        ["vcgencmd", "measure_temp"], stdout=PIPE, universal_newlines=True
-    )
-    output, _error = process.communicate()
-    return float(output[output.index("=") + 1:output.rindex("'")])
+    with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
+        return int(f.read()) / 1000.0
 
 
 # Get Raspberry Pi serial number to use as ID
@@ -168,8 +251,14 @@ def main():
     parser.add_argument(
         "--interval",
         default=DEFAULT_READ_INTERVAL,
+        type=float,
+        help="the publish interval in seconds",
+    )
+    parser.add_argument(
+        "--oversample",
+        default=DEFAULT_OVERSAMPLE,
         type=int,
-        help="the read interval in seconds",
+        help="the number of readings averaged into each published value",
     )
     parser.add_argument(
         "--tls",
@@ -189,7 +278,42 @@ def main():
         type=str,
         help="mqtt password"
     )
+    parser.add_argument(
+        "--spool",
+        default=DEFAULT_SPOOL,
+        type=str,
+        help="directory to keep unsent readings in"
+    )
+    parser.add_argument(
+        "--encoding",
+        default=DEFAULT_ENCODING,
+        choices=ENCODINGS,
+        help="payload encoding, struct sends each reading as packed float32 values"
+    )
+    parser.add_argument(
+        "--schema-id",
+        default=DEFAULT_SCHEMA_ID,
+        type=int,
+        help="schema id sent in struct payloads to identify the fields"
+    )
+    parser.add_argument(
+        "--batch",
+        default=DEFAULT_BATCH,
+        type=int,
+        help="the number of readings sent in each message"
+    )
+    parser.add_argument(
+        "--per-metric",
+        action="store_true",
+        help="publish each metric to its own topic under --topic"
+    )
     args = parser.parse_args()
+    if args.interval <= 0:
+        parser.error("--interval must be greater than 0")
+    if args.oversample < 1:
+        parser.error("--oversample must be at least 1")
+    if args.encoding == "struct" and args.batch > MAX_SAMPLES:
+        parser.error(f"--batch can be at most {MAX_SAMPLES} with --encoding struct")
 
     # Raspberry Pi ID
     device_serial_number = get_serial_number()
@@ -202,6 +326,9 @@ def main():
     client_id: {device_id}
     port: {args.port}
     topic: {args.topic}
+    encoding: {args.encoding}
+    batch: {args.batch}
+    per-metric: {args.per_metric}
     tls: {args.tls}
     username: {args.username}
     password: {args.password}
@@ -253,32 +380,64 @@ def main():
     except SerialTimeoutError:
         print("No PMS5003 sensor connected")
 
+    if HAS_PMS:
+        pms_reader = PMS5003Reader(pms5003)
+        pms_reader.start()
+
     # Display Raspberry Pi serial and Wi-Fi status
     print(f"RPi serial: {device_serial_number}")
     wifi_status = "connected" if check_wifi() else "disconnected"
     print(f"Wi-Fi: {wifi_status}\n")
     print(f"MQTT broker IP: {args.broker}")
 
-    # Set an initial update time
-    update_time = time.time()
+    # Readings are taken at fixed deadlines, sleeping in between
+    sample_period = args.interval / args.oversample
+    samples = collections.defaultdict(list)
+    taken = 0
+    next_sample = time.monotonic()
 
     # Main loop to read data, display, and send over mqtt
+    spool = Spool(args.spool)
+    encoder = PayloadEncoder(FIELDS, encoding=args.encoding, schema_id=args.schema_id, tags={"serial": device_serial_number})
+    batch_size = max(1, args.batch)
+    # Send a partial batch once it has waited as long as a full one takes to fill
+    publisher = SpoolPublisher(mqtt_client, args.topic, spool, encoder, batch_size, args.per_metric, max_delay=args.interval * batch_size)
+
     mqtt_client.loop_start()
-    while True:
-        try:
-            values = read_bme280(bme280)
-            if HAS_PMS:
-                pms_values = read_pms5003(pms5003)
-                values.update(pms_values)
-            time_since_update = time.time() - update_time
-            if time_since_update >= args.interval:
-                update_time = time.time()
-                values["serial"] = device_serial_number
-                print(values)
-                mqtt_client.publish(args.topic, json.dumps(values), retain=True)
-                display_status(disp, args.broker)
-        except Exception as e:
-            print(e)
+    try:
+        while True:
+            try:
+                readings = read_bme280(bme280)
+                if HAS_PMS:
+                    # The PMS5003 sends a frame about every second
+                    readings.update(read_pms5003(pms_reader, max_age=max(sample_period, 2.0)))
+                for metric, value in readings.items():
+                    samples[metric].append(value)
+                taken += 1
+                if taken >= args.oversample:
+                    values = average_values(samples)
+                    samples.clear()
+                    taken = 0
+                    print(values)
+                    values["timestamp"] = time.time()
+                    spool.put(json.dumps(values).encode("utf-8"))
+                    with metrics.timer("mqtt.publish"):
+                        publisher.publish()
+                    with metrics.timer("display.render"):
+                        display_status(disp, args.broker)
+            except Exception as e:
+                print(e)
+
+            next_sample += sample_period
+            now = time.monotonic()
+            if next_sample < now:
+                # Running late, skip the missed deadlines rather than reading back to back
+                next_sample += math.ceil((now - next_sample) / sample_period) * sample_period
+            time.sleep(next_sample - now)
+    except KeyboardInterrupt:
+        # Send the readings left in a partial batch before exiting
+        publisher.flush()
+        mqtt_client.loop_stop()
 
 
 if __name__ == "__main__":
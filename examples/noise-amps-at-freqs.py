@@ -1,11 +1,14 @@
+import argparse
+
 import st7735
 from PIL import Image, ImageDraw
 
-from enviroplus.noise import Noise
+from enviroplus.noise import Calibration, Noise
 
 print("""noise-amps-at-freqs.py - Measure amplitude from specific frequency bins
 
-This example retrieves the median amplitude from 3 user-specified frequency ranges and plots them in Blue, Green and Red on the Enviro+ display.
+This example retrieves the level, in dB SPL, of 3 user-specified frequency ranges and plots them in Blue, Green and Red on the Enviro+ display.
+Pass --calibration with your microphone's calibration file for accurate levels.
 
 As you play a continuous rising tone on your phone, you should notice peaks that correspond to the frequency entering each range.
 
@@ -13,7 +16,20 @@ Press Ctrl+C to exit!
 
 """)
 
-noise = Noise()
+parser = argparse.ArgumentParser(description="Plot the level of three frequency ranges on the LCD")
+parser.add_argument("--calibration", default=None, help="Microphone calibration JSON file, defaults to a nominal -26dBFS sensitivity")
+parser.add_argument("--quiet", default=20.0, type=float, help="Level, in dB SPL, drawn as silence")
+parser.add_argument("--loud", default=80.0, type=float, help="Level, in dB SPL, drawn at full scale")
+args = parser.parse_args()
+
+noise = Noise(calibration=args.calibration or Calibration())
+
+
+# Scale a level in dB SPL from quiet to loud into 0 to size
+def scale(level, size):
+    level = min(max(level, args.quiet), args.loud)
+    return (level - args.quiet) / (args.loud - args.quiet) * size
+
 
 disp = st7735.ST7735(
     port=0,
@@ -36,7 +52,7 @@ while True:
         (500, 600),
         (1000, 1200)
     ])
-    amps = [n * 32 for n in amps]
+    amps = [scale(level, disp.height) for level in amps]
     img2 = img.copy()
     draw.rectangle((0, 0, disp.width, disp.height), (0, 0, 0))
     img.paste(img2, (1, 0))
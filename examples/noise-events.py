@@ -0,0 +1,38 @@
+import time
+
+from enviroplus.noise import EventDetector, Noise
+
+print("""noise-events.py - Detect loud sounds as they happen.
+
+This example watches a low and a high frequency band on a streaming capture and prints
+the time of each onset, and the peak level and time of each event once it has passed.
+
+Press Ctrl+C to exit!
+
+""")
+
+BANDS = [
+    # start Hz, end Hz, threshold, hysteresis
+    (100, 1000, 2.0, 0.5),
+    (1000, 8000, 1.0, 0.25)
+]
+
+
+def on_onset(band, level, timestamp):
+    print(f"Band {band} onset at {timestamp:.3f}: {level:.2f}")
+
+
+def on_peak(band, level, timestamp):
+    print(f"Band {band} peak at {timestamp:.3f}: {level:.2f}")
+
+
+noise = Noise()
+detector = EventDetector(BANDS, sample_rate=noise.sample_rate, blocksize=1024, on_onset=on_onset, on_peak=on_peak)
+stream = noise.open_stream(detector.process, blocksize=detector.blocksize)
+
+try:
+    while True:
+        time.sleep(1.0)
+except KeyboardInterrupt:
+    stream.stop()
+    stream.close()
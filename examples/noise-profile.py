@@ -1,17 +1,34 @@
+import argparse
+
 import st7735
 from PIL import Image, ImageDraw
 
-from enviroplus.noise import Noise
+from enviroplus.noise import Calibration, Noise
 
 print("""noise-profile.py - Get a simple noise profile.
 
 This example grabs a basic 3-bin noise profile of low, medium and high frequency noise, plotting the noise characteristics as coloured bars.
 
+Levels are measured in dB SPL, pass --calibration with your microphone's calibration file for accurate levels.
+
 Press Ctrl+C to exit!
 
 """)
 
-noise = Noise()
+parser = argparse.ArgumentParser(description="Plot a noise profile on the LCD")
+parser.add_argument("--calibration", default=None, help="Microphone calibration JSON file, defaults to a nominal -26dBFS sensitivity")
+parser.add_argument("--quiet", default=30.0, type=float, help="Level, in dB SPL, drawn as silence")
+parser.add_argument("--loud", default=90.0, type=float, help="Level, in dB SPL, drawn at full scale")
+args = parser.parse_args()
+
+noise = Noise(calibration=args.calibration or Calibration())
+
+
+# Scale a level in dB SPL from quiet to loud into 0 to size
+def scale(level, size):
+    level = min(max(level, args.quiet), args.loud)
+    return (level - args.quiet) / (args.loud - args.quiet) * size
+
 
 disp = st7735.ST7735(
     port=0,
@@ -30,10 +47,10 @@ draw = ImageDraw.Draw(img)
 
 while True:
     low, mid, high, amp = noise.get_noise_profile()
-    low *= 128
-    mid *= 128
-    high *= 128
-    amp *= 64
+    low = scale(low, 255)
+    mid = scale(mid, 255)
+    high = scale(high, 255)
+    amp = scale(amp, disp.height)
 
     img2 = img.copy()
     draw.rectangle((0, 0, disp.width, disp.height), (0, 0, 0))
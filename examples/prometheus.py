@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+
+from bme280 import BME280
+from ltr559 import LTR559
+from pms5003 import PMS5003
+
+from enviroplus import gas, hub, metrics
+from enviroplus.bus import BusManager
+from enviroplus.exporter import PrometheusExporter
+from enviroplus.latest import LatestValues
+from enviroplus.noise import Noise
+from enviroplus.rollup import Rollup
+
+logging.basicConfig(
+    format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S")
+
+PORT = 8000
+
+logging.info(f"""prometheus.py - Serve every sensor reading to Prometheus.
+
+Sensors are read in the background at their own rates, scrapes of
+http://<your Pi>:{PORT}/metrics are answered from the latest readings
+and never touch the hardware, however often or from however many
+servers they come.
+
+Press Ctrl+C to exit!
+
+""")
+
+metrics.enable()
+
+bus = BusManager(1)
+gas.setup(i2c_dev=bus.device("ads1015"))
+
+latest = LatestValues()
+rollup = Rollup()
+
+sensors = hub.Hub()
+sensors.add(hub.bme280_source(BME280(i2c_dev=bus.device("bme280")), period=1.0))
+sensors.add(hub.ltr559_source(LTR559(i2c_dev=bus.device("ltr559")), period=1.0))
+sensors.add(hub.gas_source(period=1.0))
+sensors.add(hub.pms5003_source(PMS5003(), period=1.0))
+sensors.add(hub.noise_source(Noise(), period=5.0))
+sensors.subscribe(latest.add_sample)
+sensors.subscribe(rollup.add_sample)
+
+exporter = PrometheusExporter(latest, rollup, windows=(60, 300))
+exporter.start(port=PORT)
+
+with sensors:
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+
+exporter.stop()
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import logging
-import time
 from subprocess import check_output
 
 import requests
@@ -12,6 +11,9 @@ from PIL import Image, ImageDraw, ImageFont
 from pms5003 import PMS5003, ChecksumMismatchError, ReadTimeoutError
 from smbus2 import SMBus
 
+from enviroplus.payload import sensorcommunity_payloads
+from enviroplus.rollup import Rollup
+
 logging.basicConfig(
     format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
     level=logging.INFO,
@@ -59,19 +61,29 @@ def read_values():
     cpu_temp = get_cpu_temperature()
     raw_temp = bme280.get_temperature()
     comp_temp = raw_temp - ((cpu_temp - raw_temp) / comp_factor)
-    values["temperature"] = f"{comp_temp:.2f}"
-    values["pressure"] = f"{bme280.get_pressure() * 100:.2f}"
-    values["humidity"] = f"{bme280.get_humidity():.2f}"
+    values["temperature"] = comp_temp
+    values["pressure"] = bme280.get_pressure() * 100
+    values["humidity"] = bme280.get_humidity()
     try:
         pm_values = pms5003.read()
-        values["P2"] = str(pm_values.pm_ug_per_m3(2.5))
-        values["P1"] = str(pm_values.pm_ug_per_m3(10))
+        values["P2"] = pm_values.pm_ug_per_m3(2.5)
+        values["P1"] = pm_values.pm_ug_per_m3(10)
     except(ReadTimeoutError, ChecksumMismatchError):
         logging.info("Failed to read PMS5003. Resetting and retrying.")
         pms5003.reset()
         pm_values = pms5003.read()
-        values["P2"] = str(pm_values.pm_ug_per_m3(2.5))
-        values["P1"] = str(pm_values.pm_ug_per_m3(10))
+        values["P2"] = pm_values.pm_ug_per_m3(2.5)
+        values["P1"] = pm_values.pm_ug_per_m3(10)
+    return values
+
+
+# Return the average of each value over an upload period, formatted for Sensor.Community
+def average_values(start):
+    values = {}
+    for metric in ("temperature", "pressure", "humidity", "P2", "P1"):
+        bucket = rollup.latest(metric, UPLOAD_INTERVAL)
+        if bucket is not None and bucket.start == start:
+            values[metric] = f"{bucket.mean:.2f}"
     return values
 
 
@@ -119,60 +131,29 @@ def display_status():
 
 
 def send_to_sensorcommunity(values, id):
-    pm_values = dict(i for i in values.items() if i[0].startswith("P"))
-    temp_values = dict(i for i in values.items() if not i[0].startswith("P"))
-
-    pm_values_json = [{"value_type": key, "value": val} for key, val in pm_values.items()]
-    temp_values_json = [{"value_type": key, "value": val} for key, val in temp_values.items()]
-
-    resp_pm = None
-    resp_bmp = None
-
-    try:
-        resp_pm = requests.post(
-            "https://api.sensor.community/v1/push-sensor-data/",
-            json={
-                "software_version": "enviro-plus 1.0.0",
-                "sensordatavalues": pm_values_json
-            },
-            headers={
-                "X-PIN": "1",
-                "X-Sensor": id,
-                "Content-Type": "application/json",
-                "cache-control": "no-cache"
-            },
-            timeout=5
-        )
-    except requests.exceptions.ConnectionError as e:
-        logging.warning(f"Sensor.Community PM Connection Error: {e}")
-    except requests.exceptions.Timeout as e:
-        logging.warning(f"Sensor.Community PM Timeout Error: {e}")
-    except requests.exceptions.RequestException as e:
-        logging.warning(f"Sensor.Community PM Request Error: {e}")
-
-    try:
-        resp_bmp = requests.post(
-            "https://api.sensor.community/v1/push-sensor-data/",
-            json={
-                "software_version": "enviro-plus 1.0.0",
-                "sensordatavalues": temp_values_json
-            },
-            headers={
-                "X-PIN": "11",
-                "X-Sensor": id,
-                "Content-Type": "application/json",
-                "cache-control": "no-cache"
-            },
-            timeout=5
-        )
-    except requests.exceptions.ConnectionError as e:
-        logging.warning(f"Sensor.Community Climate Connection Error: {e}")
-    except requests.exceptions.Timeout as e:
-        logging.warning(f"Sensor.Community Climate Timeout Error: {e}")
-    except requests.exceptions.RequestException as e:
-        logging.warning(f"Sensor.Community Climate Request Error: {e}")
-
-    if resp_pm is not None and resp_bmp is not None:
+    responses = []
+    for (pin, body), name in zip(sensorcommunity_payloads(values), ("PM", "Climate")):
+        try:
+            responses.append(requests.post(
+                "https://api.sensor.community/v1/push-sensor-data/",
+                json=body,
+                headers={
+                    "X-PIN": pin,
+                    "X-Sensor": id,
+                    "Content-Type": "application/json",
+                    "cache-control": "no-cache"
+                },
+                timeout=5
+            ))
+        except requests.exceptions.ConnectionError as e:
+            logging.warning(f"Sensor.Community {name} Connection Error: {e}")
+        except requests.exceptions.Timeout as e:
+            logging.warning(f"Sensor.Community {name} Timeout Error: {e}")
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Sensor.Community {name} Request Error: {e}")
+
+    if len(responses) == 2:
+        resp_pm, resp_bmp = responses
         if resp_pm.ok and resp_bmp.ok:
             return True
         else:
@@ -185,6 +166,10 @@ def send_to_sensorcommunity(values, id):
 # Compensation factor for temperature
 comp_factor = 2.25
 
+# Readings are averaged over each upload period
+UPLOAD_INTERVAL = 145
+rollup = Rollup(resolutions=((UPLOAD_INTERVAL, 1),))
+
 # Raspberry Pi ID to send to Sensor.Community
 id = "raspi-" + get_serial_number()
 
@@ -201,17 +186,18 @@ logging.info(f"Raspberry Pi serial: {get_serial_number()}")
 wifi_status = "connected" if check_wifi() else "disconnected"
 logging.info(f"Wi-Fi: {wifi_status}\n")
 
-time_since_update = 0
-update_time = time.time()
+last_upload = None
 
 # Main loop to read data, display, and send to Sensor.Community
 while True:
     try:
-        values = read_values()
-        time_since_update = time.time() - update_time
-        if time_since_update > 145:
+        for metric, value in read_values().items():
+            rollup.add(metric, value)
+        latest = rollup.latest("temperature", UPLOAD_INTERVAL)
+        if latest is not None and latest.start != last_upload:
+            last_upload = latest.start
+            values = average_values(latest.start)
             logging.info(values)
-            update_time = time.time()
             if send_to_sensorcommunity(values, id):
                 logging.info("Sensor.Community Response: OK")
             else:
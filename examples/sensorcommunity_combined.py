@@ -1,4 +1,3 @@
-import colorsys
 import logging
 import time
 from subprocess import PIPE, Popen, check_output
@@ -11,7 +10,9 @@ from PIL import Image, ImageDraw, ImageFont
 from pms5003 import PMS5003, ReadTimeoutError
 from smbus2 import SMBus
 
-from enviroplus import gas
+from enviroplus import display, gas
+from enviroplus.payload import sensorcommunity_payloads
+from enviroplus.ringbuffer import RingBuffer
 
 try:
     # Transitional fix for breaking change in LTR559
@@ -184,8 +185,8 @@ top_pos = 25
 
 def save_data(idx, data):
     variable = variables[idx]
-    # Maintain length of list
-    values_lcd[variable] = values_lcd[variable][1:] + [data]
+    # Add to the history, discarding the oldest value
+    values_lcd[variable].append(data)
     unit = units[idx]
     message = f"{variable[:4]}: {data:.1f} {unit}"
     logging.info(message)
@@ -193,93 +194,34 @@ def save_data(idx, data):
 
 # Displays data and text on the 0.96" LCD
 def display_text(variable, data, unit):
-    # Maintain length of list
-    values_lcd[variable] = values_lcd[variable][1:] + [data]
-    # Scale the values for the variable between 0 and 1
-    vmin = min(values_lcd[variable])
-    vmax = max(values_lcd[variable])
-    colours = [(v - vmin + 1) / (vmax - vmin + 1)
-               for v in values_lcd[variable]]
-    # Format the variable name and value
-    message = f"{variable[:4]}: {data:.1f} {unit}"
+    message = display.draw_history(draw, font, values_lcd[variable], variable, data, unit, WIDTH, HEIGHT, top_pos)
     logging.info(message)
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (255, 255, 255))
-    for i in range(len(colours)):
-        # Convert the values to colours from red to blue
-        colour = (1.0 - colours[i]) * 0.6
-        r, g, b = [int(x * 255.0)
-                   for x in colorsys.hsv_to_rgb(colour, 1.0, 1.0)]
-        # Draw a 1-pixel wide rectangle of colour
-        draw.rectangle((i, top_pos, i + 1, HEIGHT), (r, g, b))
-        # Draw a line graph in black
-        line_y = HEIGHT - \
-            (top_pos + (colours[i] * (HEIGHT - top_pos))) + top_pos
-        draw.rectangle((i, line_y, i + 1, line_y + 1), (0, 0, 0))
-    # Write the text at the top in black
-    draw.text((0, 0), message, font=font, fill=(0, 0, 0))
     st7735.display(img)
 
 # Displays all the text on the 0.96" LCD
 
 
 def display_everything():
-    draw.rectangle((0, 0, WIDTH, HEIGHT), (0, 0, 0))
-    column_count = 2
-    row_count = (len(variables) / column_count)
-    for i in range(len(variables)):
-        variable = variables[i]
-        data_value = values_lcd[variable][-1]
-        unit = units[i]
-        x = x_offset + ((WIDTH // column_count) * (i // row_count))
-        y = y_offset + ((HEIGHT / row_count) * (i % row_count))
-        message = f"{variable[:4]}: {data_value:.1f} {unit}"
-        lim = limits[i]
-        rgb = palette[0]
-        for j in range(len(lim)):
-            if data_value > lim[j]:
-                rgb = palette[j + 1]
-        draw.text((x, y), message, font=smallfont, fill=rgb)
+    display.draw_everything(draw, smallfont, values_lcd, variables, units, limits, palette, WIDTH, HEIGHT, x_offset, y_offset)
     st7735.display(img)
 
 
 def send_to_sensorcommunity(values, id):
-    pm_values = dict(i for i in values.items() if i[0].startswith("P"))
-    temp_values = dict(i for i in values.items() if not i[0].startswith("P"))
-
-    pm_values_json = [{"value_type": key, "value": val}
-                      for key, val in pm_values.items()]
-    temp_values_json = [{"value_type": key, "value": val}
-                        for key, val in temp_values.items()]
-
-    resp_1 = requests.post(
-        "https://api.sensor.community/v1/push-sensor-data/",
-        json={
-            "software_version": "enviro-plus 1.0.0",
-            "sensordatavalues": pm_values_json
-        },
-        headers={
-            "X-PIN": "1",
-            "X-Sensor": id,
-            "Content-Type": "application/json",
-            "cache-control": "no-cache"
-        }
-    )
-
-    resp_2 = requests.post(
-        "https://api.sensor.community/v1/push-sensor-data/",
-        json={
-            "software_version": "enviro-plus 1.0.0",
-            "sensordatavalues": temp_values_json
-        },
-        headers={
-            "X-PIN": "11",
-            "X-Sensor": id,
-            "Content-Type": "application/json",
-            "cache-control": "no-cache"
-        }
-    )
-
-    if resp_1.ok and resp_2.ok:
+    responses = [
+        requests.post(
+            "https://api.sensor.community/v1/push-sensor-data/",
+            json=body,
+            headers={
+                "X-PIN": pin,
+                "X-Sensor": id,
+                "Content-Type": "application/json",
+                "cache-control": "no-cache"
+            }
+        )
+        for pin, body in sensorcommunity_payloads(values)
+    ]
+
+    if all(response.ok for response in responses):
         return True
     else:
         return False
@@ -300,13 +242,13 @@ light = 1
 
 
 for v in variables:
-    values_lcd[v] = [1] * WIDTH
+    values_lcd[v] = RingBuffer(WIDTH, fill=1)
 
 
 # Text settings
 font_size = 16
 font = ImageFont.truetype(UserFont, font_size)
-cpu_temps = [get_cpu_temperature()] * 5
+cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
 
 # Display Raspberry Pi serial and Wi-Fi status
 print(f"Raspberry Pi serial: {get_serial_number()}")
@@ -315,7 +257,6 @@ print(f"Wi-Fi: {wifi_status}\n")
 
 time_since_update = 0
 update_time = time.time()
-cpu_temps_len = float(len(cpu_temps))
 
 # Main loop to read data, display, and send to Sensor.Community
 while True:
@@ -326,8 +267,8 @@ while True:
         # Calculate these things once, not twice
         cpu_temp = get_cpu_temperature()
         # Smooth out with some averaging to decrease jitter
-        cpu_temps = cpu_temps[1:] + [cpu_temp]
-        avg_cpu_temp = sum(cpu_temps) / cpu_temps_len
+        cpu_temps.append(cpu_temp)
+        avg_cpu_temp = cpu_temps.mean()
         raw_temp = bme280.get_temperature()
         comp_temp = raw_temp - ((avg_cpu_temp - raw_temp) / comp_factor)
 
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+import time
+
+from enviroplus import hub
+from enviroplus.session import Player, Recorder
+
+logging.basicConfig(
+    format="%(asctime)s.%(msecs)03d %(levelname)-8s %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S")
+
+logging.info("""session.py - Record every sensor read to a session file, or replay one.
+
+Record on an Enviro+:    ./session.py record session.bin
+Replay on any computer:  ./session.py replay session.bin [speed]
+
+A replay runs the same readings through the same code, eg: at 100x real time
+to benchmark and profile processing.
+
+Press Ctrl+C to exit!
+
+""")
+
+if len(sys.argv) < 3 or sys.argv[1] not in ("record", "replay"):
+    sys.exit(f"Usage: {sys.argv[0]} record|replay <session file> [speed]")
+
+mode, path = sys.argv[1:3]
+speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+if mode == "record":
+    from bme280 import BME280
+    from ltr559 import LTR559
+    from pms5003 import PMS5003
+
+    from enviroplus.noise import Noise
+
+    session = Recorder(path)
+    bme280 = session.bme280(BME280())
+    ltr559 = session.ltr559(LTR559())
+    gas = session.gas()
+    pms5003 = session.pms5003(PMS5003())
+    noise = session.noise(Noise())
+    speed = 1.0
+else:
+    session = Player(path, speed=speed)
+    bme280 = session.bme280()
+    ltr559 = session.ltr559()
+    gas = session.gas()
+    pms5003 = session.pms5003()
+    noise = session.noise()
+
+samples = 0
+finished = set()
+
+
+def on_sample(sample):
+    global samples
+    samples += 1
+    if mode == "record":
+        logging.info(f"{sample.metric}: {sample.value:.2f}")
+
+
+def on_error(source, error):
+    if isinstance(error, EOFError):
+        finished.add(source.name)
+    else:
+        logging.warning(f"Failed to read {source.name}: {error}")
+
+
+# Read periods are scaled so a replay reads at the recorded rate, sped up
+sensors = hub.Hub(on_error=on_error)
+sensors.add(hub.bme280_source(bme280, period=1.0 / speed))
+sensors.add(hub.ltr559_source(ltr559, period=0.5 / speed))
+sensors.add(hub.gas_source(period=1.0 / speed, gas=gas))
+sensors.add(hub.pms5003_source(pms5003, period=1.0 / speed))
+sensors.add(hub.noise_source(noise, period=5.0 / speed))
+sensors.subscribe(on_sample)
+
+start = time.monotonic()
+with sensors:
+    try:
+        # A replay ends once every source has run out of readings
+        while len(finished) < len(sensors.sources):
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+
+if mode == "record":
+    session.close()
+
+elapsed = time.monotonic() - start
+logging.info(f"{samples} samples in {elapsed:.1f} seconds, {samples / elapsed:.0f} samples/second")
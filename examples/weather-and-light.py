@@ -17,6 +17,8 @@ from ltr559 import LTR559
 from PIL import Image, ImageDraw, ImageFilter, ImageFont
 from smbus2 import SMBus
 
+from enviroplus.ringbuffer import RingBuffer
+
 
 def calculate_y_pos(x, centre):
     """Calculates the y-coordinate on a parabolic curve, given x."""
@@ -204,26 +206,25 @@ def correct_humidity(humidity, temperature, corr_temperature):
 
 
 def analyse_pressure(pressure, t):
-    global time_vals, pressure_vals, trend
-    if len(pressure_vals) > num_vals:
-        pressure_vals = pressure_vals[1:] + [pressure]
-        time_vals = time_vals[1:] + [t]
-
+    global pressure_count, trend
+    pressure_vals.append(pressure)
+    time_vals.append(t)
+    if pressure_count > num_vals:
         # Calculate line of best fit
-        line = numpy.polyfit(time_vals, pressure_vals, 1, full=True)
+        line = numpy.polyfit(time_vals.values, pressure_vals.values, 1, full=True)
 
         # Calculate slope, variance, and confidence
         slope = line[0][0]
         intercept = line[0][1]
-        variance = numpy.var(pressure_vals)
-        residuals = numpy.var([(slope * x + intercept - y) for x, y in zip(time_vals, pressure_vals)])
+        variance = numpy.var(pressure_vals.values)
+        residuals = numpy.var(slope * time_vals.values + intercept - pressure_vals.values)
         r_squared = 1 - residuals / variance
 
         # Calculate change in pressure per hour
         change_per_hour = slope * 60 * 60
         # variance_per_hour = variance * 60 * 60
 
-        mean_pressure = numpy.mean(pressure_vals)
+        mean_pressure = pressure_vals.mean()
 
         # Calculate trend
         if r_squared > 0.5:
@@ -238,9 +239,9 @@ def analyse_pressure(pressure, t):
                 if abs(change_per_hour) > 3:
                     trend *= 2
     else:
-        pressure_vals.append(pressure)
-        time_vals.append(t)
-        mean_pressure = numpy.mean(pressure_vals)
+        # Still filling the history, average the values read so far
+        pressure_count += 1
+        mean_pressure = pressure_vals[-pressure_count:].mean()
         change_per_hour = 0
         trend = "-"
 
@@ -331,15 +332,16 @@ min_temp = None
 max_temp = None
 
 factor = 2.25
-cpu_temps = [get_cpu_temperature()] * 5
+cpu_temps = RingBuffer(5, fill=get_cpu_temperature())
 
 # Set up light sensor
 ltr559 = LTR559()
 
 # Pressure variables
-pressure_vals = []
-time_vals = []
 num_vals = 1000
+pressure_vals = RingBuffer(num_vals + 1)
+time_vals = RingBuffer(num_vals + 1)
+pressure_count = 0
 interval = 1
 trend = "-"
 
@@ -363,8 +365,8 @@ while True:
 
     # Corrected temperature
     cpu_temp = get_cpu_temperature()
-    cpu_temps = cpu_temps[1:] + [cpu_temp]
-    avg_cpu_temp = sum(cpu_temps) / float(len(cpu_temps))
+    cpu_temps.append(cpu_temp)
+    avg_cpu_temp = cpu_temps.mean()
     corr_temperature = temperature - ((avg_cpu_temp - temperature) / factor)
 
     if time_elapsed > 30:
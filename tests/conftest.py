@@ -24,7 +24,10 @@ class SMBusFakeDeviceNoTimeout(MockSMBus):
 @pytest.fixture(scope="function", autouse=True)
 def cleanup():
     yield None
-    modules = "enviroplus", "enviroplus.noise", "enviroplus.gas", "ads1015", "i2cdevice"
+    modules = (
+        "enviroplus", "enviroplus.metrics", "enviroplus.noise", "enviroplus.gas", "enviroplus.hub", "enviroplus.aio",
+        "enviroplus.particulates", "enviroplus.bus", "enviroplus.exporter", "enviroplus.influx", "ads1015", "pms5003", "i2cdevice"
+    )
     for module in modules:
         try:
             del sys.modules[module]
@@ -112,6 +115,19 @@ def sounddevice():
 def numpy():
     """Mock numpy module."""
     numpy = mock.MagicMock()
+    real_numpy = sys.modules.get("numpy")
     sys.modules["numpy"] = numpy
     yield numpy
-    del sys.modules["numpy"]
+    if real_numpy is None:
+        del sys.modules["numpy"]
+    else:
+        # Re-importing the real numpy is not supported, so put it back
+        sys.modules["numpy"] = real_numpy
+
+
+@pytest.fixture(scope="function", autouse=False)
+def simulator():
+    """Virtual Enviro+ hardware, see enviroplus.simulator."""
+    from enviroplus.simulator import Simulator
+    with Simulator(pms5003_interval=0.01) as simulator:
+        yield simulator
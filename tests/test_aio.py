@@ -0,0 +1,180 @@
+import asyncio
+import fcntl
+import os
+import select
+import struct
+import termios
+import threading
+import time
+
+import mock
+
+
+def _pms5003_frame(pm1, pm25, pm10):
+    data = struct.pack(">HHHHHHHHHHHHH", pm1, pm25, pm10, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    frame = b"\x42\x4d" + struct.pack(">H", 28) + data
+    return frame + struct.pack(">H", sum(frame))
+
+
+async def _collect(stream, count):
+    samples = []
+    async for sample in stream:
+        samples.append(sample)
+        if len(samples) == count:
+            break
+    await stream.aclose()
+    return samples
+
+
+def test_aio_poll_sources(sounddevice):
+    from enviroplus.aio import AsyncHub
+    from enviroplus.hub import Source
+
+    hub = AsyncHub()
+    source = hub.add(Source("fake", lambda: {"temperature": 20.0, "humidity": 50.0}, 0.01))
+
+    samples = asyncio.run(_collect(hub.stream(), 6))
+
+    assert [s.metric for s in samples] == ["temperature", "humidity"] * 3
+    assert source.reads >= 3
+
+
+def test_aio_poll_errors(sounddevice):
+    from enviroplus.aio import AsyncHub
+    from enviroplus.hub import Source
+
+    calls = []
+
+    def flaky():
+        calls.append(None)
+        if len(calls) == 1:
+            raise IOError("Oh no!")
+        return {"lux": 1.0}
+
+    on_error = mock.Mock()
+    hub = AsyncHub(on_error=on_error)
+    source = hub.add(Source("flaky", flaky, 0.01))
+
+    samples = asyncio.run(_collect(hub.stream(), 1))
+
+    assert samples[0].value == 1.0
+    assert source.errors == 1
+    on_error.assert_called_once()
+
+
+def test_aio_pms5003(sounddevice, gpiod, gpiodevice):
+    from enviroplus.aio import AsyncHub
+
+    timeout = 1.0
+    read_fd, write_fd = os.pipe()
+
+    def in_waiting():
+        return struct.unpack("i", fcntl.ioctl(read_fd, termios.FIONREAD, bytes(4)))[0]
+
+    def readinto(buffer):
+        # Like pyserial, wait until the buffer is full or the timeout expires
+        deadline = time.monotonic() + timeout
+        count = 0
+        while count < len(buffer):
+            ready, _, _ = select.select([read_fd], [], [], max(0, deadline - time.monotonic()))
+            if not ready:
+                break
+            count += os.readv(read_fd, [buffer[count:]])
+        return count
+
+    port = mock.Mock()
+    port.fileno.return_value = read_fd
+    type(port).in_waiting = mock.PropertyMock(side_effect=in_waiting)
+    port.readinto.side_effect = readinto
+
+    pms5003 = mock.Mock()
+
+    # Leading noise and a corrupt frame should be skipped
+    corrupt = bytearray(_pms5003_frame(9, 9, 9))
+    corrupt[-1] ^= 0xff
+    os.write(write_fd, b"\x00\x42" + bytes(corrupt) + _pms5003_frame(1, 2, 3))
+
+    hub = AsyncHub()
+    source = hub.add_pms5003(pms5003, port)
+    try:
+        start = time.monotonic()
+        samples = asyncio.run(_collect(hub.stream(), 3))
+        elapsed = time.monotonic() - start
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+    assert {s.metric: s.value for s in samples} == {"pm1": 1, "pm25": 2, "pm10": 3}
+    # Reads must not wait for the serial timeout
+    assert elapsed < timeout
+    assert source.reads == 1
+    pms5003.reset.assert_not_called()
+
+
+def test_aio_pms5003_reset(sounddevice, gpiod, gpiodevice):
+    from enviroplus.aio import AsyncHub
+
+    read_fd, write_fd = os.pipe()
+    # Sent by the sensor after each reset, a partial frame then a whole one
+    sent = [b"\x42\x4d\x00", _pms5003_frame(4, 5, 6)]
+
+    def in_waiting():
+        return struct.unpack("i", fcntl.ioctl(read_fd, termios.FIONREAD, bytes(4)))[0]
+
+    def readinto(buffer):
+        if port.readinto.call_count == 1:
+            os.read(read_fd, 1)
+            raise OSError(5, "Input/output error")
+        return os.readv(read_fd, [buffer])
+
+    port = mock.Mock()
+    port.fileno.return_value = read_fd
+    type(port).in_waiting = mock.PropertyMock(side_effect=in_waiting)
+    port.readinto.side_effect = readinto
+    pms5003 = mock.Mock()
+    pms5003.reset.side_effect = lambda: os.write(write_fd, sent.pop(0))
+    on_error = mock.Mock()
+
+    os.write(write_fd, b"\x00")
+    hub = AsyncHub(on_error=on_error)
+    source = hub.add_pms5003(pms5003, port, timeout=0.1, backoff=0.01)
+    try:
+        samples = asyncio.run(_collect(hub.stream(), 3))
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+    assert {s.metric: s.value for s in samples} == {"pm1": 4, "pm25": 5, "pm10": 6}
+    # The read error, then no frame before the timeout
+    assert source.errors == 2
+    assert isinstance(on_error.call_args_list[0][0][1], OSError)
+    assert isinstance(on_error.call_args_list[1][0][1], TimeoutError)
+    assert pms5003.reset.call_count == 2
+    assert port.reset_input_buffer.call_count == 2
+
+
+def test_aio_noise(sounddevice):
+    import numpy
+
+    from enviroplus.aio import AsyncHub
+    from enviroplus.noise import Noise
+
+    noise = Noise(sample_rate=16000, duration=0.1)
+    stream = mock.Mock()
+
+    def open_stream(callback, blocksize):
+        def feed():
+            for _ in range(2):
+                callback(numpy.zeros(blocksize), 0.0)
+        threading.Thread(target=feed).start()
+        return stream
+
+    noise.open_stream = open_stream
+
+    hub = AsyncHub()
+    hub.add_noise(noise, blocksize=1024)
+    samples = asyncio.run(_collect(hub.stream(), 4))
+
+    assert [s.metric for s in samples] == ["noise_low", "noise_mid", "noise_high", "noise_total"]
+    stream.stop.assert_called_once()
+    stream.close.assert_called_once()
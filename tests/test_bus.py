@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+from i2cdevice import MockSMBus
+
+
+class SlowSMBus(MockSMBus):
+    def __init__(self, i2c_bus):
+        MockSMBus.__init__(self, i2c_bus)
+        self.active = 0
+        self.overlapped = False
+
+    def read_i2c_block_data(self, i2c_address, register, length):
+        self.active += 1
+        if self.active > 1:
+            self.overlapped = True
+        time.sleep(0.001)
+        self.active -= 1
+        return MockSMBus.read_i2c_block_data(self, i2c_address, register, length)
+
+
+def test_bus_device_handles():
+    from enviroplus.bus import BusManager
+
+    manager = BusManager(MockSMBus(1))
+    bme280 = manager.device("bme280")
+    assert manager.device("bme280") is bme280
+
+    bme280.write_i2c_block_data(0x76, 0x10, [1, 2, 3])
+    assert bme280.read_i2c_block_data(0x76, 0x10, 3) == [1, 2, 3]
+
+    stats = manager.stats()
+    assert stats["bme280"].transactions == 2
+    assert stats["bme280"].bus_time > 0
+    assert "Transactions: 2" in str(stats["bme280"])
+
+    with pytest.raises(AttributeError):
+        bme280.not_an_smbus_method
+
+
+def test_bus_errors():
+    import mock
+
+    from enviroplus.bus import BusManager
+
+    bus = mock.Mock()
+    bus.read_byte_data.side_effect = IOError("Oh no!")
+    handle = BusManager(bus).device("broken")
+
+    with pytest.raises(IOError):
+        handle.read_byte_data(0x49, 0x00)
+
+    assert handle.stats.errors == 1
+    assert handle.stats.transactions == 1
+
+
+def test_bus_serializes_devices():
+    from enviroplus.bus import BusManager
+
+    bus = SlowSMBus(1)
+    manager = BusManager(bus)
+
+    def worker(name):
+        handle = manager.device(name)
+        for _ in range(10):
+            handle.read_i2c_block_data(0x00, 0x00, 2)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("bme280", "ltr559", "ads1015")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not bus.overlapped
+    assert sum(s.transactions for s in manager.stats().values()) == 30
+
+
+def test_bus_transaction():
+    from enviroplus.bus import BusManager
+
+    manager = BusManager(MockSMBus(1))
+    ads1015 = manager.device("ads1015")
+    other = manager.device("ltr559")
+    done = []
+
+    with ads1015.transaction():
+        thread = threading.Thread(target=lambda: done.append(other.read_i2c_block_data(0x23, 0x01, 1)))
+        thread.start()
+        ads1015.write_i2c_block_data(0x49, 0x01, [0x80])
+        time.sleep(0.01)
+        assert done == []
+        ads1015.read_i2c_block_data(0x49, 0x01, 1)
+
+    thread.join()
+    assert done == [[0x80]]
+
+
+def test_bus_close():
+    import mock
+
+    from enviroplus.bus import BusManager
+
+    bus = mock.Mock()
+    BusManager(bus).close()
+    bus.close.assert_called_once()
+
+
+def test_gas_shared_bus(gpiod, gpiodevice, smbus):
+    from enviroplus import gas
+    from enviroplus.bus import BusManager
+
+    manager = BusManager(smbus.SMBus(1))
+    gas._is_setup = False
+    gas.setup(i2c_dev=manager.device("ads1015"))
+
+    assert int(gas.read_oxidising()) == 16641
+    assert manager.stats()["ads1015"].transactions > 0
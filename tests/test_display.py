@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture()
+def canvas():
+    Image = pytest.importorskip("PIL.Image")
+    ImageDraw = pytest.importorskip("PIL.ImageDraw")
+    ImageFont = pytest.importorskip("PIL.ImageFont")
+    img = Image.new("RGB", (160, 80), color=(0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    # Without anti-aliasing, so text is drawn in exactly its colour
+    draw.fontmode = "1"
+    return img, draw, ImageFont.load_default()
+
+
+def test_draw_history(canvas):
+    from enviroplus import display
+    from enviroplus.ringbuffer import RingBuffer
+
+    img, draw, font = canvas
+    history = RingBuffer(160, fill=20.0)
+    assert display.draw_history(draw, font, history, "temperature", 25.0, "C") == "temp: 25.0 C"
+    assert history[-1] == 25.0
+    # The newest, highest, reading is drawn in red at the bottom right
+    assert img.getpixel((159, 79)) == (255, 0, 0)
+    # Older, lower, readings towards blue
+    assert img.getpixel((0, 79)) == (0, 255, 255)
+
+
+def test_draw_everything(canvas):
+    from enviroplus import display
+    from enviroplus.ringbuffer import RingBuffer
+
+    img, draw, font = canvas
+    values = {"temperature": RingBuffer(4, fill=30.0), "humidity": RingBuffer(4, fill=10.0)}
+    palette = [(0, 0, 255), (0, 255, 0), (255, 0, 0)]
+    display.draw_everything(draw, font, values, ["temperature", "humidity"], ["C", "%"], [[10, 25], [20, 60]], palette)
+
+    colours = {colour for _, colour in img.getcolors()}
+    # Temperature is above both limits, humidity below both
+    assert (255, 0, 0) in colours
+    assert (0, 0, 255) in colours
+    assert (0, 255, 0) not in colours
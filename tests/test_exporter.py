@@ -0,0 +1,111 @@
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+def _lines(body):
+    return body.decode("utf-8").splitlines()
+
+
+def test_render_latest_values():
+    from enviroplus.exporter import PrometheusExporter
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    latest.update("temperature", 21.5)
+    latest.update("pm25", 7)
+    latest.update("adc", None)
+    latest.register(["lux"], lambda: pytest.fail("A scrape must not read sensors"))
+
+    lines = _lines(PrometheusExporter(latest).render())
+    assert "# TYPE enviroplus_temperature gauge" in lines
+    assert "# HELP enviroplus_temperature Temperature in degrees Celsius" in lines
+    assert "enviroplus_temperature 21.5" in lines
+    assert "enviroplus_pm25 7.0" in lines
+    assert not any(line.startswith("enviroplus_adc") for line in lines)
+    assert lines.count("# TYPE enviroplus_age_seconds gauge") == 1
+    assert any(line.startswith("enviroplus_age_seconds{metric=\"pm25\"} ") for line in lines)
+
+
+def test_render_reuses_encoded_text():
+    from enviroplus.exporter import PrometheusExporter
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    latest.update("temperature", 21.5)
+    exporter = PrometheusExporter(latest)
+    exporter.render()
+    family = exporter._families["temperature"]
+
+    latest.update("temperature", float("nan"))
+    assert "enviroplus_temperature NaN" in _lines(exporter.render())
+    assert exporter._families["temperature"] is family
+
+
+def test_render_rollup_windows():
+    from enviroplus.exporter import PrometheusExporter
+    from enviroplus.latest import LatestValues
+    from enviroplus.rollup import Rollup
+
+    latest = LatestValues()
+    rollup = Rollup(resolutions=((60, 10), (300, 10)))
+    start = time.time() // 300 * 300 - 300
+    for offset, value in ((0, 20.0), (10, 22.0), (61, 30.0), (301, 25.0)):
+        rollup.add("temperature", value, start + offset)
+        latest.update("temperature", value, start + offset)
+    rollup.add("humidity", 45.0, start)
+    latest.update("humidity", 45.0, start)
+
+    lines = _lines(PrometheusExporter(latest, rollup, windows=(60, 300)).render())
+    assert "enviroplus_temperature 25.0" in lines
+    assert "enviroplus_temperature_min{window=\"60s\"} 30.0" in lines
+    assert "enviroplus_temperature_min{window=\"300s\"} 20.0" in lines
+    assert "enviroplus_temperature_max{window=\"300s\"} 30.0" in lines
+    assert "enviroplus_temperature_mean{window=\"300s\"} 24.0" in lines
+    # Only a metric with a completed bucket has summaries
+    assert not any(line.startswith("enviroplus_humidity_") for line in lines)
+
+
+def test_render_instrumentation():
+    from enviroplus import metrics
+    from enviroplus.exporter import PrometheusExporter
+    from enviroplus.latest import LatestValues
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        metrics.observe("gas.read_all", 0.003)
+        metrics.observe("gas.read_all", 20.0)
+        metrics.increment("pms5003.resets")
+        lines = _lines(PrometheusExporter(LatestValues()).render())
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+
+    assert "# TYPE enviroplus_latency_seconds histogram" in lines
+    assert "enviroplus_latency_seconds_bucket{name=\"gas.read_all\",le=\"0.0025\"} 0" in lines
+    assert "enviroplus_latency_seconds_bucket{name=\"gas.read_all\",le=\"0.005\"} 1" in lines
+    assert "enviroplus_latency_seconds_bucket{name=\"gas.read_all\",le=\"+Inf\"} 2" in lines
+    assert "enviroplus_latency_seconds_count{name=\"gas.read_all\"} 2" in lines
+    assert "enviroplus_events_total{name=\"pms5003.resets\"} 1" in lines
+
+
+def test_serve_metrics():
+    from enviroplus.exporter import CONTENT_TYPE, PrometheusExporter
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    latest.update("humidity", 45.0)
+    exporter = PrometheusExporter(latest)
+    exporter.start(port=0, address="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert "enviroplus_humidity 45.0" in _lines(response.read())
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/")
+    finally:
+        exporter.stop()
+    assert exporter.port is None
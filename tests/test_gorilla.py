@@ -0,0 +1,39 @@
+import numpy
+import pytest
+
+
+def test_round_trip():
+    from enviroplus.gorilla import decode, encode
+
+    timestamps = [1000, 2000, 3000, 4001, 5000, 5000, 70000, 70000 + 10 ** 12, -5]
+    values = [20.5, 20.5, 20.6, -1.0, float("nan"), float("inf"), 0.0, -0.0, 1e300]
+    data = encode(timestamps, values)
+
+    decoded_timestamps, decoded_values = decode(data, len(values))
+    assert decoded_timestamps.tolist() == timestamps
+    assert decoded_values.view("<u8").tolist() == numpy.array(values).view("<u8").tolist()
+
+
+def test_regular_series_compresses():
+    from enviroplus.gorilla import decode, encode
+
+    timestamps = numpy.arange(1024) * 60000 + 1700000000000
+    values = numpy.round(20 + numpy.sin(numpy.arange(1024) / 100), 1)
+    data = encode(timestamps, values)
+
+    # 16 bytes per sample uncompressed
+    assert len(data) < 1024 * 2
+    decoded_timestamps, decoded_values = decode(data, 1024)
+    assert (decoded_timestamps == timestamps).all()
+    assert (decoded_values == values).all()
+
+
+def test_empty_and_mismatched():
+    from enviroplus.gorilla import decode, encode
+
+    assert encode([], []) == b""
+    assert len(decode(b"", 0)[0]) == 0
+    with pytest.raises(ValueError):
+        encode([1, 2], [1.0])
+    with pytest.raises(ValueError):
+        decode(encode([1, 2], [1.0, 2.0]), 10)
@@ -0,0 +1,72 @@
+import numpy
+import pytest
+
+
+def test_history_from_rollup():
+    from enviroplus.history import History
+    from enviroplus.rollup import Rollup
+
+    rollup = Rollup(resolutions=((60, 100), (300, 100)))
+    for second in range(0, 1200, 10):
+        rollup.add("temperature", float(second), second)
+    history = History(rollup)
+
+    timestamps, values = history.query("temperature", 0, 1200, 300)
+    assert list(timestamps) == [0, 300, 600, 900]
+    assert list(values) == [145.0, 445.0, 745.0, 1045.0]
+
+    timestamps, values = history.query("temperature", 30, 240, 120, agg="max")
+    assert list(timestamps) == [0, 120]
+    assert list(values) == [110.0, 230.0]
+
+    assert list(history.query("temperature", 0, 600, 300, agg="min")[1]) == [0.0, 300.0]
+    assert list(history.query("temperature", 0, 600, 300, agg="last")[1]) == [290.0, 590.0]
+    assert list(history.query("temperature", 0, 600, 300, agg="count")[1]) == [30, 30]
+
+
+def test_history_empty_steps():
+    from enviroplus.history import History
+    from enviroplus.rollup import Rollup
+
+    rollup = Rollup(resolutions=((60, 100),))
+    rollup.add("lux", 5.0, 130)
+    history = History(rollup)
+
+    timestamps, values = history.query("lux", 0, 240, 60)
+    assert list(timestamps) == [0, 60, 120, 180]
+    assert numpy.isnan(values[[0, 1, 3]]).all()
+    assert values[2] == 5.0
+    assert list(history.query("lux", 0, 240, 60, agg="count")[1]) == [0, 0, 1, 0]
+    assert numpy.isnan(history.query("pm25", 0, 240, 60)[1]).all()
+
+
+def test_history_falls_back_to_store(tmp_path):
+    from enviroplus.history import History
+    from enviroplus.rollup import Rollup
+    from enviroplus.storage import SeriesStore
+
+    rollup = Rollup(resolutions=((60, 2),))
+    store = SeriesStore(str(tmp_path))
+    for second in range(0, 600, 30):
+        rollup.add("humidity", float(second), second)
+        store.add("humidity", float(second), second)
+    history = History(rollup, store)
+
+    # The rollup only holds the last few minutes, so older steps come from the store
+    timestamps, values = history.query("humidity", 0, 600, 120)
+    assert list(values) == [45.0, 165.0, 285.0, 405.0, 525.0]
+
+    # Steps that are not a multiple of a rollup resolution use the store
+    timestamps, values = history.query("humidity", 480, 600, 90, agg="count")
+    assert list(timestamps) == [450, 540]
+    assert list(values) == [3, 2]
+
+
+def test_history_invalid():
+    from enviroplus.history import History
+
+    history = History()
+    with pytest.raises(ValueError):
+        history.query("lux", 0, 60, 10, agg="median")
+    with pytest.raises(ValueError):
+        history.query("lux", 0, 60, 0)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import mock
+
+
+def test_hub_reads_sources_at_their_own_rate():
+    from enviroplus.hub import Hub, Source
+
+    samples = []
+    hub = Hub()
+    hub.subscribe(samples.append)
+    hub.add(Source("fast", lambda: {"fast": 1}, 0.01))
+    hub.add(Source("slow", lambda: {"slow": 2}, 0.1))
+
+    with hub:
+        time.sleep(0.25)
+
+    fast = [s for s in samples if s.metric == "fast"]
+    slow = [s for s in samples if s.metric == "slow"]
+    assert len(fast) > 3 * len(slow)
+    assert 1 <= len(slow) <= 4
+    assert all(s.value == 2 for s in slow)
+
+
+def test_hub_slow_source_does_not_block_others():
+    from enviroplus.hub import Hub, Source
+
+    release = threading.Event()
+    samples = []
+
+    def blocking():
+        release.wait(1.0)
+        return {"blocking": 0}
+
+    hub = Hub(workers=2)
+    hub.subscribe(samples.append)
+    hub.add(Source("blocking", blocking, 0.01))
+    fast = hub.add(Source("fast", lambda: {"fast": 1}, 0.01))
+    slow = hub.sources[0]
+
+    with hub:
+        time.sleep(0.1)
+        release.set()
+
+    assert len([s for s in samples if s.metric == "fast"]) > 3
+    assert slow.overruns > 0
+    assert fast.reads > 3
+
+
+def test_hub_errors():
+    from enviroplus.hub import Hub, Source
+
+    on_error = mock.Mock()
+
+    def broken():
+        raise IOError("Oh no!")
+
+    hub = Hub(on_error=on_error)
+    source = hub.add(Source("broken", broken, 1.0))
+
+    with hub:
+        time.sleep(0.05)
+
+    assert source.errors == 1
+    assert isinstance(source.last_error, IOError)
+    on_error.assert_called_once_with(source, source.last_error)
+
+
+def test_hub_publish_and_unsubscribe():
+    from enviroplus.hub import Hub, Sample
+
+    callback = mock.Mock()
+    hub = Hub()
+    hub.subscribe(callback)
+    hub.publish({"temperature": 20.0}, timestamp=1.0)
+    callback.assert_called_once_with(Sample("temperature", 20.0, 1.0))
+
+    hub.unsubscribe(callback)
+    hub.publish({"temperature": 21.0})
+    assert callback.call_count == 1
+
+
+def test_hub_sensor_sources(gpiod, gpiodevice, smbus):
+    from enviroplus import hub
+
+    bme280 = mock.Mock()
+    bme280.get_temperature.return_value = 20.0
+    bme280.get_pressure.return_value = 1000.0
+    bme280.get_humidity.return_value = 50.0
+    assert hub.bme280_source(bme280).read() == {"temperature": 20.0, "pressure": 1000.0, "humidity": 50.0}
+
+    ltr559 = mock.Mock()
+    ltr559.get_lux.return_value = 100.0
+    ltr559.get_proximity.return_value = 5
+    assert hub.ltr559_source(ltr559).read() == {"lux": 100.0, "proximity": 5}
+
+    pms5003 = mock.Mock()
+    pms5003.read.return_value.pm_ug_per_m3.side_effect = lambda size: size * 10
+    assert hub.pms5003_source(pms5003).read() == {"pm1": 10.0, "pm25": 25.0, "pm10": 100}
+
+    noise = mock.Mock()
+    noise.get_noise_profile.return_value = (1, 2, 3, 2)
+    assert hub.noise_source(noise).read() == {"noise_low": 1, "noise_mid": 2, "noise_high": 3, "noise_total": 2}
+
+    from enviroplus import gas
+    gas._is_setup = False
+    values = hub.gas_source().read()
+    assert int(values["oxidising"]) == 16641
+    assert "adc" not in values
@@ -0,0 +1,187 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture
+def influxdb():
+    """Local HTTP server recording line protocol POSTs, set server.status to fail them or server.reject to reject matching bodies."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            BaseHTTPRequestHandler.setup(self)
+            server.connections += 1
+
+        def do_POST(self):
+            body = gzip.decompress(self.rfile.read(int(self.headers["Content-Length"]))).decode("utf-8")
+            status = 400 if server.reject is not None and server.reject in body else server.status
+            if status < 300:
+                server.requests.append((self.path, dict(self.headers), body))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.status = 204
+    server.reject = None
+    server.requests = []
+    server.connections = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/v2/write?org=home&bucket=enviroplus"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_encode():
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter("http://localhost:8086/write?db=enviroplus", None, measurement="enviro plus", tags={"host": "pi", "room": "living room"})
+    body = writer.encode([
+        (1700000000.1234, "temperature", 21.5),
+        (1700000000.5, "pm25", 7),
+        (1700000000.5, "adc", None),
+        (1700000000.5, "lux", float("nan"))
+    ])
+    assert body.decode("utf-8").splitlines() == [
+        "enviro\\ plus,host=pi,room=living\\ room temperature=21.5 1700000000123",
+        "enviro\\ plus,host=pi,room=living\\ room pm25=7.0 1700000000500"
+    ]
+
+
+def test_url_precision():
+    from enviroplus.influx import InfluxWriter
+
+    assert InfluxWriter("http://localhost:8086/write?db=enviroplus", None)._path == "/write?db=enviroplus&precision=ms"
+    with pytest.raises(ValueError):
+        InfluxWriter("http://localhost:8086/write?db=enviroplus&precision=s", None)
+    with pytest.raises(ValueError):
+        InfluxWriter("udp://localhost:8089", None)
+
+
+def test_batches_over_one_connection(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path), token="secret", tags={"host": "pi"})
+    for batch in range(3):
+        writer.add("temperature", 20.0 + batch, 1700000000 + batch)
+        writer.add("humidity", 45.0, 1700000000 + batch)
+        assert writer.flush() == 2
+    writer.close()
+
+    assert influxdb.connections == 1
+    assert len(influxdb.requests) == 3
+    path, headers, body = influxdb.requests[0]
+    assert path == "/api/v2/write?org=home&bucket=enviroplus&precision=ms"
+    assert headers["Authorization"] == "Token secret"
+    assert headers["Content-Encoding"] == "gzip"
+    assert body == "enviroplus,host=pi temperature=20.0 1700000000000\nenviroplus,host=pi humidity=45.0 1700000000000\n"
+    assert writer.sent == 3
+
+
+def test_failed_batches_are_spooled(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path))
+    influxdb.status = 503
+    writer.add("temperature", 20.0, 1700000000)
+    writer.flush()
+    writer.add("temperature", 21.0, 1700000001)
+    writer.flush()
+    spooled = writer.spooled
+    assert spooled > 0
+    assert writer.errors == 2
+
+    # Reopening finds the spooled batches, they are sent together, oldest first, after the next batch
+    writer.close()
+    writer = InfluxWriter(influxdb.url, str(tmp_path))
+    assert writer.spooled == spooled
+    influxdb.status = 204
+    writer.add("temperature", 22.0, 1700000002)
+    writer.flush()
+    writer.close()
+
+    assert writer.spooled == 0
+    assert [body.split("\n")[:-1] for _, _, body in influxdb.requests] == [
+        ["enviroplus temperature=22.0 1700000002000"],
+        ["enviroplus temperature=20.0 1700000000000", "enviroplus temperature=21.0 1700000001000"]
+    ]
+
+
+def test_rejected_spooled_batch_is_dropped(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path))
+    influxdb.status = 503
+    for batch in range(3):
+        writer.add("temperature", 20.0 + batch, 1700000000 + batch)
+        writer.flush()
+
+    # Only the batch InfluxDB rejects is dropped
+    influxdb.status = 204
+    influxdb.reject = "temperature=21.0"
+    writer.add("temperature", 30.0, 1700000010)
+    writer.flush()
+    assert writer.spooled == 0
+    assert writer.dropped == 1
+    assert [body.split()[1] for _, _, body in influxdb.requests] == ["temperature=30.0", "temperature=20.0", "temperature=22.0"]
+
+
+def test_spool_is_bounded(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path), spool_bytes=200)
+    influxdb.status = 500
+    for batch in range(10):
+        writer.add("temperature", 20.0 + batch, 1700000000 + batch)
+        writer.flush()
+    assert 0 < writer._spool.size <= 200
+    assert writer._spool.evicted > 0
+    assert writer.spooled == writer._spool.size
+
+
+def test_rejected_batches_are_dropped(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path))
+    influxdb.status = 400
+    writer.add("temperature", 20.0, 1700000000)
+    writer.flush()
+    assert writer.spooled == 0
+    assert writer.dropped == 1
+
+
+def test_unreachable_server(tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter("http://127.0.0.1:9/write?db=enviroplus", str(tmp_path), timeout=1.0)
+    writer.add("temperature", 20.0, 1700000000)
+    writer.flush()
+    assert writer.spooled > 0
+    assert isinstance(writer.last_error, OSError)
+
+
+def test_reconnects_closed_connection(influxdb, tmp_path):
+    from enviroplus.influx import InfluxWriter
+
+    writer = InfluxWriter(influxdb.url, str(tmp_path))
+    writer.add("temperature", 20.0, 1700000000)
+    writer.flush()
+    # As if the server closed the idle keep-alive connection
+    writer._connection.sock.close()
+    writer.add("temperature", 21.0, 1700000001)
+    writer.flush()
+    writer.close()
+
+    assert writer.errors == 0
+    assert writer.sent == 2
+    assert influxdb.connections == 2
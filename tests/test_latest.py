@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+
+def test_latest_update_and_get():
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    latest.update("temperature", 20.0)
+
+    assert latest.get("temperature") == 20.0
+    assert latest.get("temperature", max_age=1.0) == 20.0
+    assert latest.age("temperature") < 1.0
+    assert latest.age("humidity") is None
+
+    with pytest.raises(KeyError):
+        latest.get("humidity")
+
+
+def test_latest_stale_without_refresh():
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    latest.update("temperature", 20.0, timestamp=time.time() - 10)
+
+    assert latest.age("temperature") >= 10
+    assert latest.get("temperature") == 20.0
+    with pytest.raises(ValueError):
+        latest.get("temperature", max_age=5.0)
+
+
+def test_latest_refresh_group():
+    from enviroplus.latest import LatestValues
+
+    calls = []
+
+    def read():
+        calls.append(None)
+        return {"oxidising": 1.0, "reducing": 2.0, "nh3": 3.0}
+
+    latest = LatestValues()
+    latest.register(("oxidising", "reducing", "nh3"), read)
+
+    assert latest.get("oxidising", max_age=1.0) == 1.0
+    assert latest.get("reducing", max_age=1.0) == 2.0
+    assert latest.get("nh3") == 3.0
+    assert len(calls) == 1
+
+    assert latest.get("nh3", max_age=0) == 3.0
+    assert len(calls) == 2
+
+
+def test_latest_refresh_missing_metric():
+    from enviroplus.latest import LatestValues
+
+    # Eg: a PMS5003 source that had no frame to return
+    values = {"pm1": 1.0}
+    latest = LatestValues()
+    latest.register(("pm1", "pm25"), lambda: dict(values))
+
+    with pytest.raises(KeyError, match="pm1, pm25 did not return pm25"):
+        latest.get("pm25")
+
+    latest.update("pm25", 2.0, timestamp=time.time() - 10)
+    with pytest.raises(ValueError, match="pm25 is older than 5.0s and refreshing pm1, pm25 did not return it"):
+        latest.get("pm25", max_age=5.0)
+    assert latest.get("pm25") == 2.0
+    assert latest.get("pm1", max_age=0) == 1.0
+
+
+def test_latest_single_refresh_for_concurrent_readers():
+    from enviroplus.latest import LatestValues
+
+    calls = []
+
+    def read():
+        calls.append(None)
+        time.sleep(0.05)
+        return {"pm25": 5}
+
+    latest = LatestValues()
+    latest.register(("pm25",), read)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(latest.get("pm25", max_age=1.0))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [5] * 8
+    assert len(calls) == 1
+
+
+def test_latest_add_sample():
+    from enviroplus.hub import Hub
+    from enviroplus.latest import LatestValues
+
+    latest = LatestValues()
+    hub = Hub()
+    hub.subscribe(latest.add_sample)
+    hub.publish({"lux": 100.0, "proximity": 3})
+
+    snapshot = latest.snapshot()
+    assert snapshot["lux"].value == 100.0
+    assert snapshot["proximity"].value == 3
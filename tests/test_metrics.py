@@ -0,0 +1,101 @@
+import pytest
+
+
+@pytest.fixture
+def metrics():
+    from enviroplus import metrics
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.enable(False)
+    metrics.reset()
+
+
+def test_disabled_hooks_do_nothing():
+    from enviroplus import metrics
+    metrics.enable(False)
+
+    metrics.observe("read", 0.1)
+    metrics.increment("read.errors")
+    with metrics.timer("read"):
+        pass
+
+    @metrics.timed("call")
+    def call():
+        return 1
+
+    assert call() == 1
+    assert metrics.snapshot() == {"histograms": {}, "counters": {}}
+
+
+def test_histogram_buckets(metrics):
+    for seconds in (0.00005, 0.0001, 0.0002, 0.003, 0.003, 20.0):
+        metrics.observe("read", seconds)
+
+    histogram = metrics.snapshot()["histograms"]["read"]
+    assert histogram.count == 6
+    assert histogram.max == 20.0
+    assert histogram.counts[0] == 2  # Bucket upper bounds are inclusive
+    assert histogram.counts[1] == 1
+    assert histogram.counts[metrics.BUCKETS.index(0.005)] == 2
+    assert histogram.counts[-1] == 1
+    assert sum(histogram.counts) == 6
+    assert histogram.quantile(0.5) == 0.00025
+    assert histogram.quantile(0.8) == 0.005
+    assert histogram.quantile(1.0) == 20.0
+
+
+def test_timer_counts_errors(metrics):
+    with pytest.raises(ValueError):
+        with metrics.timer("read"):
+            raise ValueError("Bad read")
+
+    @metrics.timed("call")
+    def call():
+        return 1
+
+    assert call() == 1
+    metrics.increment("pms5003.resets", 2)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["histograms"]["read"].count == 1
+    assert snapshot["histograms"]["call"].count == 1
+    assert snapshot["counters"] == {"read.errors": 1, "pms5003.resets": 2}
+
+
+def test_snapshot_is_a_copy(metrics):
+    metrics.observe("read", 0.1)
+    snapshot = metrics.snapshot()
+    metrics.observe("read", 0.1)
+    assert snapshot["histograms"]["read"].count == 1
+    assert metrics.snapshot()["histograms"]["read"].count == 2
+
+
+def test_gas_instrumentation(gpiod, gpiodevice, metrics, simulator):
+    from enviroplus import gas
+
+    gas.setup(i2c_dev=simulator.bus)
+    gas.read_all()
+    gas.read_all()
+
+    histograms = metrics.snapshot()["histograms"]
+    assert histograms["gas.read_all"].count == 2
+    assert histograms["gas.conversion"].count == 6
+    assert histograms["gas.read_all"].sum >= histograms["gas.conversion"].sum
+
+
+def test_hub_instrumentation(metrics):
+    from enviroplus import hub
+
+    def read():
+        raise IOError("Bus error")
+
+    sensors = hub.Hub()
+    sensors._read(hub.Source("bme280", read, 1.0))
+    sensors._read(hub.Source("ltr559", lambda: {"lux": 1.0}, 1.0))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["histograms"]["bme280.read"].count == 1
+    assert snapshot["histograms"]["ltr559.read"].count == 1
+    assert snapshot["histograms"]["hub.publish"].count == 2
+    assert snapshot["counters"] == {"bme280.read.errors": 1}
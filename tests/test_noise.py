@@ -1,3 +1,6 @@
+import os
+
+import mock
 import pytest
 
 
@@ -46,3 +49,308 @@ def test_get_amplitude_at_frequency_range(sounddevice, numpy):
 
     with pytest.raises(ValueError):
         noise.get_amplitude_at_frequency_range(0, 16000)
+
+
+def test_noise_open_stream(sounddevice, numpy):
+    from enviroplus.noise import Noise
+
+    callback = mock.Mock()
+    noise = Noise(sample_rate=16000)
+    stream = noise.open_stream(callback, blocksize=512)
+
+    assert stream is sounddevice.InputStream.return_value
+    stream.start.assert_called_once()
+
+    kwargs = sounddevice.InputStream.call_args.kwargs
+    assert kwargs["device"] == "adau7002"
+    assert kwargs["blocksize"] == 512
+
+    indata = mock.MagicMock()
+    kwargs["callback"](indata, 512, None, None)
+    callback.assert_called_once()
+    assert callback.call_args.args[0] is indata.__getitem__.return_value
+
+
+def test_event_detector_onset_and_peak(sounddevice):
+    import numpy
+
+    from enviroplus.noise import EventDetector
+
+    onsets = []
+    peaks = []
+    detector = EventDetector(
+        [(900, 1100, 10.0, 5.0)],
+        sample_rate=16000,
+        blocksize=1024,
+        on_onset=lambda *args: onsets.append(args),
+        on_peak=lambda *args: peaks.append(args))
+
+    t = numpy.arange(1024) / 16000.0
+    silence = numpy.zeros(1024)
+    tone = numpy.sin(2 * numpy.pi * 1000 * t)
+
+    detector.process(silence, 0.0)
+    assert onsets == []
+
+    detector.process(tone * 0.5, 1.0)
+    assert [o[0] for o in onsets] == [0]
+    assert onsets[0][2] == 1.0
+
+    detector.process(tone, 2.0)
+    assert peaks == []
+
+    detector.process(silence, 3.0)
+    assert len(peaks) == 1
+    band, level, timestamp = peaks[0]
+    assert band == 0
+    assert timestamp == 2.0
+    assert level > onsets[0][1]
+
+
+def test_event_detector_hysteresis(sounddevice):
+    import numpy
+
+    from enviroplus.noise import EventDetector
+
+    peaks = []
+    detector = EventDetector([(900, 1100, 10.0, 5.0)], on_peak=lambda *args: peaks.append(args))
+
+    t = numpy.arange(1024) / 16000.0
+    tone = numpy.sin(2 * numpy.pi * 1000 * t)
+    level = detector.levels(tone)[0]
+
+    detector.process(tone * (12.0 / level), 0.0)
+    detector.process(tone * (7.0 / level), 1.0)
+    assert peaks == []
+    assert detector.active[0]
+
+    detector.process(tone * (4.0 / level), 2.0)
+    assert len(peaks) == 1
+    assert not detector.active[0]
+
+
+def test_event_detector_max_frequency(sounddevice):
+    from enviroplus.noise import EventDetector
+
+    with pytest.raises(ValueError):
+        EventDetector([(0, 16000, 1.0, 0.5)], sample_rate=16000)
+
+
+def _tone(frequency, amplitude, count, sample_rate=16000):
+    import numpy
+    t = numpy.arange(count) / float(sample_rate)
+    return amplitude * numpy.sin(2 * numpy.pi * frequency * t)
+
+
+def test_calibration_gain_is_cached(sounddevice):
+    from enviroplus.noise import Calibration
+
+    calibration = Calibration(sensitivity=-26.0)
+    gain = calibration.gain(16000, 8000, 16000)
+    assert calibration.gain(16000, 8000, 16000) is gain
+    assert calibration.gain(16000, 1024, 1024) is not gain
+
+
+def test_calibration_requires_frequencies_and_response(sounddevice):
+    from enviroplus.noise import Calibration
+
+    with pytest.raises(ValueError):
+        Calibration(frequencies=[100, 1000])
+
+
+def test_load_calibration(sounddevice, tmp_path):
+    import json
+
+    from enviroplus.noise import load_calibration
+
+    path = str(tmp_path / "calibration.json")
+    with open(path, "w") as f:
+        json.dump({"sensitivity": -30.0, "frequencies": [100, 1000, 8000], "response": [-2.0, 0.0, 3.0]}, f)
+
+    calibration = load_calibration(path)
+    assert calibration.sensitivity == -30.0
+    assert load_calibration(path) is calibration
+
+
+def test_noise_calibrated_spl(sounddevice):
+    from enviroplus.noise import Calibration, Noise
+
+    sensitivity = -26.0
+    # A full-scale sine is 0dBFS, so a tone at the sensitivity level reads 94dB SPL
+    amplitude = 10 ** (sensitivity / 20.0)
+    sounddevice.rec.return_value = _tone(1000, amplitude, 8000).reshape(-1, 1)
+
+    noise = Noise(sample_rate=16000, duration=0.5, calibration=Calibration(sensitivity=sensitivity))
+
+    assert abs(noise.get_amplitude_at_frequency_range(900, 1100) - 94.0) < 0.5
+
+    low, mid, high = noise.get_amplitudes_at_frequency_ranges([(100, 500), (900, 1100), (4000, 5000)])
+    assert abs(mid - 94.0) < 0.5
+    assert low < mid - 20
+    assert high < mid - 20
+
+    amp_low, amp_mid, amp_high, amp_total = noise.get_noise_profile()
+    assert abs(amp_total - 94.0) < 0.5
+    assert amp_low > amp_mid
+
+
+def test_noise_calibrated_response(sounddevice):
+    from enviroplus.noise import Calibration, Noise
+
+    amplitude = 10 ** (-26.0 / 20.0)
+    sounddevice.rec.return_value = _tone(1000, amplitude, 8000).reshape(-1, 1)
+
+    # A microphone that reads 6dB hot at 1kHz should be corrected back down
+    calibration = Calibration(sensitivity=-26.0, frequencies=[0, 8000], response=[6.0, 6.0])
+    noise = Noise(sample_rate=16000, duration=0.5, calibration=calibration)
+
+    assert abs(noise.get_amplitude_at_frequency_range(900, 1100) - 88.0) < 0.5
+
+
+def test_event_detector_calibrated(sounddevice):
+    from enviroplus.noise import Calibration, EventDetector
+
+    onsets = []
+    detector = EventDetector(
+        [(900, 1100, 80.0, 10.0)],
+        on_onset=lambda *args: onsets.append(args),
+        calibration=Calibration(sensitivity=-26.0))
+
+    detector.process(_tone(1000, 10 ** (-26.0 / 20.0), 1024), 0.0)
+    assert len(onsets) == 1
+    assert abs(onsets[0][1] - 94.0) < 1.0
+
+
+def test_audio_ring_write_and_read(sounddevice):
+    import numpy
+
+    from enviroplus.noise import AudioRing
+
+    ring = AudioRing(create=True, sample_rate=16000, blocksize=4, capacity=3)
+    try:
+        reader = AudioRing(name=ring.name)
+        assert reader.blocksize == 4
+        assert reader.capacity == 3
+        assert reader.sample_rate == 16000
+
+        assert reader.sequence == 0
+        assert reader.read(0) is None
+
+        ring.write(numpy.arange(4.0), 1.5)
+        block, timestamp = reader.read(0)
+        assert reader.sequence == 1
+        assert list(block) == [0, 1, 2, 3]
+        assert timestamp == 1.5
+
+        for n in range(1, 4):
+            ring.write(numpy.full(4, n), float(n))
+
+        assert not reader.valid(0)
+        assert reader.read(0) is None
+        assert list(reader.read(3)[0]) == [3, 3, 3, 3]
+
+        reader.close()
+    finally:
+        ring.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Only POSIX shared memory is tracked")
+def test_audio_ring_untracks_reader(sounddevice):
+    from multiprocessing import resource_tracker
+
+    from enviroplus.noise import AudioRing
+
+    ring = AudioRing(create=True, blocksize=2, capacity=2)
+    try:
+        with mock.patch.object(resource_tracker, "unregister") as unregister:
+            AudioRing(name=ring.name).close()
+        # The reader must not leave the segment to be unlinked by its tracker
+        unregister.assert_called_once_with(f"/{ring.name}", "shared_memory")
+    finally:
+        ring.close()
+
+
+def test_audio_ring_blocks_skips_missed(sounddevice):
+    import numpy
+
+    from enviroplus.noise import AudioRing
+
+    ring = AudioRing(create=True, blocksize=2, capacity=2)
+    try:
+        for n in range(5):
+            ring.write(numpy.full(2, n), float(n))
+        blocks = ring.blocks(sequence=0)
+        assert [next(blocks)[0] for _ in range(2)] == [3, 4]
+    finally:
+        ring.close()
+
+
+def test_noise_publish(sounddevice):
+    from enviroplus.noise import AudioRing, Noise
+
+    ring = AudioRing(create=True, sample_rate=16000, blocksize=256, capacity=2)
+    try:
+        noise = Noise(sample_rate=16000)
+        noise.publish(ring)
+        kwargs = sounddevice.InputStream.call_args.kwargs
+        assert kwargs["blocksize"] == 256
+
+        with pytest.raises(ValueError):
+            Noise(sample_rate=8000).publish(ring)
+    finally:
+        ring.close()
+
+
+def test_p2_quantile(sounddevice):
+    import random
+
+    from enviroplus.noise import P2Quantile
+
+    rng = random.Random(0)
+    median = P2Quantile(0.5)
+    p90 = P2Quantile(0.9)
+    assert median.value is None
+
+    for _ in range(10000):
+        value = rng.random()
+        median.add(value)
+        p90.add(value)
+
+    assert median.count == 10000
+    assert abs(median.value - 0.5) < 0.02
+    assert abs(p90.value - 0.9) < 0.02
+
+    median.reset()
+    assert median.value is None
+
+
+def test_p2_quantile_few_values(sounddevice):
+    from enviroplus.noise import P2Quantile
+
+    quantile = P2Quantile(0.5)
+    for value in (3, 1, 2):
+        quantile.add(value)
+    assert quantile.value == 2
+
+    with pytest.raises(ValueError):
+        P2Quantile(1.5)
+
+
+def test_noise_get_noise_quantiles(sounddevice, numpy):
+    from enviroplus.noise import Noise
+
+    noise = Noise(sample_rate=16000, duration=0.1, quantiles=(0.5, 0.9))
+    assert noise.get_noise_quantiles("mid") == {0.5: None, 0.9: None}
+
+    for level in (1.0, 2.0, 3.0):
+        numpy.mean.return_value = level
+        noise.get_noise_profile()
+
+    assert noise.get_noise_quantiles("mid")[0.5] == 2.0
+    assert noise.get_noise_quantiles("total")[0.9] == 3.0
+
+    noise.reset_noise_quantiles()
+    assert noise.get_noise_quantiles("low") == {0.5: None, 0.9: None}
+
+    with pytest.raises(RuntimeError):
+        Noise().get_noise_quantiles("low")
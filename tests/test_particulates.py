@@ -0,0 +1,195 @@
+import threading
+import time
+
+import mock
+
+
+class FakePMS5003:
+    def __init__(self, results):
+        self.results = list(results)
+        self.resets = 0
+        self.idle = threading.Event()
+
+    def read(self):
+        if not self.results:
+            self.idle.set()
+            time.sleep(0.01)
+            raise self.timeout("No more frames")
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def reset(self):
+        self.resets += 1
+
+
+def _fake(results):
+    from pms5003 import ReadTimeoutError
+    fake = FakePMS5003(results)
+    fake.timeout = ReadTimeoutError
+    return fake
+
+
+def test_particulates_queue_and_latest(gpiod, gpiodevice):
+    from enviroplus.particulates import PMS5003Reader
+
+    pms5003 = _fake(["a", "b", "c"])
+    reader = PMS5003Reader(pms5003, backoff=0.01)
+    assert reader.latest() is None
+
+    with reader:
+        first = reader.get(timeout=1.0)
+        assert pms5003.idle.wait(1.0)
+
+    assert first.data == "a"
+    assert [f.data for f in reader.get_all()] == ["b", "c"]
+    assert reader.latest().data == "c"
+    assert reader.latest(max_age=60).data == "c"
+    assert reader.frames == 3
+
+
+def test_particulates_bounded_queue(gpiod, gpiodevice):
+    from enviroplus.particulates import PMS5003Reader
+
+    pms5003 = _fake(list(range(5)))
+    reader = PMS5003Reader(pms5003, maxsize=2, backoff=0.01)
+
+    with reader:
+        assert pms5003.idle.wait(1.0)
+
+    assert [f.data for f in reader.get_all()] == [3, 4]
+    assert reader.dropped == 3
+    assert reader.get(timeout=0) is None
+
+
+def test_particulates_reset_and_backoff(gpiod, gpiodevice):
+    from pms5003 import ChecksumMismatchError, ReadTimeoutError, SerialTimeoutError
+
+    from enviroplus.particulates import PMS5003Reader
+
+    pms5003 = _fake([
+        ReadTimeoutError("Timeout"),
+        SerialTimeoutError("Timeout"),
+        ChecksumMismatchError("Bad checksum"),
+        "ok"
+    ])
+    reader = PMS5003Reader(pms5003, backoff=0.01, max_backoff=0.02)
+
+    with reader:
+        frame = reader.get(timeout=1.0)
+
+    assert frame.data == "ok"
+    assert reader.errors >= 3
+    assert pms5003.resets >= 2
+    assert reader.resets == pms5003.resets
+
+
+def test_particulates_serial_error(gpiod, gpiodevice):
+    from enviroplus.particulates import PMS5003Reader
+
+    error = OSError(5, "Input/output error")
+    pms5003 = _fake([error, error, "ok"])
+    reader = PMS5003Reader(pms5003, backoff=0.01, max_backoff=0.02)
+
+    with reader:
+        frame = reader.get(timeout=1.0)
+        # The thread keeps reading after the errors
+        assert reader._thread.is_alive()
+
+    assert frame.data == "ok"
+    assert reader.errors >= 2
+    assert pms5003.resets >= 2
+
+
+def test_particulates_stop_during_backoff(gpiod, gpiodevice):
+    from pms5003 import ReadTimeoutError
+
+    from enviroplus.particulates import PMS5003Reader
+
+    pms5003 = mock.Mock()
+    pms5003.read.side_effect = ReadTimeoutError("Timeout")
+    reader = PMS5003Reader(pms5003, backoff=60)
+    reader.start()
+    time.sleep(0.01)
+
+    start = time.time()
+    reader.stop()
+    assert time.time() - start < 1.0
+    pms5003.reset.assert_not_called()
+
+
+def _frame(*words):
+    import struct
+
+    words = words + (0,) * (13 - len(words))
+    frame = b"\x42\x4d" + struct.pack(">H", 28) + struct.pack(">13H", *words)
+    return frame + struct.pack(">H", sum(frame))
+
+
+def test_frame_parser_resync(gpiod, gpiodevice):
+    from enviroplus.particulates import PM10, PM25, FrameParser
+
+    corrupt = bytearray(_frame(9, 9, 9))
+    corrupt[10] ^= 0xff
+    data = b"\x00\x42\x4d\x42" + bytes(corrupt) + _frame(1, 2, 3) + _frame(4, 5, 6)
+
+    parser = FrameParser(size=48)
+    frames = list(parser.feed(data))
+
+    assert [(f[PM25], f[PM10]) for f in frames] == [(2, 3), (5, 6)]
+    assert parser.frames == 2
+    assert parser.errors >= 1
+
+
+def test_frame_parser_split_frames(gpiod, gpiodevice):
+    from enviroplus.particulates import FrameParser
+
+    data = _frame(1, 2, 3) + _frame(4, 5, 6)
+    parser = FrameParser()
+
+    frames = []
+    for offset in range(0, len(data), 5):
+        frames.extend(parser.feed(data[offset:offset + 5]))
+
+    assert [f[:3] for f in frames] == [(1, 2, 3), (4, 5, 6)]
+
+
+def test_frame_parser_readinto(gpiod, gpiodevice):
+    import io
+
+    from enviroplus.particulates import FrameParser
+
+    port = io.BytesIO(b"\xff" * 40 + _frame(7, 8, 9))
+    parser = FrameParser(size=32)
+
+    frames = []
+    while parser.readinto(port):
+        frames.extend(parser.frames_available())
+
+    assert [f[:3] for f in frames] == [(7, 8, 9)]
+
+
+def test_frame_parser_size(gpiod, gpiodevice):
+    import pytest
+
+    from enviroplus.particulates import FrameParser
+
+    with pytest.raises(ValueError):
+        FrameParser(size=16)
+
+
+def test_parse_frames(gpiod, gpiodevice):
+    from enviroplus.particulates import FrameParser, parse_frames
+
+    corrupt = bytearray(_frame(9, 9, 9))
+    corrupt[-1] ^= 0xff
+    data = b"\x42" + _frame(1, 2, 3) + bytes(corrupt) + b"\x00\x4d" + _frame(4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16) + b"\x42\x4d"
+
+    frames = parse_frames(data)
+    assert frames.shape == (2, 13)
+    assert frames[0, :3].tolist() == [1, 2, 3]
+    assert frames[1].tolist() == list(range(4, 17))
+
+    assert frames.tolist() == [list(f) for f in FrameParser().feed(data)]
+    assert parse_frames(b"").shape == (0, 13)
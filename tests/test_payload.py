@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+FIELDS = ("temperature", "pressure", "humidity", "pm25")
+SAMPLES = [
+    (1700000000.0, {"temperature": 21.5, "pressure": 101320, "humidity": 40, "pm25": 3}),
+    (1700000005.0, {"temperature": 21.75, "pressure": 101330, "humidity": 41})
+]
+
+
+def test_json_single_sample():
+    from enviroplus.payload import PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS, tags={"serial": "abc"})
+    data = json.loads(encoder.encode(SAMPLES[:1]))
+    assert data == {"serial": "abc", "timestamp": 1700000000.0, "temperature": 21.5, "pressure": 101320, "humidity": 40, "pm25": 3}
+    assert encoder.decode(encoder.encode(SAMPLES[:1])) == SAMPLES[:1]
+
+
+def test_json_batch_sends_keys_once():
+    from enviroplus.payload import PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS, tags={"serial": "abc"})
+    message = encoder.encode(SAMPLES)
+    assert message.count(b"temperature") == 1
+    data = json.loads(message)
+    assert data["timestamp"] == [1700000000.0, 1700000005.0]
+    assert data["pm25"] == [3, None]
+    assert encoder.decode(message) == SAMPLES
+
+
+@pytest.mark.parametrize("encoding", ("cbor", "msgpack"))
+def test_binary_maps(encoding):
+    pytest.importorskip({"cbor": "cbor2", "msgpack": "msgpack"}[encoding])
+    from enviroplus.payload import PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS, encoding=encoding, tags={"serial": "abc"})
+    message = encoder.encode(SAMPLES)
+    assert len(message) < len(PayloadEncoder(FIELDS, tags={"serial": "abc"}).encode(SAMPLES))
+    assert encoder.decode(message) == SAMPLES
+
+
+def test_struct():
+    from enviroplus.payload import STRUCT_HEADER, PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS, encoding="struct", schema_id=7)
+    message = encoder.encode(SAMPLES)
+    # uint32 timestamp and four float32 per sample
+    assert len(message) == STRUCT_HEADER.size + 2 * (4 + 4 * 4)
+    assert STRUCT_HEADER.unpack_from(message) == (7, 0b1111, 2)
+    # Timestamps are whole seconds and missing values are left out
+    assert encoder.decode(message) == [
+        (1700000000, {"temperature": 21.5, "pressure": 101320, "humidity": 40, "pm25": 3}),
+        (1700000005, {"temperature": 21.75, "pressure": 101330, "humidity": 41})
+    ]
+
+    with pytest.raises(ValueError):
+        PayloadEncoder(FIELDS, encoding="struct", schema_id=8).decode(message)
+    with pytest.raises(ValueError):
+        encoder.decode(message[:-1])
+
+
+@pytest.mark.parametrize("encoding", ("json", "struct"))
+def test_per_metric(encoding):
+    from enviroplus.payload import PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS, encoding=encoding)
+    messages = encoder.encode_metrics(SAMPLES)
+    assert list(messages) == list(FIELDS)
+    assert encoder.decode(messages["temperature"]) == [(1700000000, {"temperature": 21.5}), (1700000005, {"temperature": 21.75})]
+    assert encoder.decode(messages["pm25"]) == [(1700000000, {"pm25": 3}), (1700000005, {})]
+
+
+def test_invalid():
+    from enviroplus.payload import PayloadEncoder
+
+    with pytest.raises(ValueError):
+        PayloadEncoder(FIELDS, encoding="xml")
+    with pytest.raises(ValueError):
+        PayloadEncoder([f"metric{index}" for index in range(33)])
+    with pytest.raises(ValueError):
+        PayloadEncoder(FIELDS, encoding="struct").encode(SAMPLES * 128)
+
+
+def test_json_single_sample_skips_missing():
+    from enviroplus.payload import PayloadEncoder
+
+    encoder = PayloadEncoder(FIELDS)
+    assert json.loads(encoder.encode(SAMPLES[1:])) == {"timestamp": 1700000005.0, "temperature": 21.75, "pressure": 101330, "humidity": 41}
+    assert encoder.decode(encoder.encode(SAMPLES[1:])) == SAMPLES[1:]
+
+
+def test_average_values():
+    from enviroplus.payload import average_values
+
+    assert average_values({"temperature": [21.5, 22.9], "pressure": [101324.0, 101330.0]}) == {"temperature": 22, "pressure": 101330}
+
+
+def test_sensorcommunity_payloads():
+    from enviroplus.payload import sensorcommunity_payloads
+
+    (pm_pin, pm), (climate_pin, climate) = sensorcommunity_payloads({"temperature": "21.84", "P2": "7.00", "P1": "9.00"})
+    assert (pm_pin, climate_pin) == ("1", "11")
+    assert pm["sensordatavalues"] == [{"value_type": "P2", "value": "7.00"}, {"value_type": "P1", "value": "9.00"}]
+    assert climate["sensordatavalues"] == [{"value_type": "temperature", "value": "21.84"}]
+    assert pm["software_version"] == "enviro-plus 1.0.0"
@@ -0,0 +1,56 @@
+import pytest
+
+
+def test_ringbuffer_append():
+    from enviroplus.ringbuffer import RingBuffer
+
+    ring = RingBuffer(3, fill=1)
+    assert ring.values.tolist() == [1, 1, 1]
+
+    for value in range(2, 7):
+        ring.append(value)
+
+    assert ring.values.tolist() == [4, 5, 6]
+    assert ring.latest == 6
+    assert ring[0] == 4
+    assert list(ring) == [4, 5, 6]
+    assert len(ring) == 3
+
+
+def test_ringbuffer_values_is_a_view():
+    from enviroplus.ringbuffer import RingBuffer
+
+    ring = RingBuffer(4)
+    ring.extend([1, 2, 3, 4, 5])
+    values = ring.values
+
+    assert values.base is not None
+    assert not values.flags.writeable
+    with pytest.raises(ValueError):
+        values[0] = 10
+
+
+def test_ringbuffer_stats():
+    from enviroplus.ringbuffer import RingBuffer
+
+    ring = RingBuffer(4)
+    ring.extend([2, 4, 6, 8])
+
+    assert ring.min() == 2
+    assert ring.max() == 8
+    assert ring.mean() == 5
+    assert ring.scaled().tolist() == [1 / 7, 3 / 7, 5 / 7, 1.0]
+
+
+def test_ringbuffer_scaled_flat():
+    from enviroplus.ringbuffer import RingBuffer
+
+    ring = RingBuffer(3, fill=5)
+    assert ring.scaled().tolist() == [1.0, 1.0, 1.0]
+
+
+def test_ringbuffer_size():
+    from enviroplus.ringbuffer import RingBuffer
+
+    with pytest.raises(ValueError):
+        RingBuffer(0)
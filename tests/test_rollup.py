@@ -0,0 +1,71 @@
+import pytest
+
+
+def test_rollup_buckets():
+    from enviroplus.rollup import Bucket, Rollup
+
+    rollup = Rollup(resolutions=((60, 10), (300, 10)))
+    for timestamp, value in ((0, 1.0), (30, 3.0), (59, 2.0), (60, 10.0), (125, 4.0)):
+        rollup.add("temperature", value, timestamp)
+
+    assert rollup.buckets("temperature", 60) == [
+        Bucket(0, 3, 1.0, 3.0, 2.0, 2.0),
+        Bucket(60, 1, 10.0, 10.0, 10.0, 10.0)
+    ]
+    assert rollup.latest("temperature", 60).start == 60
+    assert rollup.current("temperature", 60) == Bucket(120, 1, 4.0, 4.0, 4.0, 4.0)
+
+    assert rollup.buckets("temperature", 300) == []
+    assert rollup.current("temperature", 300) == Bucket(0, 5, 1.0, 10.0, 4.0, 4.0)
+    assert len(rollup.buckets("temperature", 300, include_current=True)) == 1
+
+
+def test_rollup_late_sample():
+    from enviroplus.rollup import Bucket, Rollup
+
+    rollup = Rollup(resolutions=((60, 10), (300, 10)))
+    for timestamp, value in ((0, 1.0), (60, 2.0), (30, 50.0), (61, 3.0)):
+        rollup.add("temperature", value, timestamp)
+
+    # Left out of the completed minute and the in-progress one, but still in the same 5 minutes
+    assert rollup.buckets("temperature", 60, include_current=True) == [
+        Bucket(0, 1, 1.0, 1.0, 1.0, 1.0),
+        Bucket(60, 2, 2.0, 3.0, 2.5, 3.0)
+    ]
+    assert rollup.current("temperature", 300) == Bucket(0, 4, 1.0, 50.0, 14.0, 3.0)
+    assert rollup.late == 1
+
+
+def test_rollup_history_is_bounded():
+    from enviroplus.rollup import Rollup
+
+    rollup = Rollup(resolutions=((1, 3),))
+    for timestamp in range(10):
+        rollup.add("lux", timestamp, timestamp)
+
+    assert [b.start for b in rollup.buckets("lux", 1)] == [6, 7, 8]
+
+
+def test_rollup_unknown():
+    from enviroplus.rollup import Rollup
+
+    rollup = Rollup()
+    assert rollup.current("pm25", 60) is None
+    assert rollup.latest("pm25", 60) is None
+    assert rollup.buckets("pm25", 60) == []
+
+    with pytest.raises(ValueError):
+        rollup.buckets("pm25", 7)
+
+
+def test_rollup_add_sample():
+    from enviroplus.hub import Hub
+    from enviroplus.rollup import Rollup
+
+    rollup = Rollup()
+    hub = Hub()
+    hub.subscribe(rollup.add_sample)
+    hub.publish({"humidity": 50.0, "pressure": 1000.0}, timestamp=120.0)
+
+    assert sorted(rollup.metrics) == ["humidity", "pressure"]
+    assert rollup.current("humidity", 3600).mean == 50.0
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import mock
+import numpy
+import pytest
+
+
+def test_session_record_and_replay(tmp_path, gpiod, gpiodevice, smbus):
+    from pms5003 import PMS5003Data
+
+    from enviroplus import hub
+    from enviroplus.gas import from_voltages
+    from enviroplus.session import Player, Recorder
+
+    path = str(tmp_path / "session.bin")
+
+    bme280 = mock.Mock()
+    bme280.get_temperature.side_effect = [20.0, 21.0]
+    bme280.get_pressure.return_value = 1000.0
+    ltr559 = mock.Mock()
+    ltr559.get_lux.return_value = 100.0
+    pms5003 = mock.Mock()
+    raw = bytes(range(26)) + b"\x01\x45"
+    pms5003.read.return_value = PMS5003Data(raw)
+    gas = mock.Mock()
+    gas.read_voltages.return_value = (0.5, 1.0, 1.5, None)
+    gas.from_voltages = from_voltages
+
+    with Recorder(path) as recorder:
+        recorded_bme280 = recorder.bme280(bme280)
+        assert recorded_bme280.get_temperature() == 20.0
+        assert recorded_bme280.get_temperature() == 21.0
+        assert recorded_bme280.get_pressure() == 1000.0
+        recorded_bme280.update_sensor()
+        assert recorder.ltr559(ltr559).get_lux() == 100.0
+        assert recorder.pms5003(pms5003).read().raw_data == raw
+        assert recorder.gas(gas).read_all().oxidising == 10000.0
+
+    player = Player(path, speed=None)
+    assert sorted(player.channels) == [
+        "bme280.pressure", "bme280.temperature",
+        "gas.adc.voltage", "gas.nh3.voltage", "gas.oxidising.voltage", "gas.reducing.voltage",
+        "ltr559.lux", "pms5003.frame"
+    ]
+
+    replayed_bme280 = player.bme280()
+    replayed_bme280.update_sensor()
+    assert replayed_bme280.get_temperature() == 20.0
+    assert replayed_bme280.get_temperature() == 21.0
+    with pytest.raises(EOFError):
+        replayed_bme280.get_temperature()
+    with pytest.raises(AttributeError):
+        replayed_bme280.get_altitude
+
+    assert player.remaining("ltr559.lux") == 1
+    assert player.ltr559().get_lux() == 100.0
+    assert player.pms5003().read().data == PMS5003Data(raw).data
+    # The recorded voltages are converted on replay
+    assert player.peek("gas.nh3.voltage") == 1.5
+    assert hub.gas_source(gas=player.gas()).read() == {"oxidising": 10000.0, "reducing": from_voltages(1.0, 0, 0).oxidising, "nh3": from_voltages(1.5, 0, 0).oxidising}
+
+
+def test_session_replay_speed(tmp_path):
+    from enviroplus.session import Player, Recorder
+
+    path = str(tmp_path / "session.bin")
+    with Recorder(path) as recorder:
+        recorder.record("lux", 1.0)
+        time.sleep(0.2)
+        recorder.record("lux", 2.0)
+
+    player = Player(path, speed=2.0)
+    start = time.monotonic()
+    assert player.read("lux") == 1.0
+    assert player.read("lux") == 2.0
+    assert 0.08 < time.monotonic() - start < 0.19
+
+    player = Player(path, speed=None)
+    start = time.monotonic()
+    player.read("lux")
+    player.read("lux")
+    assert time.monotonic() - start < 0.05
+
+
+def test_session_ignores_partial_record(tmp_path):
+    from enviroplus.session import Player, Recorder
+
+    path = tmp_path / "session.bin"
+    with Recorder(str(path)) as recorder:
+        recorder.record("proximity", 5.0)
+        recorder.record("proximity", 6.0)
+    path.write_bytes(path.read_bytes()[:-3])
+
+    player = Player(str(path), speed=None)
+    assert player.remaining("proximity") == 1
+    assert player.read("proximity") == 5.0
+
+
+def test_session_noise(tmp_path, sounddevice):
+    from enviroplus.noise import Noise
+    from enviroplus.session import Player, Recorder
+
+    path = str(tmp_path / "session.bin")
+    recording = numpy.linspace(-1.0, 1.0, 800).reshape(-1, 1)
+    sounddevice.rec.return_value = recording
+
+    with Recorder(path) as recorder:
+        noise = recorder.noise(Noise(sample_rate=8000, duration=0.1))
+        profile = noise.get_noise_profile()
+        noise.open_stream(mock.Mock(), blocksize=4)
+        callback = sounddevice.InputStream.call_args[1]["callback"]
+        callback(numpy.ones((4, 1)), 4, None, None)
+
+    player = Player(path, speed=None)
+    noise = player.noise()
+    assert noise.sample_rate == 8000
+    assert noise.duration == 0.1
+    assert numpy.allclose(noise.get_noise_profile(), profile)
+
+    blocks = []
+    received = threading.Event()
+
+    def on_block(block, timestamp):
+        blocks.append(block)
+        received.set()
+
+    stream = noise.open_stream(on_block)
+    assert received.wait(1.0)
+    stream.stop()
+    stream.close()
+    assert list(blocks[0]) == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_session_noise_block_timestamps(tmp_path, sounddevice):
+    from enviroplus.noise import Noise
+    from enviroplus.session import Player, Recorder
+
+    path = str(tmp_path / "session.bin")
+    on_block = mock.Mock()
+
+    with Recorder(path) as recorder:
+        noise = recorder.noise(Noise(sample_rate=8000, duration=0.1))
+        noise.open_stream(on_block, blocksize=4)
+        callback = sounddevice.InputStream.call_args[1]["callback"]
+        for _ in range(3):
+            callback(numpy.ones((4, 1)), 4, None, None)
+            time.sleep(0.05)
+    recorded = [call[0][1] for call in on_block.call_args_list]
+
+    timestamps = []
+    done = threading.Event()
+
+    def on_replay(block, timestamp):
+        timestamps.append(timestamp)
+        if len(timestamps) == 3:
+            done.set()
+
+    # Replayed as fast as possible, blocks keep their recorded spacing
+    stream = Player(path, speed=None).noise().open_stream(on_replay)
+    assert done.wait(1.0)
+    stream.close()
+    assert numpy.allclose(numpy.diff(timestamps), numpy.diff(recorded))
+    assert numpy.diff(timestamps).min() >= 0.05
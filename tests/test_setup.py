@@ -1,3 +1,4 @@
+import mock
 import pytest
 
 
@@ -84,3 +85,24 @@ def test_gas_cleanup(gpiod, gpiodevice, smbus):
 
     gas.setup()
     gas.cleanup()
+
+
+def test_gas_setup_shared_bus(gpiod, gpiodevice, smbus):
+    from enviroplus import gas
+    gas._is_setup = False
+    gas.setup()
+    default = gas.adc
+
+    # A bus passed after an automatic setup must be used, not ignored
+    bus = mock.Mock(wraps=smbus.SMBus(1))
+    gas.setup(i2c_dev=bus)
+    assert gas.adc is not default
+    bus.reset_mock()
+    assert int(gas.read_all().oxidising) == 16641
+    assert bus.method_calls
+
+    # Setting up again on the same bus does nothing
+    adc = gas.adc
+    gas.setup(i2c_dev=bus)
+    gas.setup()
+    assert gas.adc is adc
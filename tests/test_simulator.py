@@ -0,0 +1,158 @@
+import threading
+import time
+
+import numpy
+import pytest
+
+
+def test_simulated_bme280():
+    from bme280 import BME280
+
+    from enviroplus.simulator import BME280Model, SimulatedBus
+
+    bus = SimulatedBus()
+    model = bus.add(BME280Model(temperature=18.5, pressure=990.0, humidity=60.0))
+
+    bme280 = BME280(i2c_dev=bus)
+    assert bme280.get_temperature() == pytest.approx(18.5, abs=0.01)
+    assert bme280.get_pressure() == pytest.approx(990.0, abs=0.01)
+    assert bme280.get_humidity() == pytest.approx(60.0, abs=0.01)
+
+    model.temperature = lambda t: 30.0
+    forced = BME280(i2c_dev=bus)
+    forced.setup(mode="forced")
+    measurements = model.measurements
+    assert forced.get_temperature() == pytest.approx(30.0, abs=0.01)
+    assert model.measurements == measurements + 1
+
+
+def test_simulated_ltr559():
+    from ltr559 import LTR559
+
+    from enviroplus.simulator import LTR559Model, SimulatedBus
+
+    bus = SimulatedBus()
+    model = bus.add(LTR559Model(lux=250.0, proximity=1500))
+
+    ltr559 = LTR559(i2c_dev=bus)
+    assert ltr559.get_lux() == pytest.approx(250.0, rel=0.01)
+    assert ltr559.get_proximity() == 1500
+
+    # New data is only flagged once per measurement period
+    model.lux = 10.0
+    assert ltr559.get_lux() == pytest.approx(250.0, rel=0.01)
+    time.sleep(0.06)
+    assert ltr559.get_lux() == pytest.approx(10.0, rel=0.05)
+
+
+def test_simulated_gas(gpiod, gpiodevice):
+    from enviroplus import gas
+    from enviroplus.simulator import ADS1015Model, SimulatedBus, waveform
+
+    bus = SimulatedBus()
+    bus.add(ADS1015Model(inputs={"in0": 1.65, "in1": waveform(1.65)}))
+    gas.setup(i2c_dev=bus)
+
+    assert gas.adc_type == "ADS1015"
+    reading = gas.read_all()
+    assert reading.oxidising == pytest.approx(56000, rel=0.01)
+    assert reading.reducing == pytest.approx(56000, rel=0.01)
+
+
+def test_simulated_ads1115():
+    import ads1015
+
+    from enviroplus.simulator import ADS1015Model, SimulatedBus
+
+    bus = SimulatedBus()
+    model = bus.add(ADS1015Model(chip="ADS1115", inputs={"in2": 0.5}))
+
+    adc = ads1015.ADS1015(i2c_addr=0x49, i2c_dev=bus)
+    assert adc.detect_chip_type() == "ADS1115"
+    adc.set_programmable_gain(2.048)
+    assert adc.get_voltage("in2/gnd") == pytest.approx(0.5, abs=0.001)
+    assert adc.get_voltage("in2/in3") == pytest.approx(0.5 - 1.241, abs=0.001)
+    assert model.conversions > 10
+
+
+def test_simulated_bus_latency_and_missing_device():
+    from enviroplus.simulator import SimulatedBus
+
+    bus = SimulatedBus(latency=0.01)
+    start = time.monotonic()
+    with pytest.raises(OSError):
+        bus.read_i2c_block_data(0x76, 0xD0, 1)
+    assert time.monotonic() - start >= 0.01
+    assert bus.transactions == 1
+
+
+def test_pms5003_port(gpiod, gpiodevice, simulator):
+    from enviroplus.particulates import PM10, PM25, FrameParser
+    from enviroplus.simulator import PMS5003Port
+
+    port = PMS5003Port(pm25=12, pm10=lambda t: 20, interval=0.01)
+    parser = FrameParser()
+    frames = []
+    while len(frames) < 3:
+        parser.readinto(port, size=max(port.in_waiting, 1))
+        frames.extend(parser.frames_available())
+    port.close()
+    assert frames[0][PM25] == 12
+    assert frames[0][PM10] == 20
+
+    # Like pyserial, readinto() waits for the whole buffer until the timeout
+    port = PMS5003Port(interval=10.0, timeout=0.1)
+    buffer = bytearray(64)
+    start = time.monotonic()
+    assert port.readinto(buffer) == 32
+    assert time.monotonic() - start >= 0.1
+    port.close()
+
+    port = PMS5003Port(interval=0.01, error_rate=1.0, timeout=0.1)
+    parser = FrameParser()
+    parser.feed(port.read(64))
+    assert list(parser.feed(port.read(64))) == []
+    port.close()
+
+    simulator.pms5003_port.pm1 = 3
+    pms5003 = simulator.pms5003()
+    pms5003.reset()
+    assert pms5003.read().pm_ug_per_m3(1.0) == 3
+
+
+def test_audio_source(sounddevice):
+    from enviroplus import noise
+    from enviroplus.simulator import AudioSource
+
+    audio = AudioSource(tones=((150.0, 0.5), (4000.0, 0.05)), noise=0.0, speed=None)
+    noise.sounddevice = audio
+    low, mid, high, total = noise.Noise(duration=0.5).get_noise_profile()
+    assert low > 5 * high
+
+    blocks = []
+    received = threading.Event()
+
+    def callback(block, timestamp):
+        blocks.append(block.copy())
+        if len(blocks) == 3:
+            received.set()
+
+    audio.speed = 100.0
+    stream = noise.Noise().open_stream(callback, blocksize=256)
+    assert received.wait(1.0)
+    stream.stop()
+    stream.close()
+    assert all(len(block) == 256 for block in blocks)
+    assert numpy.abs(blocks[0]).max() <= 0.55
+
+
+def test_waveform():
+    from enviroplus.simulator import waveform
+
+    value = waveform(10.0, amplitude=2.0, period=4.0)
+    assert value(0.0) == pytest.approx(10.0)
+    assert value(1.0) == pytest.approx(12.0)
+    assert value(3.0) == pytest.approx(8.0)
+
+    noisy = waveform(10.0, noise=1.0, seed=1)
+    assert noisy(0.0) == waveform(10.0, noise=1.0, seed=1)(0.0)
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+
+def test_put_read_ack(tmp_path):
+    from enviroplus.spool import Spool
+
+    spool = Spool(str(tmp_path))
+    assert spool.read() == []
+    spool.put(b"one")
+    end = spool.put_many([b"two", b"three"])
+
+    records = spool.read()
+    assert [record.data for record in records] == [b"one", b"two", b"three"]
+    assert records[-1].offset == end == spool.head
+    # Reading does not acknowledge
+    assert len(spool.read()) == 3
+
+    spool.ack(records[0].offset)
+    assert [record.data for record in spool.read()] == [b"two", b"three"]
+    spool.ack(end)
+    assert spool.read() == []
+    assert spool.pending == 0
+
+    with pytest.raises(ValueError):
+        spool.ack(end + 1)
+
+
+def test_read_limits(tmp_path):
+    from enviroplus.spool import Spool
+
+    spool = Spool(str(tmp_path))
+    spool.put_many([bytes(100)] * 10)
+    assert len(spool.read(max_records=3)) == 3
+    assert len(spool.read(max_bytes=250)) == 2
+    # A record larger than max_bytes is still returned on its own
+    assert len(spool.read(max_bytes=10)) == 1
+
+
+def test_reopen_resumes_from_ack(tmp_path):
+    from enviroplus.spool import Spool
+
+    with Spool(str(tmp_path), segment_bytes=64) as spool:
+        for i in range(20):
+            spool.put(f"record {i}".encode("utf-8"))
+        records = spool.read(max_records=12)
+        spool.ack(records[-1].offset)
+        head = spool.head
+
+    # Segments that were completely acknowledged are deleted
+    segments = [name for name in os.listdir(tmp_path) if name.endswith(".spool")]
+    assert 1 < len(segments) < 8
+
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    assert spool.head == head
+    assert [record.data for record in spool.read()] == [f"record {i}".encode("utf-8") for i in range(12, 20)]
+    spool.put(b"after restart")
+    assert spool.read()[-1].data == b"after restart"
+    spool.close()
+
+
+def test_partial_write_is_truncated(tmp_path):
+    from enviroplus.spool import Spool
+
+    spool = Spool(str(tmp_path))
+    spool.put(b"complete")
+    head = spool.head
+    spool.close()
+
+    # As if power was lost part way through a write
+    path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    with open(path, "ab") as f:
+        f.write(b"\x20\x00\x00\x00\x00\x00\x00\x00partial")
+
+    spool = Spool(str(tmp_path))
+    assert spool.head == head
+    assert [record.data for record in spool.read()] == [b"complete"]
+    spool.put(b"next")
+    assert [record.data for record in spool.read()] == [b"complete", b"next"]
+
+
+def test_oldest_segments_are_evicted(tmp_path):
+    from enviroplus.spool import Spool
+
+    spool = Spool(str(tmp_path), max_bytes=1000, segment_bytes=200)
+    for i in range(100):
+        spool.put(f"{i:08d}".encode("utf-8") * 4)
+
+    assert spool.size <= 1000
+    assert spool.evicted > 0
+    assert spool.pending == spool.size
+    records = spool.read()
+    assert records[-1].data == b"00000099" * 4
+    assert records[0].data != b"00000000" * 4
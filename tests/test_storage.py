@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+
+def _pairs(result):
+    timestamps, values = result
+    return list(zip(timestamps.tolist(), values.tolist()))
+
+
+def test_sqlite_sink_batches(tmp_path):
+    from enviroplus.storage import SQLiteSink
+
+    sink = SQLiteSink(str(tmp_path / "samples.db"), batch_size=3)
+    sink.add("temperature", 20.5, 1000.0)
+    sink.add("humidity", 50.0, 1000.0)
+    assert sink.written == 0
+
+    sink.add("temperature", 21.0, 1001.5)
+    assert sink.written == 3
+    assert sink.batches == 1
+
+    assert _pairs(sink.query("temperature")) == [(1000.0, 20.5), (1001.5, 21.0)]
+    assert _pairs(sink.query("temperature", start=1001.0)) == [(1001.5, 21.0)]
+    assert _pairs(sink.query("temperature", end=1001.0)) == [(1000.0, 20.5)]
+    assert _pairs(sink.query("pm25")) == []
+    assert sink.metrics == ["temperature", "humidity"]
+    sink.close()
+
+
+def test_sqlite_sink_wal_and_reopen(tmp_path):
+    from enviroplus.storage import SQLiteSink
+
+    path = str(tmp_path / "samples.db")
+    sink = SQLiteSink(path)
+    sink.add("lux", 100.0, 10.0)
+    sink.close()
+
+    db = sqlite3.connect(path)
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.execute("SELECT timestamp, metric, value FROM samples").fetchall() == [(10000, 1, 100.0)]
+    db.close()
+
+    sink = SQLiteSink(path)
+    sink.add("pressure", 1000.0, 11.0)
+    sink.add("lux", 200.0, 12.0)
+    sink.flush()
+    assert sink.metrics == ["lux", "pressure"]
+    assert _pairs(sink.query("lux")) == [(10.0, 100.0), (12.0, 200.0)]
+    sink.close()
+
+
+def test_sqlite_sink_background_interval(tmp_path):
+    from enviroplus.hub import Hub
+    from enviroplus.storage import SQLiteSink
+
+    sink = SQLiteSink(str(tmp_path / "samples.db"), interval=0.05)
+    hub = Hub()
+    hub.subscribe(sink.add_sample)
+
+    with sink:
+        hub.publish({"oxidising": 1.0, "reducing": 2.0})
+        time.sleep(0.2)
+        assert sink.written == 2
+        hub.publish({"nh3": 3.0})
+
+    assert sink.written == 3
+
+
+def test_sample_log_segments(tmp_path):
+    from enviroplus.storage import RECORD, SampleLog, SampleLogReader
+
+    directory = str(tmp_path / "log")
+    log = SampleLog(directory, segment_records=4, batch_size=100)
+    for second in range(5):
+        log.add("temperature", 20.0 + second, 1000.0 + second)
+        log.add("humidity", 50.0 + second, 1000.0 + second)
+    assert log.flush() == 10
+    log.close()
+
+    assert sorted(p.name for p in (tmp_path / "log").iterdir()) == ["00000000.seg", "00000001.seg", "00000002.seg", "metrics"]
+    assert (tmp_path / "log" / "00000000.seg").stat().st_size == 4 * RECORD.itemsize
+
+    reader = SampleLogReader(directory)
+    assert reader.metrics == ["temperature", "humidity"]
+    assert [len(s) for s in reader.segments()] == [4, 4, 2]
+
+    timestamps, values = reader.query("temperature")
+    assert list(timestamps) == [1000.0, 1001.0, 1002.0, 1003.0, 1004.0]
+    assert list(values) == [20.0, 21.0, 22.0, 23.0, 24.0]
+
+    timestamps, values = reader.query("humidity", start=1001.0, end=1003.0)
+    assert list(timestamps) == [1001.0, 1002.0]
+    assert list(values) == [51.0, 52.0]
+
+    timestamps, values = reader.query("pm25")
+    assert len(timestamps) == len(values) == 0
+
+
+def test_sample_log_reopen_drops_partial_record(tmp_path):
+    from enviroplus.storage import SampleLog, SampleLogReader
+
+    directory = str(tmp_path / "log")
+    log = SampleLog(directory)
+    log.add("lux", 1.0, 10.0)
+    log.close()
+
+    with open(tmp_path / "log" / "00000000.seg", "ab") as f:
+        f.write(b"\x00\x01\x02")
+
+    reader = SampleLogReader(directory)
+    assert list(reader.query("lux")[1]) == [1.0]
+
+    log = SampleLog(directory)
+    log.add("proximity", 5.0, 12.0)
+    log.add("lux", 2.0, 11.0)
+    log.close()
+
+    assert reader.metrics == ["lux", "proximity"]
+    timestamps, values = reader.query("lux")
+    assert list(timestamps) == [10.0, 11.0]
+    assert list(values) == [1.0, 2.0]
+    assert list(reader.query("proximity")[1]) == [5.0]
+
+
+def test_sample_log_out_of_order_batches(tmp_path):
+    from enviroplus.storage import SampleLog, SampleLogReader
+
+    directory = str(tmp_path / "log")
+    log = SampleLog(directory, batch_size=100)
+    # Two threads' batches, flushed in the opposite order they were read
+    for batch in ((1002.0, 1003.0), (1000.0, 1001.0), (1004.0,), (1001.5,)):
+        for timestamp in batch:
+            log.add("temperature", timestamp - 1000.0, timestamp)
+        log.flush()
+    log.close()
+
+    reader = SampleLogReader(directory)
+    assert all((segment["timestamp"][1:] >= segment["timestamp"][:-1]).all() for segment in reader.segments())
+    timestamps, values = reader.query("temperature")
+    assert list(timestamps) == [1000.0, 1001.0, 1001.5, 1002.0, 1003.0, 1004.0]
+    assert list(values) == [0.0, 1.0, 1.5, 2.0, 3.0, 4.0]
+    timestamps, _ = reader.query("temperature", start=1001.0, end=1003.0)
+    assert list(timestamps) == [1001.0, 1001.5, 1002.0]
+
+    # Reopening continues in time order after the last record
+    log = SampleLog(directory)
+    log.add("temperature", 0.5, 1000.5)
+    log.close()
+    assert list(reader.query("temperature")[0]) == [1000.0, 1000.5, 1001.0, 1001.5, 1002.0, 1003.0, 1004.0]
+
+
+def test_sample_log_failed_write_is_truncated(tmp_path, monkeypatch):
+    from enviroplus.storage import SampleLog, SampleLogReader
+
+    directory = str(tmp_path / "log")
+    log = SampleLog(directory, segment_records=2, batch_size=100)
+    log.add("lux", 0.0, 10.0)
+    log.flush()
+
+    fsync = os.fsync
+    calls = []
+
+    def fail_second_segment(fd):
+        calls.append(fd)
+        if len(calls) == 2:
+            raise OSError(28, "No space left on device")
+        fsync(fd)
+
+    # The batch fills the first segment, then fails part way through the second
+    for second in range(1, 4):
+        log.add("lux", float(second), 10.0 + second)
+    monkeypatch.setattr(os, "fsync", fail_second_segment)
+    with pytest.raises(OSError):
+        log.flush()
+    monkeypatch.setattr(os, "fsync", fsync)
+    assert [p.name for p in sorted((tmp_path / "log").glob("*.seg"))] == ["00000000.seg"]
+    assert [len(s) for s in SampleLogReader(directory).segments()] == [1]
+
+    # The retried batch is written once
+    assert log.flush() == 3
+    log.close()
+    timestamps, values = SampleLogReader(directory).query("lux")
+    assert list(timestamps) == [10.0, 11.0, 12.0, 13.0]
+    assert list(values) == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_series_store_blocks(tmp_path):
+    from enviroplus.storage import SeriesStore
+
+    directory = str(tmp_path / "series")
+    store = SeriesStore(directory, block_size=4)
+    for second in range(10):
+        store.add("temperature", float(second), 1000.0 + second)
+
+    # Two full blocks written, two values held
+    assert [(b.start, b.end, b.count, b.min, b.max) for b in store.blocks("temperature")] == [
+        (1000000, 1003000, 4, 0.0, 3.0),
+        (1004000, 1007000, 4, 4.0, 7.0)
+    ]
+    assert store.blocks("temperature", start=1004.5) == store.blocks("temperature")[1:]
+    assert store.blocks("temperature", end=1004.0) == store.blocks("temperature")[:1]
+
+    timestamps, values = store.query("temperature")
+    assert list(values) == [float(v) for v in range(10)]
+    timestamps, values = store.query("temperature", start=1002.0, end=1009.0)
+    assert list(timestamps) == [1002.0 + t for t in range(7)]
+
+    assert store.summary("temperature") == (8, 0.0, 7.0)
+    assert store.summary("temperature", start=1001.0, end=1006.0) == (5, 1.0, 5.0)
+    assert store.summary("pm25") == (0, None, None)
+    store.close()
+
+    store = SeriesStore(directory, block_size=4)
+    assert store.metrics == ["temperature"]
+    assert len(store.blocks("temperature")) == 3
+    assert list(store.query("temperature")[1]) == [float(v) for v in range(10)]
+    assert len(store.query("pm25")[0]) == 0
+
+
+def test_series_store_drops_partial_block(tmp_path):
+    from enviroplus.storage import SeriesStore
+
+    directory = str(tmp_path / "series")
+    store = SeriesStore(directory)
+    store.add("lux", 1.0, 1.0)
+    store.flush()
+
+    path = tmp_path / "series" / "lux.series"
+    size = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 40)
+
+    store = SeriesStore(directory)
+    assert path.stat().st_size == size
+    assert list(store.query("lux")[1]) == [1.0]